@@ -1,9 +1,11 @@
 from django.contrib import admin
 from .models import User, Address
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from .forms import AdminUserChangeForm
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
+    form = AdminUserChangeForm
     fieldsets = BaseUserAdmin.fieldsets + (
         ("Thông tin thêm", {"fields": ("avatar",)}),
     )
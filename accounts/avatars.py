@@ -0,0 +1,94 @@
+import hashlib
+import io
+import re
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# kích thước vuông của biến thể: navbar (40px, x2) và trang hồ sơ (112px, x2); bản cuối là bản lưu trong User.avatar
+AVATAR_SIZES = (96, 256)
+AVATAR_NAV_SIZE = 96
+AVATAR_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# chặn ảnh "bom giải nén" trước khi giải mã pixel nào
+AVATAR_MAX_PIXELS = 25_000_000
+AVATAR_DIR = "avatars"
+_VARIANT_RE = re.compile(rf"-{AVATAR_SIZES[-1]}\.webp$")
+
+
+def avatar_name(digest, size):
+    return f"{AVATAR_DIR}/{digest[:2]}/{digest}-{size}.webp"
+
+
+def avatar_variant(name, size):
+    # ảnh tải lên trước khi có pipeline không có biến thể: dùng nguyên bản
+    if not name or not _VARIANT_RE.search(name):
+        return name
+    return _VARIANT_RE.sub(f"-{size}.webp", name)
+
+
+def _digest(upload):
+    sha = hashlib.sha256()
+    for chunk in upload.chunks():
+        sha.update(chunk)
+    upload.seek(0)
+    return sha.hexdigest()
+
+
+def _square(upload):
+    try:
+        image = Image.open(upload)
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError("Tệp tải lên không phải ảnh hợp lệ.")
+    width, height = image.size
+    if width * height > AVATAR_MAX_PIXELS:
+        raise ValidationError("Ảnh quá lớn (tối đa %(pixels)s megapixel).", params={"pixels": AVATAR_MAX_PIXELS // 1_000_000})
+    # JPEG giải mã thẳng ở tỉ lệ 1/2..1/8 nên ảnh chụp lớn không phải nạp đủ độ phân giải vào bộ nhớ
+    image.draft("RGB", (AVATAR_SIZES[-1], AVATAR_SIZES[-1]))
+    image = ImageOps.exif_transpose(image)
+    return ImageOps.fit(image.convert("RGB"), (AVATAR_SIZES[-1],) * 2, Image.Resampling.LANCZOS)
+
+
+class PreparedAvatar:
+    """Ảnh đại diện đã kiểm tra và mã hóa xong, chưa ghi vào storage.
+
+    Form chỉ gọi `save()` khi toàn bộ form hợp lệ, để upload bị từ chối vì
+    trường khác không để lại file mồ côi.
+    """
+
+    def __init__(self, digest, encoded):
+        self.digest = digest
+        self.encoded = encoded  # size -> bytes WebP; rỗng nếu ảnh đã có sẵn
+        self.name = avatar_name(digest, AVATAR_SIZES[-1])
+
+    def save(self):
+        # bản lớn nhất ghi sau cùng: nó có mặt nghĩa là mọi biến thể đã đủ
+        for size in sorted(self.encoded):
+            path = avatar_name(self.digest, size)
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(self.encoded[size]))
+        return self.name
+
+
+def prepare_avatar(upload):
+    """Kiểm tra và chuẩn hóa ảnh đại diện trong bộ nhớ (không ghi file).
+
+    Ảnh được cắt vuông, thu về AVATAR_SIZES, mã hóa WebP không kèm metadata;
+    tên file là SHA-256 của nội dung tải lên nên tải lại cùng một ảnh không
+    tạo file mới. Ảnh quá lớn / không đọc được thì ném ValidationError.
+    """
+    if upload.size > AVATAR_MAX_UPLOAD_BYTES:
+        raise ValidationError("Ảnh vượt quá %(mb)s MB.", params={"mb": AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)})
+    digest = _digest(upload)
+    if default_storage.exists(avatar_name(digest, AVATAR_SIZES[-1])):
+        return PreparedAvatar(digest, {})
+
+    image = _square(upload)
+    encoded = {}
+    for size in sorted(AVATAR_SIZES, reverse=True):
+        if image.width != size:
+            image = image.resize((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "WEBP", quality=82, method=4)
+        encoded[size] = buffer.getvalue()
+    return PreparedAvatar(digest, encoded)
@@ -1,6 +1,8 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordChangeForm, SetPasswordForm
+from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordChangeForm, SetPasswordForm, UserChangeForm
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
+from .avatars import prepare_avatar
 
 User = get_user_model()
 
@@ -70,3 +72,36 @@ class CustomSetPasswordForm(SetPasswordForm):
                 'placeholder': 'Nhập lại mật khẩu mới',
                 'autocomplete': 'new-password',
             })
+
+
+class AvatarUploadMixin:
+    """File mới tải lên đi qua pipeline (cắt vuông, WebP, tên theo hash); giá trị cũ giữ nguyên.
+
+    clean_avatar chỉ kiểm tra/mã hóa; file được ghi trong save(), tức là
+    sau khi cả form đã hợp lệ.
+    """
+
+    prepared_avatar = None
+
+    def clean_avatar(self):
+        upload = self.cleaned_data.get('avatar')
+        if isinstance(upload, UploadedFile):
+            self.prepared_avatar = prepare_avatar(upload)
+            return self.prepared_avatar.name
+        return upload
+
+    def save(self, commit=True):
+        if self.prepared_avatar is not None:
+            self.prepared_avatar.save()
+        return super().save(commit)
+
+
+class AvatarForm(AvatarUploadMixin, forms.ModelForm):
+    class Meta:
+        model = User
+        fields = ['avatar']
+
+
+class AdminUserChangeForm(AvatarUploadMixin, UserChangeForm):
+    class Meta(UserChangeForm.Meta):
+        model = User
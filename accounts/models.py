@@ -21,6 +21,8 @@ class Address(models.Model):
 
     class Meta:
         ordering = ["-is_default", "-id"]
+        # tìm địa chỉ mặc định của user (thanh toán, Address.save)
+        indexes = [models.Index(fields=["user", "is_default"], name="address_user_default_idx")]
 
     def __str__(self):
         return f"{self.recipient_name} · {self.address}"
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from core.versions import bump_version
+from .models import User
+from .utils import user_version_namespace
+
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    # đăng nhập chỉ ghi last_login: navbar không đổi
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    bump_version(user_version_namespace(instance.pk))
@@ -0,0 +1,89 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from .avatars import AVATAR_SIZES, avatar_name, avatar_variant
+from .forms import AdminUserChangeForm, AvatarForm
+from .models import User
+
+
+def _png(width=40, height=30, color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return SimpleUploadedFile("anh.png", buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AvatarUploadTests(TestCase):
+    """Ảnh đại diện: kiểm tra giới hạn, chỉ ghi file khi cả form hợp lệ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("co-anh", email="co-anh@example.com", password="mat-khau-thu-123")
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def _stored(self):
+        if not default_storage.exists("avatars"):
+            return []
+        return [name for folder in default_storage.listdir("avatars")[0]
+                for name in default_storage.listdir(f"avatars/{folder}")[1]]
+
+    def test_valid_upload_writes_every_variant(self):
+        form = AvatarForm(files={"avatar": _png()}, instance=self.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self._stored(), [])  # chưa ghi gì khi mới kiểm tra
+
+        user = form.save()
+
+        self.assertRegex(user.avatar.name, rf"-{AVATAR_SIZES[-1]}\.webp$")
+        for size in AVATAR_SIZES:
+            name = avatar_variant(user.avatar.name, size)
+            self.assertTrue(default_storage.exists(name))
+            with default_storage.open(name) as stored:
+                self.assertEqual(Image.open(stored).size, (size, size))
+
+    def test_same_image_is_stored_once(self):
+        for _ in range(2):
+            form = AvatarForm(files={"avatar": _png()}, instance=self.user)
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+        self.assertEqual(len(self._stored()), len(AVATAR_SIZES))
+
+    @mock.patch("accounts.avatars.AVATAR_MAX_UPLOAD_BYTES", 64)
+    def test_upload_size_limit(self):
+        form = AvatarForm(files={"avatar": _png()}, instance=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn("vượt quá", form.errors["avatar"][0])
+        self.assertEqual(self._stored(), [])
+
+    @mock.patch("accounts.avatars.AVATAR_MAX_PIXELS", 40 * 30 - 1)
+    def test_pixel_limit(self):
+        form = AvatarForm(files={"avatar": _png(40, 30)}, instance=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn("megapixel", form.errors["avatar"][0])
+        self.assertEqual(self._stored(), [])
+
+    def test_not_an_image(self):
+        upload = SimpleUploadedFile("anh.png", b"khong phai anh", content_type="image/png")
+        form = AvatarForm(files={"avatar": upload}, instance=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(self._stored(), [])
+
+    def test_invalid_form_leaves_no_files(self):
+        # ảnh hợp lệ nhưng trường khác sai: không được để lại file mồ côi
+        data = {"username": "ten có dấu cách!", "email": self.user.email, "date_joined": "2026-01-01 00:00"}
+        form = AdminUserChangeForm(data=data, files={"avatar": _png()}, instance=self.user)
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("username", form.errors)
+        self.assertNotIn("avatar", form.errors)
+        self.assertEqual(self._stored(), [])
+        self.assertFalse(default_storage.exists(avatar_name(form.prepared_avatar.digest, AVATAR_SIZES[-1])))
@@ -9,6 +9,7 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile, name='profile'),
+    path('profile/avatar/', views.upload_avatar, name='avatar'),
     path('password-reset/', views.password_reset_view, name='password_reset'),
     path('password-reset/confirm/', views.password_reset_confirm_view, name='password_reset_confirm'),
     path('password-change/', views.change_password_view, name='change_password'),
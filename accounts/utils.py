@@ -0,0 +1,16 @@
+from django.contrib.auth import SESSION_KEY
+
+
+def user_version_namespace(user_id):
+    # phiên bản phần trang lấy từ hồ sơ (ảnh đại diện, tên trên navbar), để ETag
+    # của trang catalog đổi khi hồ sơ đổi dù session/cookie vẫn như cũ
+    return f"user:{user_id}" if user_id else None
+
+
+def request_user_namespace(request):
+    # chỉ đọc session, không chạm bảng user
+    return user_version_namespace(request.session.get(SESSION_KEY))
+
+
+async def arequest_user_namespace(request):
+    return user_version_namespace(await request.session.aget(SESSION_KEY))
@@ -7,12 +7,15 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash
 from .models import Address
-from .forms import CustomPasswordChangeForm, CustomSetPasswordForm 
+from .forms import AvatarForm, CustomPasswordChangeForm, CustomSetPasswordForm 
 
 try:
     from orders.models import Order
 except Exception:
     Order = None
+from core.pagination import keyset_page
+
+ORDER_PAGE_SIZE = 10
 
 User = get_user_model()
 
@@ -67,15 +70,41 @@ def logout_view(request):
 # HỒ SƠ NGƯỜI DÙNG
 @login_required
 def profile(request):
+    orders, next_cursor, order_count = [], None, 0
+    if Order:
+        # lịch sử đơn: tổng tiền/số dòng tính trong SQL, phân trang keyset theo (created_at, id)
+        orders, next_cursor = keyset_page(Order.objects.filter(user=request.user).history(),
+                                          ('-created_at', '-id'), request.GET.get('cursor'), ORDER_PAGE_SIZE)
+    if request.headers.get('HX-Request'):
+        return render(request, 'orders/partials/order_page.html', {'orders': orders, 'next_cursor': next_cursor})
+
     addresses = Address.objects.filter(user=request.user).order_by("-id")
-    orders = Order.objects.filter(user=request.user).order_by("-created_at") if Order else []
+    if Order:
+        order_count = Order.objects.filter(user=request.user).count()
     return render(request, 'accounts/profile.html', {
         'user': request.user,
         'addresses': addresses,
         'orders': orders,
+        'next_cursor': next_cursor,
+        'order_count': order_count,
     })
 
 
+# ẢNH ĐẠI DIỆN
+@login_required
+def upload_avatar(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    form = AvatarForm(request.POST, request.FILES, instance=request.user)
+    if form.is_valid():
+        form.save()
+        messages.success(request, "Đã cập nhật ảnh đại diện.", extra_tags="avatar")
+    else:
+        for error in form.errors.get('avatar', []):
+            messages.error(request, error, extra_tags="avatar")
+    return redirect('accounts:profile')
+
+
 # ĐỔI MẬT KHẨU
 @login_required
 def change_password_view(request):
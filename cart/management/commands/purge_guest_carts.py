@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+from cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = ("Xóa giỏ khách không đụng tới quá N ngày, theo từng khoảng pk (mỗi khoảng một transaction ngắn); "
+            "chạy lại với cùng --checkpoint sẽ tiếp tục từ khoảng chưa xong.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="xóa giỏ khách có updated_at cũ hơn chừng này ngày")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="độ rộng mỗi khoảng pk")
+        parser.add_argument("--checkpoint", help="file lưu tiến độ để chạy tiếp nếu bị dừng giữa chừng")
+        parser.add_argument("--orphans", action="store_true", help="xóa cả CartItem trỏ tới giỏ không còn tồn tại")
+        parser.add_argument("--sleep", type=float, default=0, help="nghỉ giữa các khoảng (giây) để nhường tải cho DB")
+
+    def handle(self, *args, days, chunk_size, checkpoint, orphans, sleep, **options):
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+        state = self._load_state()
+        if state:
+            cutoff = datetime.fromisoformat(state["cutoff"])
+            self.stdout.write(f"tiếp tục từ pk {state['next_pk']} (mốc {cutoff:%Y-%m-%d %H:%M})")
+        else:
+            cutoff = timezone.now() - timedelta(days=days)
+            state = {"cutoff": cutoff.isoformat(), "next_pk": None, "orphans_next_pk": None}
+
+        def stale_carts(low, high):
+            ids = list(Cart.objects.filter(pk__gte=low, pk__lt=high, user__isnull=True, updated_at__lt=cutoff)
+                       .values_list("pk", flat=True))
+            if not ids:
+                return 0, 0
+            # item được xóa theo cascade bằng một DELETE ... WHERE cart_id IN (...)
+            _, by_model = Cart.objects.filter(pk__in=ids).delete()
+            return by_model.get(Cart._meta.label, 0), by_model.get(CartItem._meta.label, 0)
+
+        def orphan_items(low, high):
+            carts = Cart.objects.filter(pk=OuterRef("cart_id"))
+            deleted = CartItem.objects.filter(pk__gte=low, pk__lt=high).filter(~Exists(carts)).delete()[0]
+            return 0, deleted
+
+        totals = {"carts": 0, "items": 0}
+        started = time.perf_counter()
+        slowest = self._sweep(Cart, "next_pk", stale_carts, state, chunk_size, sleep, totals)
+        if orphans:
+            slowest = max(slowest, self._sweep(CartItem, "orphans_next_pk", orphan_items, state, chunk_size, sleep, totals))
+        elapsed = time.perf_counter() - started
+
+        if self.checkpoint and self.checkpoint.exists():
+            self.checkpoint.unlink()
+        rows = totals["carts"] + totals["items"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xóa {totals['carts']} giỏ khách, {totals['items']} dòng giỏ trong {elapsed:.2f}s "
+            f"({rows / elapsed if elapsed else 0:,.0f} dòng/s, khoảng chậm nhất {slowest * 1000:.0f} ms)"
+        ))
+
+    def _sweep(self, model, key, delete_range, state, chunk_size, sleep, totals):
+        """Chạy delete_range trên từng khoảng pk [low, low + chunk_size), trả về thời gian khoảng lâu nhất."""
+        bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return 0.0
+        low = max(state[key] or bounds["low"], bounds["low"])
+        slowest = 0.0
+        while low <= bounds["high"]:
+            high = low + chunk_size
+            chunk_started = time.perf_counter()
+            with transaction.atomic():
+                carts, items = delete_range(low, high)
+            slowest = max(slowest, time.perf_counter() - chunk_started)
+            totals["carts"] += carts
+            totals["items"] += items
+            state[key] = low = high
+            self._save_state(state)
+            if sleep:
+                time.sleep(sleep)
+        return slowest
+
+    def _load_state(self):
+        if self.checkpoint and self.checkpoint.exists():
+            return json.loads(self.checkpoint.read_text())
+        return None
+
+    def _save_state(self, state):
+        if self.checkpoint:
+            tmp = self.checkpoint.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state))
+            os.replace(tmp, self.checkpoint)
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from products.models import Product
 
 
@@ -7,9 +10,33 @@ from products.models import Product
 class Cart(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # lần cuối giỏ được sửa (cart.utils.touch_cart), để dọn giỏ khách bỏ quên
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @cached_property
+    def summary(self):
+        """Tổng tiền / số dòng, tính một lần cho mỗi instance.
+
+        Nếu items đã được prefetch (xem cart.utils.get_cart) thì cộng trên bộ
+        nhớ, ngược lại dùng một câu aggregate join sang product.
+        """
+        items = getattr(self, "_prefetched_objects_cache", {}).get("items")
+        if items is not None:
+            return {
+                "total_price": sum(item.subtotal() for item in items),
+                "item_count": len(items),
+            }
+        money = models.DecimalField(max_digits=14, decimal_places=0)
+        return self.items.aggregate(
+            total_price=Coalesce(Sum(F("quantity") * F("product__price"), output_field=money), Value(0), output_field=money),
+            item_count=Count("id"),
+        )
 
     def total_price(self):
-        return sum(item.subtotal() for item in self.items.all())
+        return self.summary["total_price"]
+
+    def item_count(self):
+        return self.summary["item_count"]
 
     def __str__(self):
         return f"Cart #{self.id} - {self.user or 'Guest'}"
@@ -21,6 +48,10 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        # tra dòng theo (giỏ, sản phẩm) khi thêm vào giỏ và khi gộp giỏ khách
+        indexes = [models.Index(fields=["cart", "product"], name="cartitem_cart_product_idx")]
+
     def subtotal(self):
         return self.product.price * self.quantity
 
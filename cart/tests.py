@@ -0,0 +1,175 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse, reverse_lazy
+from accounts.models import Address, User
+from products.models import Category, Product
+from .models import Cart, CartItem
+from .utils import _get_or_create_user_cart, merge_guest_cart
+
+# số câu SQL được phép; cache dùng LocMem để chỉ đếm query của view, không tính
+# lượt đọc cache (với DatabaseCache mỗi lượt đọc cache cũng là một query)
+CART_PAGE_QUERIES = 4
+CHECKOUT_PAGE_QUERIES = 5
+# gộp giỏ: SAVEPOINT, khóa giỏ khách, đọc item, INSERT, hai DELETE, RELEASE;
+# thêm một UPDATE khi giỏ user đã có sẵn sản phẩm trùng
+MERGE_QUERIES = 7
+MERGE_WITH_UPDATE_QUERIES = 8
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CartQueryCountTests(TestCase):
+    """Số câu SQL của trang giỏ hàng và trang thanh toán không phụ thuộc số dòng trong giỏ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Đèn bàn")
+        cls.products = [
+            Product.objects.create(name=f"Đèn thử {n}", slug=f"den-thu-{n}", price=100_000 + n, stock=50)
+            for n in range(8)
+        ]
+        for product in cls.products:
+            product.categories.add(category)
+        cls.user = User.objects.create_user("khach-hang", password="mat-khau-thu-123")
+        Address.objects.create(user=cls.user, recipient_name="Khách", phone="0900000000", address="1 Lê Lợi",
+                               is_default=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _fill_cart(self, lines):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in self.products[:lines]])
+        return cart
+
+    def _assert_queries(self, url, expected):
+        # lượt đầu làm nóng điều hướng, chỉ mục và cache fragment của tiến trình
+        self.client.get(url)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cart_page_one_line(self):
+        self._fill_cart(1)
+        self._assert_queries(reverse('cart:cart'), CART_PAGE_QUERIES)
+
+    def test_cart_page_many_lines(self):
+        self._fill_cart(8)
+        response = self._assert_queries(reverse('cart:cart'), CART_PAGE_QUERIES)
+        self.assertContains(response, self.products[7].name)
+
+    def test_checkout_page_one_line(self):
+        self._fill_cart(1)
+        self._assert_queries(reverse('orders:checkout'), CHECKOUT_PAGE_QUERIES)
+
+    def test_checkout_page_many_lines(self):
+        self._fill_cart(8)
+        response = self._assert_queries(reverse('orders:checkout'), CHECKOUT_PAGE_QUERIES)
+        self.assertContains(response, self.products[7].name)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MergeGuestCartTests(TestCase):
+    """Gộp giỏ khách tốn cùng số câu SQL dù giỏ khách có 1 hay nhiều dòng."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f"Ghế thử {n}", slug=f"ghe-thu-{n}", price=200_000 + n, stock=5)
+            for n in range(8)
+        ]
+        cls.user = User.objects.create_user("nguoi-gop", password="mat-khau-thu-123")
+
+    def setUp(self):
+        cache.clear()
+        self.cart = Cart.objects.create(user=self.user)
+
+    def _guest_cart(self, products, quantity=2):
+        guest = Cart.objects.create()
+        CartItem.objects.bulk_create([CartItem(cart=guest, product=product, quantity=quantity) for product in products])
+        return guest
+
+    def _merge(self, guest, expected=MERGE_QUERIES):
+        with self.assertNumQueries(expected):
+            merge_guest_cart(guest.pk, self.cart)
+        self.assertFalse(Cart.objects.filter(pk=guest.pk).exists())
+
+    def test_merge_one_line(self):
+        self._merge(self._guest_cart(self.products[:1]))
+        self.assertEqual(self.cart.items.count(), 1)
+
+    def test_merge_many_lines(self):
+        self._merge(self._guest_cart(self.products))
+        self.assertEqual(self.cart.items.count(), len(self.products))
+
+    def test_merge_into_existing_lines(self):
+        # dòng trùng sản phẩm được cộng dồn, không vượt quá tồn kho
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=4)
+        self._merge(self._guest_cart(self.products, quantity=3), MERGE_WITH_UPDATE_QUERIES)
+        quantities = dict(self.cart.items.values_list("product_id", "quantity"))
+        self.assertEqual(quantities[self.products[0].pk], 5)
+        self.assertEqual(quantities[self.products[7].pk], 3)
+        self.assertEqual(len(quantities), len(self.products))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ResolveCartAfterLoginTests(TestCase):
+    """Đăng nhập với giỏ khách trong session: gộp vào đúng một giỏ user, không tạo giỏ rỗng thừa."""
+
+    # trang giỏ (get_cart) và tab giỏ HTMX (aget_cart)
+    urls = (reverse_lazy('cart:cart'), reverse_lazy('cart:cart_tab'))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="Tủ thử", slug="tu-thu", price=1_500_000, stock=5)
+        cls.user = User.objects.create_user("vua-dang-nhap", password="mat-khau-thu-123")
+
+    def setUp(self):
+        cache.clear()
+
+    def _login_with_session_cart(self, cart_id):
+        session = self.client.session
+        session["cart_id"] = cart_id
+        session.save()
+        self.client.force_login(self.user)
+
+    def test_guest_cart_is_moved_into_new_user_cart(self):
+        for url in self.urls:
+            with self.subTest(url=str(url)):
+                Cart.objects.filter(user=self.user).delete()
+                guest = Cart.objects.create()
+                CartItem.objects.create(cart=guest, product=self.product, quantity=2)
+                self._login_with_session_cart(guest.pk)
+
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+                cart = Cart.objects.get(user=self.user)
+                self.assertEqual(list(cart.items.values_list("quantity", flat=True)), [2])
+                self.assertFalse(Cart.objects.filter(pk=guest.pk).exists())
+                self.assertNotIn("cart_id", self.client.session)
+                self.client.logout()
+
+    def test_stale_session_cart_creates_nothing(self):
+        for url in self.urls:
+            with self.subTest(url=str(url)):
+                self._login_with_session_cart(987654)
+
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+                self.assertFalse(Cart.objects.filter(user=self.user).exists())
+                self.assertNotIn("cart_id", self.client.session)
+                self.client.logout()
+
+    def test_existing_user_cart_is_reused(self):
+        cart = Cart.objects.create(user=self.user)
+        guest = Cart.objects.create()
+        CartItem.objects.create(cart=guest, product=self.product, quantity=1)
+        self._login_with_session_cart(guest.pk)
+
+        self.client.get(self.urls[0])
+
+        self.assertEqual(list(Cart.objects.filter(user=self.user).values_list("pk", flat=True)), [cart.pk])
+        self.assertEqual(cart.items.count(), 1)
+        # request khác (tab thứ hai) thấy giỏ đã có thay vì tạo thêm
+        self.assertEqual(_get_or_create_user_cart(self.user), cart)
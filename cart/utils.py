@@ -1,30 +1,143 @@
-from .models import Cart
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, aprefetch_related_objects, prefetch_related_objects
+from django.utils import timezone
+from core.versions import abump_version, bump_version
+from .models import Cart, CartItem
 
-def get_cart(request, create_if_missing=False):
+CART_TOUCH_INTERVAL = timedelta(hours=1)
+# giá trị đánh dấu "chưa tra giỏ trong request này" (khác với None = không có giỏ)
+_UNRESOLVED = object()
+
+
+def _items_prefetch():
+    return Prefetch("items", queryset=CartItem.objects.select_related("product").order_by("id"))
+
+
+def _reset_cart_cache(cart):
+    cart._prefetched_objects_cache = {}
+    cart.__dict__.pop("summary", None)
+
+
+def prefetch_cart_items(cart):
+    """Nạp sẵn items kèm product để template, view và checkout không query lại."""
+    if cart is not None:
+        _reset_cart_cache(cart)
+        prefetch_related_objects([cart], _items_prefetch())
+    return cart
+
+
+async def aprefetch_cart_items(cart):
+    if cart is not None:
+        _reset_cart_cache(cart)
+        await aprefetch_related_objects([cart], _items_prefetch())
+    return cart
+
+
+def cart_version_namespace(user_id=None, cart_id=None):
+    # phiên bản theo chủ giỏ (user đăng nhập, hoặc cart_id trong session của khách),
+    # để tính ETag của trang mà không phải query giỏ
+    if user_id:
+        return f"cart:user:{user_id}"
+    return f"cart:{cart_id}" if cart_id else None
+
+
+def request_cart_namespace(request):
+    # chỉ đọc session, không chạm bảng user/cart
+    return cart_version_namespace(request.session.get(SESSION_KEY), request.session.get("cart_id"))
+
+
+async def arequest_cart_namespace(request):
+    return cart_version_namespace(await request.session.aget(SESSION_KEY), await request.session.aget("cart_id"))
+
+
+async def atouch_cart(cart):
+    # cập nhật updated_at (mốc dọn giỏ khách) tối đa mỗi CART_TOUCH_INTERVAL một lần, không ghi mỗi lượt sửa
+    now = timezone.now()
+    if cart.updated_at < now - CART_TOUCH_INTERVAL:
+        cart.updated_at = now
+        await Cart.objects.filter(pk=cart.pk).aupdate(updated_at=now)
+
+
+def bump_cart_version(cart):
+    bump_version(cart_version_namespace(cart.user_id, cart.pk))
+
+
+async def abump_cart_version(cart):
+    await abump_version(cart_version_namespace(cart.user_id, cart.pk))
+
+
+def merge_guest_cart(guest_cart_id, cart):
+    """Gộp giỏ khách vào giỏ user bằng vài câu lệnh cố định, không phụ thuộc số dòng.
+
+    Khóa dòng giỏ khách trước khi đọc: nếu hai tab đăng nhập cùng lúc, tab
+    đến sau sẽ chờ rồi thấy giỏ khách đã bị xóa và bỏ qua.
+    """
+    with transaction.atomic():
+        guest = Cart.objects.select_for_update().filter(pk=guest_cart_id, user__isnull=True).first()
+        if guest is None or guest.pk == cart.pk:
+            return
+
+        # một lần đọc cho item của cả hai giỏ
+        items = list(CartItem.objects.select_related("product").filter(cart_id__in=[cart.pk, guest.pk]).order_by("id"))
+        existing = {item.product_id: item for item in items if item.cart_id == cart.pk}
+        to_update, to_create = {}, {}
+
+        for item in items:
+            if item.cart_id != guest.pk:
+                continue
+            stock = item.product.stock
+            target = existing.get(item.product_id) or to_create.get(item.product_id)
+            if target is not None:
+                # cộng dồn nhưng không vượt quá tồn kho
+                target.quantity = min(target.quantity + item.quantity, stock)
+                if target.pk:
+                    to_update[target.pk] = target
+            elif min(item.quantity, stock) > 0:
+                to_create[item.product_id] = CartItem(cart=cart, product_id=item.product_id,
+                                                      quantity=min(item.quantity, stock))
+
+        if to_update:
+            CartItem.objects.bulk_update(to_update.values(), ["quantity"])
+        if to_create:
+            CartItem.objects.bulk_create(to_create.values())
+        # xóa giỏ khách (item đi theo qua cascade)
+        guest.delete()
+        transaction.on_commit(lambda: bump_cart_version(cart))
+
+
+def _get_or_create_user_cart(user):
+    """Giỏ của user, tạo nếu chưa có.
+
+    Cart.user không unique nên khóa dòng user trước khi tra lại: hai request
+    cùng lúc (hai tab vừa đăng nhập) chờ nhau thay vì mỗi bên tạo một giỏ.
+    """
+    with transaction.atomic():
+        list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list("pk", flat=True))
+        cart = Cart.objects.filter(user=user).order_by("pk").first()
+        if cart is None:
+            cart = Cart.objects.create(user=user)
+        return cart
+
+
+def _resolve_cart(request):
     cart = None
 
     # Nếu user đã đăng nhập
     if request.user.is_authenticated:
-        # Nếu session có giỏ tạm (tạo trước khi đăng nhập)
+        # Lấy giỏ của user (chưa có thì thôi, giỏ chỉ được tạo khi thêm món đầu tiên)
+        cart = Cart.objects.filter(user=request.user).order_by("pk").first()
+
+        # Nếu session có giỏ tạm (tạo trước khi đăng nhập) → gộp vào giỏ user;
+        # cart_id cũ (giỏ khách đã gộp/bị dọn) thì không tạo giỏ rỗng cho user
         session_cart_id = request.session.get("cart_id")
-        session_cart = None
         if session_cart_id:
-            session_cart = Cart.objects.filter(pk=session_cart_id, user__isnull=True).first()
-
-        # Lấy hoặc tạo giỏ cho user
-        cart, created = Cart.objects.get_or_create(user=request.user)
-
-        # Nếu có giỏ session trước đó → gộp vào giỏ user
-        if session_cart and session_cart != cart:
-            for item in session_cart.items.all():
-                existing_item = cart.items.filter(product=item.product).first()
-                if existing_item:
-                    existing_item.quantity += item.quantity
-                    existing_item.save()
-                else:
-                    item.cart = cart
-                    item.save()
-            session_cart.delete()
+            if cart is None and Cart.objects.filter(pk=session_cart_id, user__isnull=True).exists():
+                cart = _get_or_create_user_cart(request.user)
+            if cart is not None:
+                merge_guest_cart(session_cart_id, cart)
             request.session.pop("cart_id", None)
 
         return cart
@@ -34,9 +147,62 @@ def get_cart(request, create_if_missing=False):
     if cart_id:
         cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first()
 
+    return cart
+
+
+def get_cart(request, create_if_missing=False):
+    # Giỏ được tra một lần cho mỗi request rồi dùng chung cho context processor, view và checkout
+    cart = getattr(request, "_cart", _UNRESOLVED)
+    if cart is _UNRESOLVED:
+        cart = prefetch_cart_items(_resolve_cart(request))
+        request._cart = cart
+
     # Nếu chưa có giỏ và được phép tạo mới
     if not cart and create_if_missing:
-        cart = Cart.objects.create()
-        request.session["cart_id"] = cart.id
+        if request.user.is_authenticated:
+            cart = prefetch_cart_items(_get_or_create_user_cart(request.user))
+        else:
+            cart = prefetch_cart_items(Cart.objects.create())
+            request.session["cart_id"] = cart.id
+        request._cart = cart
+
+    return cart
+
+
+async def _aresolve_cart(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        cart = await Cart.objects.filter(user=user).order_by("pk").afirst()
+        session_cart_id = await request.session.aget("cart_id")
+        if session_cart_id:
+            if cart is None and await Cart.objects.filter(pk=session_cart_id, user__isnull=True).aexists():
+                # khóa dòng/gộp giỏ cần transaction (chỉ có API sync)
+                cart = await sync_to_async(_get_or_create_user_cart)(user)
+            if cart is not None:
+                await sync_to_async(merge_guest_cart)(session_cart_id, cart)
+            await request.session.apop("cart_id", None)
+        return cart
+
+    cart_id = await request.session.aget("cart_id")
+    if cart_id:
+        return await Cart.objects.filter(pk=cart_id, user__isnull=True).afirst()
+    return None
+
+
+async def aget_cart(request, create_if_missing=False):
+    """Bản async của get_cart, dùng chung bộ nhớ `request._cart` với context processor."""
+    cart = getattr(request, "_cart", _UNRESOLVED)
+    if cart is _UNRESOLVED:
+        cart = await aprefetch_cart_items(await _aresolve_cart(request))
+        request._cart = cart
+
+    if not cart and create_if_missing:
+        user = await request.auser()
+        if user.is_authenticated:
+            cart = await aprefetch_cart_items(await sync_to_async(_get_or_create_user_cart)(user))
+        else:
+            cart = await aprefetch_cart_items(await Cart.objects.acreate())
+            await request.session.aset("cart_id", cart.id)
+        request._cart = cart
 
     return cart
@@ -1,23 +1,25 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, aget_object_or_404, redirect
 from django.http import HttpResponse
 from products.models import Product
 from .models import CartItem
-from .utils import get_cart
+from .utils import abump_cart_version, aget_cart, aprefetch_cart_items, atouch_cart, get_cart
 from django.template.loader import render_to_string
 
 
 # Trang giỏ hàng chính
 def cart(request):
-    cart_obj = get_cart(request, create_if_missing=True)
+    # chỉ xem giỏ thì không tạo giỏ rỗng; giỏ được tạo khi thêm món đầu tiên
+    cart_obj = get_cart(request)
     return render(request, 'cart/cart.html', {"cart": cart_obj})
 
 
 # Tab giỏ hàng mini (HTMX)
-def cart_tab(request):
-    cart_obj = get_cart(request, create_if_missing=True)
-    return render(request, 'cart/partials/cart_tab.html', {"cart": cart_obj})
+async def cart_tab(request):
+    cart_obj = await aget_cart(request)
+    return await sync_to_async(render)(request, 'cart/partials/cart_tab.html', {"cart": cart_obj})
 
-def cart_modify(request):
+async def cart_modify(request):
     if request.method != "POST":
         return HttpResponse(status=405)
     product_id = request.POST.get("product")
@@ -30,21 +32,24 @@ def cart_modify(request):
     except (ValueError, TypeError):
         qty = None
 
-    cart = get_cart(request, create_if_missing=True)
-    if not request.user.is_authenticated and cart:
-        request.session["cart_id"] = cart.id
-        request.session.modified = True
+    # giỏ mới của khách được aget_cart ghi vào session; giỏ có sẵn thì session không đổi nên không phải ghi lại.
+    # xóa/giảm về 0 không tạo giỏ mới
+    adding = action != "remove" and (qty is None or qty > 0)
+    cart = await aget_cart(request, create_if_missing=adding)
+    if cart is None:
+        return await _render_cart_response(request, None)
 
+    # tìm item trong danh sách đã prefetch thay vì query lại
     item = None
     if item_id and str(item_id).isdigit():
-        item = CartItem.objects.filter(cart=cart, id=item_id).first()
+        item = next((i for i in cart.items.all() if i.id == int(item_id)), None)
     elif product_id and str(product_id).isdigit():
-        item = CartItem.objects.filter(cart=cart, product_id=product_id).first()
+        item = next((i for i in cart.items.all() if i.product_id == int(product_id)), None)
 
     # remove if requested or qty <= 0
     if action == "remove" or (qty is not None and qty <= 0):
         if item:
-            item.delete()
+            await item.adelete()
     else:
         # update / create
         if qty is None:
@@ -54,7 +59,7 @@ def cart_modify(request):
         if item:
             product = item.product
         else:
-            product = get_object_or_404(Product, pk=product_id)
+            product = await aget_object_or_404(Product, pk=product_id)
 
         # limit số lượng theo stock
         if qty > product.stock:
@@ -62,18 +67,22 @@ def cart_modify(request):
 
         if item:
             item.quantity = qty if action != "add" else min(item.quantity + qty, product.stock)
-            item.save()
+            await item.asave()
         else:
             if qty > 0:
-                CartItem.objects.create(cart=cart, product=product, quantity=qty)
+                await CartItem.objects.acreate(cart=cart, product=product, quantity=qty)
             else:
                 pass
-    cart.refresh_from_db()
+    await aprefetch_cart_items(cart)
+    await atouch_cart(cart)
+    await abump_cart_version(cart)
+    return await _render_cart_response(request, cart)
 
+
+async def _render_cart_response(request, cart):
     # Nếu là HTMX request: trả OOB fragments để cập nhật cả drawer và trang cart
     if request.headers.get("HX-Request"):
-        cart_tab_html = render_to_string("cart/partials/cart_tab.html", {"cart": cart}, request=request)
-        cart_list_html = render_to_string("cart/partials/cart_list.html", {"cart": cart}, request=request)
+        cart_tab_html, cart_list_html = await sync_to_async(_render_cart_fragments)(request, cart)
         return HttpResponse(
             f"""
             <div id="cart-tab" hx-swap-oob="true">{cart_tab_html}</div>
@@ -82,4 +91,12 @@ def cart_modify(request):
         )
 
     # fallback: full page render
-    return render(request, "cart/cart.html", {"cart": cart})
\ No newline at end of file
+    return await sync_to_async(render)(request, "cart/cart.html", {"cart": cart})
+
+
+def _render_cart_fragments(request, cart):
+    context = {"cart": cart}
+    return (
+        render_to_string("cart/partials/cart_tab.html", context, request=request),
+        render_to_string("cart/partials/cart_list.html", context, request=request),
+    )
\ No newline at end of file
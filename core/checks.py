@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# backend chỉ sống trong một tiến trình: bump_version ở worker/command khác không tới được
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            f"Cache mặc định ({backend}) không dùng chung giữa các tiến trình.",
+            hint="Đặt REDIS_URL hoặc dùng DatabaseCache, nếu không phiên bản catalog/điều hướng "
+                 "chỉ được làm mới trong tiến trình đã thay đổi dữ liệu.",
+            id='core.W001',
+        )]
+    return []
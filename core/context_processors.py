@@ -1,21 +1,25 @@
-from django.apps import apps
+from django.core.files.storage import default_storage
+from accounts.avatars import AVATAR_NAV_SIZE, avatar_variant
+from products.utils import get_site_navigation
+
+AVATAR_SESSION_KEY = "avatar_url"
 
 def site_categories(request):
-    Category = apps.get_model('products', 'Category')
     return {
-        "categories": Category.objects.all().order_by("id")
+        "categories": get_site_navigation()["categories_by_id"]
     }
 
 def user_avatar(request):
     avatar_url = ""
     user = getattr(request, 'user', None)
-    if user and user.is_authenticated:
-        profile = getattr(user, 'profile', None)
-        if profile:
-            avatar = getattr(profile, 'avatar', None)
-            try:
-                if avatar and getattr(avatar, 'url', None):
-                    avatar_url = avatar.url
-            except Exception:
-                avatar_url = ""
-    return {"user_avatar_url": avatar_url}
\ No newline at end of file
+    if user and user.is_authenticated and user.avatar:
+        # storage có thể phải ký URL/gọi mạng: giữ URL trong session theo tên file,
+        # tên đổi (ảnh mới, theo hash nội dung) thì mới hỏi lại storage
+        name = avatar_variant(user.avatar.name, AVATAR_NAV_SIZE)
+        cached = request.session.get(AVATAR_SESSION_KEY)
+        if cached and cached[0] == name:
+            avatar_url = cached[1]
+        else:
+            avatar_url = default_storage.url(name)
+            request.session[AVATAR_SESSION_KEY] = (name, avatar_url)
+    return {"user_avatar_url": avatar_url}
@@ -0,0 +1,159 @@
+import json
+import statistics
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import Address, User
+from cart.models import Cart, CartItem
+from cart.utils import bump_cart_version
+from products.facets import facet_index
+from products.models import Category, Product
+from products.search import search_index
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "bench_baseline.json"
+# chênh lệch p95 dưới mức này (ms) coi là nhiễu dù vượt tỉ lệ cho phép
+MIN_REGRESSION_MS = 2.0
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentile(cuts, p):
+    return cuts[p - 1] if cuts else 0.0
+
+
+class Command(BaseCommand):
+    help = "Đo các route chính qua test client (dữ liệu thay đổi được rollback), ghi/so sánh baseline JSON."
+
+    # Baseline phụ thuộc máy, DB và cỡ dữ liệu nên không commit (.gitignore): tạo
+    # trên máy đo bằng `generate_data` rồi `bench_routes --save`, sau đó chạy
+    # `bench_routes` (không --save) để so sánh.
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--save", action="store_true", help="ghi kết quả lần này làm baseline")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="tỉ lệ p95 được phép chậm hơn baseline")
+        parser.add_argument("--route", action="append", dest="routes", help="chỉ đo route này (lặp lại được)")
+
+    def handle(self, *args, iterations, warmup, baseline, save, tolerance, routes, **options):
+        try:
+            with transaction.atomic():
+                results = self._run(iterations, warmup, routes)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        baseline_path = Path(baseline)
+        previous = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        if not previous and not save:
+            self.stdout.write(f"chưa có baseline {baseline_path}: chạy lại với --save để tạo")
+        elif previous.get("database", connection.vendor) != connection.vendor:
+            self.stdout.write(f"baseline đo trên {previous['database']}, lần này {connection.vendor}: không so sánh")
+            previous = {}
+        regressions = []
+        self.stdout.write(f"{'route':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}  baseline p95/queries")
+        for name, result in results.items():
+            base = previous.get("routes", {}).get(name)
+            note = ""
+            if base:
+                note = f"{base['p95_ms']:>8.1f} {base['queries']:>4}"
+                slower = result["p95_ms"] - base["p95_ms"]
+                if slower > MIN_REGRESSION_MS and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                    regressions.append(f"{name}: p95 {base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+                    note += "  CHẬM HƠN"
+                if result["queries"] > base["queries"]:
+                    regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+                    note += "  THÊM QUERY"
+            self.stdout.write(
+                f"{name:<24} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                f"{result['queries']:>8}  {note}"
+            )
+
+        if save:
+            baseline_path.write_text(json.dumps({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "database": connection.vendor,
+                "iterations": iterations,
+                "routes": results,
+            }, indent=2) + "\n")
+            self.stdout.write(f"đã ghi baseline: {baseline_path}")
+        elif regressions:
+            raise CommandError("Chậm hơn baseline:\n  " + "\n  ".join(regressions))
+
+    def _fixtures(self):
+        product = Product.objects.filter(stock__gt=0).order_by("id").first()
+        category = Category.objects.filter(products__isnull=False).order_by("id").first()
+        if product is None or category is None:
+            raise CommandError("Chưa có sản phẩm còn hàng/danh mục; chạy generate_data trước.")
+        # hàng riêng cho bench để thanh toán lặp lại không hết kho (rollback sau khi đo)
+        Product.objects.filter(pk=product.pk).update(stock=1_000_000)
+        user = User.objects.create(username="__bench_routes__")
+        Address.objects.bulk_create([
+            Address(user=user, recipient_name="Bench", phone="0900000000", address=f"{n} Bench", is_default=n == 0)
+            for n in range(3)
+        ])
+        cart = Cart.objects.create(user=user)
+        return product, category, user, cart
+
+    def _routes(self, product, category, cart):
+        def refill_cart():
+            CartItem.objects.filter(cart=cart).delete()
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            bump_cart_version(cart)
+
+        htmx = {"HTTP_HX_REQUEST": "true"}
+        return {
+            "products:list": (lambda c: c.get(reverse("products:list")), None),
+            "products:list htmx": (lambda c: c.get(reverse("products:list") + "?sort=price_asc", **htmx), None),
+            "products:category": (lambda c: c.get(reverse("products:category", args=[category.slug])), None),
+            "products:detail": (lambda c: c.get(reverse("products:detail", args=[product.slug])), None),
+            "cart:modify": (lambda c: c.post(reverse("cart:modify"),
+                                             {"product": product.pk, "qty": 1, "action": "add"}, **htmx), None),
+            "orders:checkout_confirm": (lambda c: c.post(reverse("orders:checkout_confirm"), **htmx), refill_cart),
+            "accounts:profile": (lambda c: c.get(reverse("accounts:profile")), None),
+        }
+
+    def _run(self, iterations, warmup, only):
+        product, category, user, cart = self._fixtures()
+        # chỉ mục catalog tự dựng ở nền ở lần dùng đầu; dựng trước để chỉ đo trạng thái ổn định
+        for index in (facet_index, search_index):
+            index.build()
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(user)
+        results = {}
+        for name, (request, setup) in self._routes(product, category, cart).items():
+            if only and name not in only:
+                continue
+            latencies, queries = [], []
+            for n in range(warmup + iterations):
+                if setup:
+                    setup()
+                # cả lần đo nằm trong một transaction bị rollback nên on_commit không tự chạy;
+                # chạy ngay sau request như khi commit thật (tăng phiên bản giỏ/kho, rollup)
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    with TestCase.captureOnCommitCallbacks(execute=True):
+                        response = request(client)
+                    elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    raise CommandError(f"{name}: HTTP {response.status_code}")
+                if n >= warmup:
+                    latencies.append(elapsed * 1000)
+                    queries.append(len(captured.captured_queries))
+            cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            results[name] = {
+                "p50_ms": round(_percentile(cuts, 50), 2),
+                "p95_ms": round(_percentile(cuts, 95), 2),
+                "p99_ms": round(_percentile(cuts, 99), 2),
+                "mean_ms": round(statistics.fmean(latencies), 2),
+                "queries": max(queries),
+            }
+        return results
@@ -0,0 +1,188 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from accounts.models import Address, User
+from cart.models import Cart, CartItem
+from core.versions import bump_version
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from products.utils import CATALOG_VERSION, MEDIA_VERSION, STOCK_VERSION
+
+ADJECTIVES = ["Aura", "Luna", "Nova", "Vela", "Orbit", "Mira", "Halo", "Solis", "Ember", "Nimbus", "Zen", "Opal"]
+NOUNS = ["Đèn bàn", "Đèn sàn", "Đèn trần", "Đèn tường", "Đèn thả", "Đèn ngủ", "Đèn đọc sách", "Chao đèn"]
+MATERIALS = ["gỗ sồi", "kim loại", "kính mờ", "vải lanh", "gốm", "mây tre", "đồng thau"]
+STATUS_WEIGHTS = (("completed", 70), ("shipping", 10), ("pending", 12), ("cancelled", 8))
+
+
+@contextmanager
+def explicit_timestamp(model, field_name):
+    # bulk_create luôn ghi đè auto_now_add bằng "bây giờ": tắt tạm để rải created_at theo ngày
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Sinh dữ liệu giả lập (danh mục, sản phẩm, user + 3 địa chỉ, giỏ hàng, đơn hàng) bằng bulk insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=12)
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--carts", type=float, default=0.3, help="tỉ lệ user có giỏ hàng đang mở")
+        parser.add_argument("--guest-carts", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=5_000)
+        parser.add_argument("--days", type=int, default=365, help="rải đơn hàng trong chừng này ngày gần nhất")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["products"] < 1 or options["users"] < 1:
+            raise CommandError("Cần ít nhất 1 sản phẩm và 1 user.")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # tên/slug/username gắn hậu tố theo lần chạy để chạy nhiều lần không đụng unique
+        self.run = f"{int(time.time()):x}"
+        started = time.perf_counter()
+
+        category_ids = self._categories(options["categories"])
+        product_ids = self._products(options["products"], category_ids)
+        user_ids = self._users(options["users"])
+        self._carts(user_ids, product_ids, options["carts"], options["guest_carts"])
+        self._orders(options["orders"], user_ids, product_ids, options["days"])
+
+        self._reset_sequences()
+        # bulk_create không gửi signal: báo cho cache/chỉ mục catalog dựng lại
+        bump_version(CATALOG_VERSION, STOCK_VERSION, MEDIA_VERSION)
+        self.stdout.write(f"xong trong {time.perf_counter() - started:.1f}s")
+
+    # --- tiện ích ---
+
+    def _next_id(self, model):
+        # pk gán sẵn để biết id ngay mà không cần đọc lại (MySQL không trả id từ bulk_create)
+        return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+    def _insert(self, model, objects, label):
+        """Chèn theo lô, mỗi lô một transaction; `objects` là generator."""
+        count, batch, started = 0, [], time.perf_counter()
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, batch_size=self.batch_size)
+                count += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            count += len(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<14} {count:>10} dòng  {count / elapsed if elapsed else 0:>10,.0f} dòng/s")
+        return count
+
+    def _reset_sequences(self):
+        models = [Category, Product, User, Address, Cart, CartItem, Order, OrderItem]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # --- từng bảng ---
+
+    def _categories(self, count):
+        first = self._next_id(Category)
+        self._insert(Category, (
+            Category(pk=first + n, name=f"Bộ sưu tập {n + 1} ({self.run})", slug=f"bo-suu-tap-{n + 1}-{self.run}", order=n)
+            for n in range(count)
+        ), "categories")
+        return list(range(first, first + count))
+
+    def _products(self, count, category_ids):
+        rng, first = self.rng, self._next_id(Product)
+        # giá giữ lại cho OrderItem (mảng int, vài MB cho hàng triệu sản phẩm)
+        self.prices = array("q")
+
+        def products():
+            for n in range(count):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(MATERIALS)} {self.run}-{n}"
+                self.prices.append(rng.randrange(90, 400) * 1_000)
+                yield Product(
+                    pk=first + n, name=name, slug=f"sp-{self.run}-{n}",
+                    description=f"{name}: ánh sáng ấm, phù hợp phòng khách và phòng ngủ.",
+                    price=self.prices[-1],
+                    # khoảng 10% hết hàng, phần còn lại tồn kho lệch về số nhỏ
+                    stock=0 if rng.random() < 0.1 else int(rng.paretovariate(1.2) * 3),
+                )
+
+        self._insert(Product, products(), "products")
+        through = Product.categories.through
+        self._insert(through, (
+            through(product_id=first + n, category_id=category_id)
+            for n in range(count)
+            for category_id in rng.sample(category_ids, min(len(category_ids), rng.choice((1, 1, 2))))
+        ), "  categories")
+        return (first, first + count - 1)
+
+    def _users(self, count):
+        first = self._next_id(User)
+        # băm mật khẩu một lần (PBKDF2 rất chậm), mọi user giả dùng chung
+        password = make_password("luxora-bench")
+        self._insert(User, (
+            User(pk=first + n, username=f"user_{self.run}_{n}", email=f"user_{self.run}_{n}@example.com", password=password)
+            for n in range(count)
+        ), "users")
+        # mỗi user đủ 3 địa chỉ (giới hạn của Address.clean), địa chỉ đầu là mặc định
+        self._insert(Address, (
+            Address(user_id=first + n, recipient_name=f"Khách {n}", phone=f"09{n % 100_000_000:08d}",
+                    address=f"{k + 1} Đường số {n % 500}, Quận {k + 1}, TP.HCM", is_default=k == 0)
+            for n in range(count) for k in range(3)
+        ), "  addresses")
+        return (first, first + count - 1)
+
+    def _pick_items(self, product_ids, most):
+        low, high = product_ids
+        picked = {self.rng.randint(low, high) for _ in range(self.rng.randint(1, most))}
+        return sorted(picked)
+
+    def _carts(self, user_ids, product_ids, ratio, guests):
+        rng, first = self.rng, self._next_id(Cart)
+        owners = [user_id for user_id in range(user_ids[0], user_ids[1] + 1) if rng.random() < ratio] + [None] * guests
+        self._insert(Cart, (Cart(pk=first + n, user_id=owner) for n, owner in enumerate(owners)), "carts")
+        self._insert(CartItem, (
+            CartItem(cart_id=first + n, product_id=product_id, quantity=rng.randint(1, 3))
+            for n in range(len(owners)) for product_id in self._pick_items(product_ids, 4)
+        ), "  items")
+
+    def _orders(self, count, user_ids, product_ids, days):
+        rng, first = self.rng, self._next_id(Order)
+        now = timezone.now()
+        statuses, weights = zip(*STATUS_WEIGHTS)
+
+        def orders():
+            for n in range(count):
+                # đơn dày hơn ở những ngày gần đây
+                age = timedelta(days=days * rng.random() ** 1.5, seconds=rng.randrange(86_400))
+                yield Order(
+                    pk=first + n, user_id=rng.randint(*user_ids), full_name=f"Khách {n}", phone="0900000000",
+                    address="1 Đường số 1, TP.HCM", created_at=now - age,
+                    status=rng.choices(statuses, weights)[0],
+                )
+
+        with explicit_timestamp(Order, "created_at"):
+            self._insert(Order, orders(), "orders")
+        self._insert(OrderItem, (
+            OrderItem(order_id=first + n, product_id=product_id, quantity=rng.randint(1, 3), price=self.prices[product_id - product_ids[0]])
+            for n in range(count) for product_id in self._pick_items(product_ids, 5)
+        ), "  items")
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Cart
+from core.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = "Xóa session hết hạn theo lô, cùng giỏ hàng khách chỉ session đó tham chiếu."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        Session = SessionStore.get_model_class()
+        store = SessionStore()
+        now = timezone.now()
+        started = time.perf_counter()
+        sessions = carts = 0
+
+        while True:
+            rows = list(
+                Session.objects.filter(expire_date__lt=now)
+                .order_by("session_key")
+                .values_list("session_key", "session_data")[:batch_size]
+            )
+            if not rows:
+                break
+            # giỏ khách chỉ được nhận diện qua cart_id trong session, nên giải mã trước khi xóa
+            cart_ids = {data["cart_id"] for data in (store.decode(session_data) for _, session_data in rows) if data.get("cart_id")}
+            with transaction.atomic():
+                if cart_ids:
+                    _, by_model = Cart.objects.filter(pk__in=cart_ids, user__isnull=True).delete()
+                    carts += by_model.get(Cart._meta.label, 0)
+                sessions += Session.objects.filter(session_key__in=[key for key, _ in rows]).delete()[0]
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"đã xóa {sessions} session hết hạn, {carts} giỏ khách trong {elapsed:.1f}s"
+            f" ({sessions / elapsed if elapsed else 0:,.0f} session/s)"
+        )
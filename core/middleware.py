@@ -0,0 +1,24 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .versions import snapshot
+
+
+class VersionSnapshotMiddleware:
+    """Mỗi request đọc phiên bản dữ liệu (core/versions.py) một lần rồi dùng lại."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with snapshot():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with snapshot():
+            return await self.get_response(request)
@@ -0,0 +1,151 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+# dưới ngưỡng này vẫn đếm chính xác (COUNT(*) còn rẻ, và số trang khớp tuyệt đối)
+ESTIMATE_COUNT_ABOVE = 10_000
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _after(ordering, values):
+    # (a, b, c) > (x, y, z) viết lại thành a > x OR (a = x AND b > y) OR ...
+    # để hỗ trợ cả các cột sắp xếp ngược chiều nhau
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def _ordering_field(queryset, name):
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    field = queryset.model._meta.get_field(name)
+    # GeneratedField: kiểu giá trị là output_field
+    return getattr(field, "output_field", field)
+
+
+def _cursor_values(queryset, ordering, cursor):
+    """Giá trị con trỏ đã chuyển về kiểu của từng cột sắp xếp.
+
+    Con trỏ đến từ client nên có thể bị sửa: sai số phần tử, sai kiểu hay
+    null thì trả None (coi như không có con trỏ, về trang đầu) thay vì để
+    filter() ném lỗi thành 500.
+    """
+    values = decode_cursor(cursor)
+    if values is None or len(values) != len(ordering):
+        return None
+    try:
+        converted = []
+        for field_name, value in zip(ordering, values):
+            if value is None:
+                return None
+            field = _ordering_field(queryset, field_name.lstrip("-"))
+            value = field.to_python(value)
+            field.get_prep_value(value)
+            converted.append(value)
+    except (ValidationError, TypeError, ValueError, OverflowError):
+        return None
+    return converted
+
+
+def _page_queryset(queryset, ordering, cursor, page_size):
+    values = _cursor_values(queryset, ordering, cursor)
+    queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset[:page_size + 1]
+
+
+def _split_page(items, ordering, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip("-")) for field in ordering])
+    return items, next_cursor
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """Phân trang theo con trỏ (keyset) thay cho OFFSET.
+
+    `ordering` phải kết thúc bằng một cột duy nhất (thường là id) để thứ tự ổn
+    định. Trả về (danh sách bản ghi, con trỏ trang sau hoặc None).
+    """
+    items = list(_page_queryset(queryset, ordering, cursor, page_size))
+    return _split_page(items, ordering, page_size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=20):
+    """Bản async của keyset_page (async ORM, dùng trong view async)."""
+    items = [item async for item in _page_queryset(queryset, ordering, cursor, page_size)]
+    return _split_page(items, ordering, page_size)
+
+
+def estimated_row_count(model, using="default"):
+    """Số dòng ước lượng từ thống kê của DB (không quét bảng); None nếu DB không có số liệu."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "sqlite":
+            # chỉ có sau khi chạy ANALYZE
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if not cursor.fetchone():
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator cho admin của bảng lớn: danh sách không lọc dùng số dòng ước lượng thay cho COUNT(*).
+
+    COUNT(*) trên InnoDB phải quét cả index; với bảng hàng triệu dòng đó là
+    phần chậm nhất của trang changelist. Khi có lọc/tìm kiếm thì vẫn đếm chính
+    xác. Số trang cuối có thể lệch một ít so với thực tế.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATE_COUNT_ABOVE:
+                return estimate
+        return super().count
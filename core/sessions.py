@@ -0,0 +1,72 @@
+import hashlib
+import time
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+# khoảng tối thiểu giữa hai lần ghi chỉ để gia hạn expire_date khi dữ liệu không đổi
+SESSION_REFRESH_INTERVAL = 60 * 60
+# mốc lần ghi gần nhất, lưu kèm dữ liệu session (bị tách ra khi load nên view không thấy)
+SAVED_AT_KEY = "_saved_at"
+
+
+class SessionStore(DBStore):
+    """Session lưu DB, bỏ qua lần ghi khi dữ liệu không đổi.
+
+    Middleware gọi save() mỗi khi session bị đánh dấu modified, kể cả khi gán
+    lại đúng giá trị cũ. Ở đây dữ liệu được so với bản đã load (qua digest của
+    bản mã hóa JSON); nếu giống và lần ghi trước chưa quá
+    SESSION_REFRESH_INTERVAL thì không ghi DB. Do đó expire_date được gia
+    hạn tối đa mỗi giờ một lần, trễ hơn cookie nhiều nhất chừng ấy.
+
+    Không dùng cached_db: nếu cache không dùng chung giữa các tiến trình thì
+    logout/flush/cycle_key chỉ xóa bản cache ở một worker, các worker khác vẫn
+    trả session cũ. Đọc DB theo khóa chính mỗi request là đủ rẻ.
+    """
+
+    def _digest(self, data):
+        return hashlib.blake2b(self.serializer().dumps(data), digest_size=16).digest()
+
+    def _remember(self, data):
+        self._saved_at = data.pop(SAVED_AT_KEY, None)
+        self._loaded_digest = self._digest(data)
+        return data
+
+    def load(self):
+        return self._remember(super().load())
+
+    async def aload(self):
+        return self._remember(await super().aload())
+
+    def _unchanged(self, must_create):
+        if must_create or getattr(self, "_loaded_digest", None) is None:
+            return False
+        return time.time() - (self._saved_at or 0) < SESSION_REFRESH_INTERVAL and self._digest(self._session) == self._loaded_digest
+
+    def _stamp(self):
+        self._session[SAVED_AT_KEY] = int(time.time())
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            # create() gọi lại save(must_create=True)
+            return self.create()
+        if self._unchanged(must_create):
+            return
+        self._stamp()
+        try:
+            super().save(must_create)
+        finally:
+            saved_at = self._session.pop(SAVED_AT_KEY, None)
+        # chỉ cập nhật mốc so sánh khi đã ghi thành công
+        self._saved_at, self._loaded_digest = saved_at, self._digest(self._session)
+
+    async def asave(self, must_create=False):
+        if self.session_key is None:
+            return await self.acreate()
+        if self._unchanged(must_create):
+            return
+        self._stamp()
+        try:
+            await super().asave(must_create)
+        finally:
+            saved_at = self._session.pop(SAVED_AT_KEY, None)
+        # chỉ cập nhật mốc so sánh khi đã ghi thành công
+        self._saved_at, self._loaded_digest = saved_at, self._digest(self._session)
@@ -0,0 +1,285 @@
+import io
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts.models import Address, User
+from cart.models import Cart, CartItem
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from core.pagination import _page_queryset, encode_cursor, keyset_page
+from core.sessions import SAVED_AT_KEY, SESSION_REFRESH_INTERVAL, SessionStore
+from orders.models import Order, OrderItem
+from orders.views import ORDER_LIST_ORDERING, ORDER_PAGE_SIZE, get_user_orders_ordered
+from products.models import Category, Product
+from products.utils import category_products
+from products.views import PRODUCT_PAGE_SIZE, PRODUCT_SORTS
+
+
+def _pages(name, queryset, ordering, page_size):
+    # trang đầu và trang sau (điều kiện keyset theo con trỏ) có plan khác nhau
+    _, cursor = keyset_page(queryset, ordering, None, page_size)
+    yield name, _page_queryset(queryset, ordering, None, page_size)
+    if cursor:
+        yield f"{name} (trang sau)", _page_queryset(queryset, ordering, cursor, page_size)
+
+
+def hot_querysets(user, order, cart_item, product, category):
+    """Các queryset của đường nóng, dựng trên user/giỏ/danh mục mẫu."""
+    for sort, ordering in PRODUCT_SORTS.items():
+        yield from _pages(f"products:list sort={sort}", Product.objects.all(), ordering, PRODUCT_PAGE_SIZE)
+        yield from _pages(f"products:category sort={sort}", category_products(category.id), ordering, PRODUCT_PAGE_SIZE)
+    yield "products:detail", Product.objects.filter(slug=product.slug)
+    yield from _pages("orders:list", get_user_orders_ordered(user), ORDER_LIST_ORDERING, ORDER_PAGE_SIZE)
+    yield "orders:list items", OrderItem.objects.filter(order_id__in=[order.pk]).select_related("product").order_by("id")
+    yield "checkout default address", Address.objects.filter(user=user, is_default=True)[:1]
+    yield "cart item by product", CartItem.objects.filter(cart_id=cart_item.cart_id, product_id=cart_item.product_id)
+    yield "cart items", CartItem.objects.filter(cart_id=cart_item.cart_id).select_related("product").order_by("id")
+
+
+def explain(queryset):
+    """Trả về (các dòng plan, các vấn đề: quét toàn bảng / sắp xếp ngoài index)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            lines = [row[-1] for row in cursor.fetchall()]
+            problems = [
+                line for line in lines
+                if (line.startswith("SCAN ") and " USING " not in line) or line.startswith("USE TEMP B-TREE")
+            ]
+        elif connection.vendor == "mysql":
+            cursor.execute(f"EXPLAIN {sql}", params)
+            columns = [col[0].lower() for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            lines = [
+                f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row.get('extra') or ''}".strip()
+                for row in rows
+            ]
+            problems = [
+                line for row, line in zip(rows, lines)
+                if row["type"] == "ALL" or "filesort" in (row.get("extra") or "")
+            ]
+        else:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            lines = [row[0] for row in cursor.fetchall()]
+            problems = [line for line in lines if "Seq Scan" in line or line.strip(" ->").startswith("Sort ")]
+    return lines, problems
+
+
+class QueryPlanTests(TestCase):
+    """Plan của các query đường nóng phải đi theo index: quét toàn bảng hay sắp xếp ngoài index là lỗi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # đủ dòng để có trang sau ở mọi danh sách và để planner không chọn quét bảng nhỏ
+        categories = [Category.objects.create(name=f"Danh mục {n}") for n in range(4)]
+        products = Product.objects.bulk_create([
+            Product(name=f"Sản phẩm {n}", slug=f"san-pham-{n}", price=10_000 * (n % 37 + 1), stock=n % 5)
+            for n in range(200)
+        ])
+        Product.categories.through.objects.bulk_create([
+            Product.categories.through(product=product, category=categories[n % len(categories)])
+            for n, product in enumerate(products)
+        ])
+        users = User.objects.bulk_create([User(username=f"khach-{n}") for n in range(20)])
+        Address.objects.bulk_create([
+            Address(user=user, recipient_name=user.username, phone="0900000000", address="1 Lê Lợi", is_default=n == 0)
+            for user in users for n in range(2)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(user=users[n % len(users)], full_name="Khách", phone="0900000000", address="1 Lê Lợi",
+                  status="cancelled" if n % 7 == 0 else "pending")
+            for n in range(400)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[(n + k) % len(products)], quantity=1, price=10_000)
+            for n, order in enumerate(orders) for k in range(2)
+        ])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=products[(n * 3 + k) % len(products)], quantity=1)
+            for n, cart in enumerate(carts) for k in range(3)
+        ])
+        # cập nhật thống kê cho planner; MySQL tự tính lại thống kê InnoDB và
+        # ANALYZE TABLE ở đó tự commit, phá transaction của TestCase
+        if connection.vendor in ("sqlite", "postgresql"):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        cls.user = users[0]
+        cls.order = Order.objects.filter(user=cls.user).order_by("-id").first()
+        cls.cart_item = CartItem.objects.filter(cart__user=cls.user).order_by("-id").first()
+        cls.product = products[-1]
+        cls.category = categories[0]
+
+    def test_hot_queries_use_indexes(self):
+        querysets = list(hot_querysets(self.user, self.order, self.cart_item, self.product, self.category))
+        self.assertTrue(any(name.endswith("(trang sau)") for name, _ in querysets))
+        for name, queryset in querysets:
+            with self.subTest(name):
+                lines, problems = explain(queryset)
+                self.assertEqual(problems, [], "\n".join(lines))
+
+
+class KeysetPageTests(TestCase):
+    """Phân trang theo con trỏ: đi hết các trang khi nhiều dòng trùng khóa sắp xếp, con trỏ hỏng thì về trang đầu."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # nhiều sản phẩm cùng giá và cùng tình trạng kho: chỉ id phân biệt thứ tự
+        Product.objects.bulk_create([
+            Product(name=f"Đèn cùng giá {n}", slug=f"den-cung-gia-{n}", price=200_000 if n % 3 else 150_000,
+                    stock=0 if n % 5 == 0 else 3)
+            for n in range(17)
+        ])
+
+    def _walk(self, ordering, page_size=4):
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(Product.objects.all(), ordering, cursor, page_size)
+            self.assertLessEqual(len(items), page_size)
+            seen += [item.pk for item in items]
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_everything_across_equal_sort_keys(self):
+        for sort, ordering in PRODUCT_SORTS.items():
+            with self.subTest(sort=sort):
+                expected = list(Product.objects.order_by(*ordering).values_list("pk", flat=True))
+                self.assertEqual(self._walk(ordering), expected)
+
+    def _first_page(self, ordering):
+        return keyset_page(Product.objects.all(), ordering, None, 4)
+
+    def test_tampered_cursor_means_first_page(self):
+        ordering = PRODUCT_SORTS["price_asc"]
+        cursors = {
+            "không phải base64": "%%%",
+            "không phải JSON": "bm90IGpzb24",
+            "không phải danh sách": encode_cursor({"price": 1}),
+            "sai kiểu": encode_cursor([False, "re lam", 3]),
+            "null": encode_cursor([False, None, 3]),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                self.assertEqual(keyset_page(Product.objects.all(), ordering, cursor, 4), self._first_page(ordering))
+        # số quá lớn vẫn là con trỏ hợp lệ (không còn trang nào sau nó), không được ném lỗi
+        items, _ = keyset_page(Product.objects.all(), ordering, encode_cursor([True, "1e400", 10 ** 30]), 4)
+        self.assertEqual(items, [])
+
+    def test_cursor_with_wrong_arity_means_first_page(self):
+        ordering = PRODUCT_SORTS["price_asc"]
+        for values in ([False, 200_000], [False, 200_000, 5, 6], []):
+            with self.subTest(values=values):
+                self.assertEqual(keyset_page(Product.objects.all(), ordering, encode_cursor(values), 4),
+                                 self._first_page(ordering))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_view_does_not_fail_on_bad_cursor(self):
+        response = self.client.get(reverse("products:list"), {"cursor": encode_cursor([1, 2]), "sort": "price_asc"},
+                                   HTTP_HX_REQUEST="true")
+        self.assertEqual(response.status_code, 200)
+
+
+class SessionStoreTests(TestCase):
+    """Session chỉ được ghi lại khi dữ liệu đổi, hoặc để gia hạn sau SESSION_REFRESH_INTERVAL."""
+
+    def setUp(self):
+        store = SessionStore()
+        store["cart_id"] = 7
+        store.save()
+        self.key = store.session_key
+
+    def _loaded(self):
+        store = SessionStore(self.key)
+        self.assertEqual(store["cart_id"], 7)  # load: một query
+        return store
+
+    def test_unchanged_session_is_not_written(self):
+        store = self._loaded()
+        store["cart_id"] = 7  # gán lại đúng giá trị cũ vẫn đánh dấu modified
+        self.assertTrue(store.modified)
+        with self.assertNumQueries(0):
+            store.save()
+
+    def test_changed_session_is_written(self):
+        store = self._loaded()
+        store["cart_id"] = 8
+        store.save()
+        self.assertEqual(SessionStore(self.key)["cart_id"], 8)
+        # lần lưu tiếp theo với cùng dữ liệu lại được bỏ qua
+        with self.assertNumQueries(0):
+            store.save()
+
+    def test_saved_at_is_hidden_from_views(self):
+        store = self._loaded()
+        self.assertNotIn(SAVED_AT_KEY, store.keys())
+        self.assertIn(SAVED_AT_KEY, Session.objects.get(session_key=self.key).get_decoded())
+
+    def test_unchanged_session_is_refreshed_after_interval(self):
+        store = self._loaded()
+        later = time.time() + SESSION_REFRESH_INTERVAL + 1
+        with mock.patch("core.sessions.time.time", return_value=later):
+            store.save()
+        self.assertEqual(Session.objects.get(session_key=self.key).get_decoded()[SAVED_AT_KEY], int(later))
+        # mốc mới: ngay sau đó lại bỏ qua
+        with mock.patch("core.sessions.time.time", return_value=later + 1), self.assertNumQueries(0):
+            store.save()
+
+    async def test_async_save_skips_unchanged_data(self):
+        store = SessionStore(self.key)
+        self.assertEqual(await store.aget("cart_id"), 7)
+        with mock.patch.object(DBStore, "asave") as write:
+            await store.aset("cart_id", 7)
+            await store.asave()
+            write.assert_not_awaited()
+            await store.aset("cart_id", 8)
+            await store.asave()
+            write.assert_awaited_once()
+
+
+class FixtureRoundTripTests(TestCase):
+    """dump_fixtures.py rồi load_fixtures.py phải trả lại đúng dữ liệu, kể cả các cột auto_now."""
+
+    def test_dump_then_load_keeps_timestamps(self):
+        import dump_fixtures
+        import load_fixtures
+
+        past = datetime(2020, 1, 2, 9, 15, tzinfo=dt_timezone.utc)
+        category = Category.objects.create(name="Đèn cổ")
+        product = Product.objects.create(name="Đèn dầu", slug="den-dau", price=250_000, stock=4)
+        product.categories.add(category)
+        user = User.objects.create_user("khach-cu")
+        cart = Cart.objects.create(user=user)
+        order = Order.objects.create(user=user, full_name="Khách", phone="0900000000", address="1 Lê Lợi")
+        Product.objects.filter(pk=product.pk).update(created_at=past)
+        Cart.objects.filter(pk=cart.pk).update(created_at=past, updated_at=past)
+        Order.objects.filter(pk=order.pk).update(created_at=past)
+
+        with tempfile.TemporaryDirectory() as out, redirect_stdout(io.StringIO()):
+            paths = []
+            for label in ("products.Product", "cart.Cart", "orders.Order"):
+                _, count, path, *_, error = dump_fixtures.dump_model(label, out_dir=out, fmt="jsonl", compress="gzip")
+                self.assertIsNone(error)
+                self.assertEqual(count, 1)
+                paths.append(path)
+            Order.objects.all().delete()
+            Cart.objects.all().delete()
+            Product.objects.all().delete()
+            for path in paths:
+                load_fixtures.load_file(path)
+
+        loaded = Product.objects.get(pk=product.pk)
+        self.assertEqual((loaded.created_at, loaded.slug, loaded.stock), (past, "den-dau", 4))
+        self.assertEqual(list(loaded.categories.all()), [category])
+        cart = Cart.objects.get(pk=cart.pk)
+        self.assertEqual((cart.created_at, cart.updated_at, cart.user_id), (past, past, user.pk))
+        self.assertEqual(Order.objects.get(pk=order.pk).created_at, past)
+        # chỉ tắt trong lúc nạp: lưu bình thường vẫn tự ghi thời điểm
+        self.assertTrue(Order._meta.get_field("created_at").auto_now_add)
+        self.assertTrue(Cart._meta.get_field("updated_at").auto_now)
@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+# Bộ đếm phiên bản dữ liệu dùng chung qua cache mặc định (Redis hoặc bảng cache
+# trong DB, xem CACHES; không được là LocMem vì mỗi tiến trình một bản).
+# Giá trị là thời điểm thay đổi (nanosecond) nên luôn tăng, kể cả khi key bị
+# cache loại bỏ rồi khởi tạo lại, và dùng được làm mốc Last-Modified.
+#
+# Trong một request (core.middleware.VersionSnapshotMiddleware) phiên bản chỉ
+# được đọc một lần: lượt đọc đầu tiên lấy luôn các namespace đăng ký qua
+# `preload()` trong cùng một get_many, các lượt sau (decorator, fragment,
+# điều hướng, chỉ mục) đọc lại bản đã lấy.
+
+_snapshot = ContextVar("version_snapshot", default=None)
+_preload = []
+
+
+def _key(namespace):
+    return f"version:{namespace}"
+
+
+def preload(*namespaces):
+    """Đăng ký namespace được đọc kèm ở lượt đọc phiên bản đầu tiên của mỗi request."""
+    _preload.extend(namespace for namespace in namespaces if namespace not in _preload)
+
+
+@contextmanager
+def snapshot():
+    token = _snapshot.set({})
+    try:
+        yield
+    finally:
+        _snapshot.reset(token)
+
+
+def _read(namespaces):
+    keys = [_key(namespace) for namespace in namespaces]
+    stored = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = stored.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return tuple(versions)
+
+
+def _wanted(memo, namespaces):
+    missing = [namespace for namespace in namespaces if namespace not in memo]
+    if not missing:
+        return []
+    return list(dict.fromkeys([*missing, *(namespace for namespace in _preload if namespace not in memo)]))
+
+
+def get_versions(*namespaces):
+    """Phiên bản của nhiều namespace, một lượt đọc cache (get_many)."""
+    memo = _snapshot.get()
+    if memo is None:
+        return _read(namespaces)
+    wanted = _wanted(memo, namespaces)
+    if wanted:
+        memo.update(zip(wanted, _read(wanted)))
+    return tuple(memo[namespace] for namespace in namespaces)
+
+
+def get_version(namespace):
+    return get_versions(namespace)[0]
+
+
+def _remember(namespaces, now):
+    # request vừa đổi dữ liệu thì các lượt đọc sau trong request thấy phiên bản mới
+    memo = _snapshot.get()
+    if memo is not None:
+        memo.update(dict.fromkeys(namespaces, now))
+
+
+def bump_version(*namespaces):
+    now = time.time_ns()
+    cache.set_many({_key(namespace): now for namespace in namespaces}, None)
+    _remember(namespaces, now)
+    return now
+
+
+async def aget_versions(*namespaces):
+    memo = _snapshot.get()
+    # aget_many mặc định của BaseCache đọc từng key một; get_many của backend thì một lượt
+    if memo is None:
+        return await sync_to_async(_read)(namespaces)
+    wanted = _wanted(memo, namespaces)
+    if wanted:
+        memo.update(zip(wanted, await sync_to_async(_read)(wanted)))
+    return tuple(memo[namespace] for namespace in namespaces)
+
+
+async def aget_version(namespace):
+    return (await aget_versions(namespace))[0]
+
+
+async def abump_version(*namespaces):
+    now = time.time_ns()
+    await cache.aset_many({_key(namespace): now for namespace in namespaces}, None)
+    _remember(namespaces, now)
+    return now
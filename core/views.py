@@ -1,10 +1,14 @@
-from django.http import HttpResponse
-from django.shortcuts import render, get_object_or_404
-from products.models import Category, Product
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, Http404
+from django.shortcuts import render
+from products.fragments import cached_partial, catalog_page
+from products.models import Product
+from products.utils import aget_site_navigation, get_site_navigation
 from .models import ContactMessage
 
+@catalog_page
 def home_view(request):
-    categories = Category.objects.all().order_by('order')
+    categories = get_site_navigation()['categories']
     new_products = Product.objects.order_by('-created_at')[:10]  # lấy 10 sản phẩm mới nhất
     return render(request, 'home.html', {
         'categories': categories,
@@ -26,10 +30,13 @@ def contact_submit(request):
         return res
     return HttpResponse("<p class='text-red-600 font-medium'>Vui lòng gửi lại!</p>")
 
-def nav_category_products(request, slug):
-    category = get_object_or_404(Category.objects.prefetch_related('products'), slug=slug)
-    products = category.products.all()[:3]
-    return render(request, 'products/partials/category_products.html', {
+@cached_partial
+async def nav_category_products(request, slug):
+    category = (await aget_site_navigation())['by_slug'].get(slug)
+    if category is None:
+        raise Http404("Category not found")
+    products = [product async for product in category.products.all()[:3]]
+    return await sync_to_async(render)(request, 'products/partials/category_products.html', {
         'category': category,
         'products': products,
     })
\ No newline at end of file
@@ -5,15 +5,26 @@ Usage (inside your project's virtualenv):
   python dump_fixtures.py --all
   python dump_fixtures.py --models accounts.User products.Product orders.Order
   python dump_fixtures.py --out ./my_fixtures --models accounts.User
+  python dump_fixtures.py --all --format jsonl --compress gzip --workers 4
 
 Notes:
 - Run with the project's venv python (or activate venv first).
 - The script writes to the app's fixtures/ directory when possible.
+- Rows are read in primary-key chunks (--chunk-size) and written as they
+  are read, so memory stays flat regardless of table size. Many-to-many
+  values are read with one query per M2M table per chunk.
+- --format json writes a loaddata-compatible array; jsonl writes one
+  fixture object per line (see load_fixtures.py).
+- --compress zstd needs the `zstandard` package.
 """
 import os
 import sys
 import json
+import gzip
 import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from decimal import Decimal
 from datetime import datetime, date
 from pathlib import Path
@@ -21,16 +32,19 @@ from pathlib import Path
 import django
 from django.apps import apps
 from django.conf import settings
+from django.db import connections
 
 # --- Bootstrap Django ---
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "luxora.settings")
 django.setup()
 
+COMPRESS_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
 
 def convert_value(v):
     if v is None:
         return None
-    if isinstance(v, (int, float, str, bool)):
+    if isinstance(v, (int, float, str, bool, dict, list)):
         return v
     if isinstance(v, Decimal):
         # prefer int when no fractional part
@@ -44,39 +58,59 @@ def convert_value(v):
     return str(v)
 
 
-def model_to_fixture(model, qs=None):
+def _dump_fields(model):
+    # cột cần ghi: bỏ khóa chính (ghi riêng ở "pk") và cột do DB tự tính (GeneratedField)
+    return [
+        f for f in model._meta.local_fields
+        if not getattr(f, "auto_created", False) and not f.primary_key and not getattr(f, "generated", False)
+    ]
+
+
+def _m2m_values(m2m, low, high):
+    """{pk nguồn: [pk đích, ...]} cho các dòng có pk trong [low, high], một câu cho cả khoảng."""
+    through = m2m.remote_field.through
+    source = m2m.m2m_field_name()
+    target = m2m.m2m_reverse_field_name()
+    values = {}
+    rows = (through.objects.filter(**{f"{source}__gte": low, f"{source}__lte": high})
+            .order_by(source, "pk").values_list(f"{source}_id", f"{target}_id"))
+    for source_pk, target_pk in rows:
+        values.setdefault(source_pk, []).append(target_pk)
+    return values
+
+
+def iter_fixture(model, chunk_size=2000):
+    """Sinh từng object fixture theo thứ tự pk, đọc DB theo từng khúc `chunk_size` dòng.
+
+    Phân trang keyset (pk > pk cuối của khúc trước) thay vì iterator(): driver
+    MySQL tải cả kết quả vào bộ nhớ dù có iterator, còn khúc keyset thì không.
+    """
     model_label = f"{model._meta.app_label}.{model._meta.model_name}"
-    qs = qs or model.objects.all()
-    fixtures = []
-    # collect m2m field names
-    m2m_field_names = [f.name for f in model._meta.many_to_many]
-    # collect local fields to include (exclude AutoField pk handled separately)
-    local_fields = [f for f in model._meta.local_fields if not getattr(f, "auto_created", False)]
-    for inst in qs:
-        pk = getattr(inst, inst._meta.pk.name)
-        fields = {}
-        for field in local_fields:
-            name = field.name
-            if field.primary_key:
-                continue
-            val = getattr(inst, name)
-            # for ForeignKey store related pk (or None)
-            if field.get_internal_type() == "ForeignKey" or field.many_to_one:
-                fields[name] = convert_value(getattr(val, val._meta.pk.name) if val else None)
-            else:
-                fields[name] = convert_value(val)
-        # many-to-many
-        for m2m in m2m_field_names:
-            try:
-                values = list(getattr(inst, m2m).values_list("pk", flat=True))
-            except Exception:
-                values = []
-            fields[m2m] = values
-        fixtures.append({"model": model_label, "pk": pk, "fields": fields})
-    return fixtures
-
-
-def write_fixture(app_label, model_name, data, out_dir=None):
+    fields = _dump_fields(model)
+    pk_name = model._meta.pk.attname
+    columns = [pk_name] + [f.attname for f in fields]
+    names = [f.name for f in fields]
+    m2m_fields = list(model._meta.many_to_many)
+    queryset = model._base_manager.order_by(pk_name).values_list(*columns)
+
+    last = None
+    while True:
+        chunk = queryset.filter(**{f"{pk_name}__gt": last}) if last is not None else queryset
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        low, last = rows[0][0], rows[-1][0]
+        m2m = [(f.name, _m2m_values(f, low, last)) for f in m2m_fields]
+        for row in rows:
+            record = {name: convert_value(value) for name, value in zip(names, row[1:])}
+            for name, values in m2m:
+                record[name] = values.get(row[0], [])
+            yield {"model": model_label, "pk": row[0], "fields": record}
+        if len(rows) < chunk_size:
+            return
+
+
+def fixture_path(app_label, model_name, out_dir=None, fmt="json", compress=None):
     # choose fixtures dir: <app>/fixtures/ if exists, else project_root/fixtures/<app>/
     app_path = Path(app_label)
     if app_path.exists():
@@ -86,34 +120,104 @@ def write_fixture(app_label, model_name, data, out_dir=None):
     if out_dir:
         fixtures_dir = Path(out_dir) / app_label
     fixtures_dir.mkdir(parents=True, exist_ok=True)
-    file_path = fixtures_dir / f"{model_name}.json"
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return file_path
+    return fixtures_dir / f"{model_name}.{fmt}{COMPRESS_SUFFIXES[compress]}"
 
 
-def dump_models(model_labels, out_dir=None):
-    total = 0
-    for label in model_labels:
-        try:
-            model = apps.get_model(label)
-        except LookupError:
-            print(f"✖ Model not found: {label}")
-            continue
-        print(f"Dumping {label} ...", end=" ")
+def open_output(path, compress=None):
+    if compress == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compress == "zstd":
         try:
-            fixtures = model_to_fixture(model)
-        except AttributeError as e:
-            # Manager not available (e.g. swapped user model or import-time issues)
-            print(f"skipped (manager not available): {e}")
-            continue
-        if not fixtures:
-            print("no rows, skipped")
-            continue
-        path = write_fixture(model._meta.app_label, model._meta.model_name, fixtures, out_dir=out_dir)
-        print(f"wrote {len(fixtures)} -> {path}")
-        total += len(fixtures)
-    print(f"Done. Total rows dumped: {total}")
+            import zstandard
+        except ImportError:
+            raise SystemExit("--compress zstd needs the `zstandard` package (pip install zstandard)")
+        import io
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, "wb")), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def write_fixture(records, path, fmt="json", compress=None, indent=2):
+    """Ghi dần các object vào file; trả về số object đã ghi."""
+    count = 0
+    with open_output(path, compress) as f:
+        if fmt == "jsonl":
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+            return count
+
+        # mảng JSON giống json.dump(indent=2) nhưng ghi từng phần tử một
+        f.write("[")
+        for record in records:
+            text = json.dumps(record, ensure_ascii=False, indent=indent)
+            if indent:
+                text = "\n" + "\n".join(" " * indent + line for line in text.split("\n"))
+            f.write(("," if count else "") + text)
+            count += 1
+        f.write("\n]" if indent and count else "]")
+    return count
+
+
+def peak_memory_mb():
+    # ru_maxrss: KB trên Linux, byte trên macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def dump_model(label, out_dir=None, fmt="json", compress=None, chunk_size=2000, indent=2):
+    """Dump một model; chạy được trong tiến trình con. Trả về (label, số dòng, path, MB, giây, lỗi)."""
+    started = time.perf_counter()
+    try:
+        model = apps.get_model(label)
+    except LookupError:
+        return label, 0, None, peak_memory_mb(), 0.0, "model not found"
+
+    try:
+        records = iter_fixture(model, chunk_size)
+        first = next(records, None)
+    except AttributeError as e:
+        # Manager not available (e.g. swapped user model or import-time issues)
+        return label, 0, None, peak_memory_mb(), 0.0, f"skipped (manager not available): {e}"
+    if first is None:
+        return label, 0, None, peak_memory_mb(), time.perf_counter() - started, None
+
+    def all_records():
+        yield first
+        yield from records
+
+    path = fixture_path(model._meta.app_label, model._meta.model_name, out_dir, fmt, compress)
+    count = write_fixture(all_records(), path, fmt, compress, indent)
+    return label, count, path, peak_memory_mb(), time.perf_counter() - started, None
+
+
+def dump_models(model_labels, out_dir=None, fmt="json", compress=None, chunk_size=2000, indent=2, workers=1):
+    total = 0
+    options = dict(out_dir=out_dir, fmt=fmt, compress=compress, chunk_size=chunk_size, indent=indent)
+    if workers > 1 and len(model_labels) > 1:
+        # mỗi model chạy trong một tiến trình riêng; không để tiến trình con dùng chung kết nối DB
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [pool.submit(dump_model, label, **options) for label in model_labels]
+            for future in as_completed(futures):
+                total += report(*future.result())
+    else:
+        for label in model_labels:
+            total += report(*dump_model(label, **options))
+    print(f"Done. Total rows dumped: {total} (peak memory of this process: {peak_memory_mb():.0f} MB)")
+
+
+def report(label, count, path, memory_mb, seconds, error):
+    if error == "model not found":
+        print(f"✖ Model not found: {label}")
+    elif error:
+        print(f"Dumping {label} ... {error}")
+    elif not count:
+        print(f"Dumping {label} ... no rows, skipped")
+    else:
+        rate = count / seconds if seconds else 0
+        print(f"Dumping {label} ... wrote {count} -> {path} ({rate:,.0f} rows/s, peak {memory_mb:.0f} MB)")
+    return count
 
 
 def get_all_models():
@@ -125,6 +229,11 @@ def parse_args():
     p.add_argument("--models", "-m", nargs="+", help="Model labels to dump (app_label.ModelName), e.g. products.Product")
     p.add_argument("--all", action="store_true", help="Dump all installed models")
     p.add_argument("--out", "-o", help="Output base directory for fixtures")
+    p.add_argument("--format", "-f", choices=["json", "jsonl"], default="json", help="JSON array (loaddata) or JSON Lines")
+    p.add_argument("--compress", "-z", choices=["gzip", "zstd"], help="Compress output files")
+    p.add_argument("--chunk-size", type=int, default=2000, help="Rows read from the DB per query")
+    p.add_argument("--indent", type=int, default=2, help="Indent for --format json (0 for compact)")
+    p.add_argument("--workers", "-j", type=int, default=1, help="Dump models in parallel processes")
     return p.parse_args()
 
 
@@ -144,7 +253,8 @@ def main():
             "core.contactmessage" if apps.is_installed("core") else None,
         ]
         models = [m for m in models if m]
-    dump_models(models, out_dir=args.out)
+    dump_models(models, out_dir=args.out, fmt=args.format, compress=args.compress,
+                chunk_size=args.chunk_size, indent=args.indent, workers=args.workers)
 
 
 if __name__ == "__main__":
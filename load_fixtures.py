@@ -0,0 +1,329 @@
+"""
+Bulk-load fixture files written by dump_fixtures.py (or loaddata-style JSON).
+
+Usage (inside your project's virtualenv):
+  python load_fixtures.py accounts/fixtures/user.json products/fixtures/category.json products/fixtures/product.json
+  python load_fixtures.py dump/orders/orderitem.jsonl.gz --batch-size 5000
+  python load_fixtures.py dump/orders/orderitem.jsonl.gz --restart
+
+Notes:
+- Files are loaded in the order given (parents before children, e.g. users
+  before orders). Formats: .json (array) and .jsonl, optionally .gz/.zst.
+- Files are parsed incrementally; each batch of --batch-size objects is
+  inserted with bulk_create inside its own transaction. Model save() and
+  signals do not run; a missing slug is still filled from the name.
+- Timestamps are kept as dumped, like loaddata: auto_now/auto_now_add are
+  switched off while inserting (a missing value is set to the load time).
+- Many-to-many values (e.g. Product.categories) are spooled to disk and
+  inserted into the through tables in one bulk load at the end of the file.
+- Progress is checkpointed to <file>.checkpoint after every committed batch;
+  re-running the same command resumes after the last committed batch.
+"""
+import os
+import sys
+import json
+import gzip
+import argparse
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+# --- Bootstrap Django ---
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "luxora.settings")
+django.setup()
+
+READ_SIZE = 1024 * 1024
+PROGRESS_EVERY = 50_000
+
+
+def open_input(path):
+    name = str(path)
+    if name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if name.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit(".zst input needs the `zstandard` package (pip install zstandard)")
+        import io
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_json_array(f):
+    """Đọc từng phần tử của mảng JSON cấp cao nhất mà không nạp cả file."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started, eof = "", 0, False, False
+    while True:
+        # bỏ khoảng trắng, '[' mở đầu và dấu phẩy giữa các phần tử
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == "," or (not started and buffer[pos] == "[")):
+            started = started or buffer[pos] == "["
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        if pos < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                pos = end
+                continue
+        if eof:
+            return
+        chunk = f.read(READ_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def iter_records(path):
+    with open_input(path) as f:
+        if ".jsonl" in Path(path).name:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+class ModelLoader:
+    """Chuyển object fixture thành instance (chưa lưu) và hàng M2M của nó."""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = {}
+        self.m2m = {}
+        for field in model._meta.local_fields:
+            if getattr(field, "generated", False):
+                continue
+            self.fields[field.name] = field
+        for field in model._meta.many_to_many:
+            self.m2m[field.name] = field
+        self.unknown = set()
+        self.has_slug = "slug" in self.fields and "name" in self.fields
+        self.timestamps = auto_timestamp_fields(model)
+
+    def build(self, record):
+        kwargs = {self.model._meta.pk.attname: record["pk"]}
+        m2m_rows = []
+        for name, value in record["fields"].items():
+            field = self.fields.get(name)
+            if field is not None:
+                if field.is_relation:
+                    kwargs[field.attname] = value
+                else:
+                    kwargs[field.attname] = field.to_python(value)
+            elif name in self.m2m:
+                m2m_rows.append((name, record["pk"], value))
+            else:
+                # cột đã bỏ (vd. cột generated trong dump cũ): bỏ qua
+                self.unknown.add(name)
+        instance = self.model(**kwargs)
+        if self.has_slug and not instance.slug:
+            # save() không chạy nên tự điền slug như model; có sẵn thì giữ nguyên
+            instance.slug = slugify(instance.name)
+        for field in self.timestamps:
+            # auto_now bị tắt khi insert: chỉ điền khi fixture không có giá trị
+            if getattr(instance, field.attname) is None:
+                setattr(instance, field.attname, timezone.now())
+        return instance, m2m_rows
+
+
+class Checkpoint:
+    """Số object đã commit của một file, cùng file spool chứa hàng M2M chờ nạp."""
+
+    def __init__(self, path, restart=False):
+        self.path = Path(f"{path}.checkpoint")
+        self.spool_path = Path(f"{path}.m2m.jsonl")
+        stat = os.stat(path)
+        self.signature = [stat.st_size, stat.st_mtime_ns]
+        self.done = 0
+        if restart:
+            self.clear()
+        elif self.path.exists():
+            state = json.loads(self.path.read_text())
+            if state.get("signature") == self.signature:
+                self.done = state["done"]
+            else:
+                print(f"  checkpoint for {path} belongs to another version of the file, starting over")
+                self.clear()
+
+    def spool(self, rows):
+        if rows:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def save(self, done):
+        self.done = done
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"signature": self.signature, "done": done}))
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        for path in (self.path, self.spool_path):
+            if path.exists():
+                path.unlink()
+
+
+def auto_timestamp_fields(model):
+    return [
+        field for field in model._meta.local_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+
+
+@contextmanager
+def dumped_timestamps(model):
+    """Tắt tạm auto_now/auto_now_add: bulk_create gọi pre_save(add=True) và sẽ ghi đè
+    created_at/updated_at bằng thời điểm nạp (loaddata thì lưu raw nên giữ nguyên)."""
+    fields = [(field, field.auto_now, field.auto_now_add) for field in auto_timestamp_fields(model)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def insert_batch(batch, ignore_conflicts):
+    # giữ thứ tự xuất hiện của model trong lô (file trộn nhiều model như loaddata)
+    by_model = {}
+    for instance in batch:
+        by_model.setdefault(type(instance), []).append(instance)
+    with transaction.atomic():
+        for model, instances in by_model.items():
+            with dumped_timestamps(model):
+                model.objects.bulk_create(instances, batch_size=len(instances), ignore_conflicts=ignore_conflicts)
+
+
+def load_m2m(spool_path, loaders, batch_size):
+    """Nạp hàng M2M đã spool vào through table, theo lô; trùng thì bỏ qua (chạy lại an toàn)."""
+    if not spool_path.exists():
+        return 0
+    total = 0
+    pending = {}
+
+    def flush(through):
+        nonlocal total
+        rows = pending.pop(through)
+        with transaction.atomic():
+            through.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        total += len(rows)
+
+    with open(spool_path, encoding="utf-8") as f:
+        for line in f:
+            label, name, source_pk, target_pks = json.loads(line)
+            field = loaders[label].m2m[name]
+            through = field.remote_field.through
+            source, target = f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+            rows = pending.setdefault(through, [])
+            rows.extend(through(**{source: source_pk, target: target_pk}) for target_pk in target_pks)
+            if len(rows) >= batch_size:
+                flush(through)
+    for through in list(pending):
+        flush(through)
+    return total
+
+
+def load_file(path, batch_size=1000, restart=False):
+    checkpoint = Checkpoint(path, restart)
+    loaders = {}
+    if checkpoint.done:
+        print(f"Resuming {path} after {checkpoint.done} objects")
+    else:
+        print(f"Loading {path}")
+
+    started = time.perf_counter()
+    loaded, seen, batch, m2m_rows = 0, 0, [], []
+    # lô đầu sau khi resume có thể đã commit nhưng chưa kịp ghi checkpoint
+    ignore_conflicts = bool(checkpoint.done)
+
+    def commit():
+        nonlocal loaded, batch, m2m_rows, ignore_conflicts
+        insert_batch(batch, ignore_conflicts)
+        checkpoint.spool(m2m_rows)
+        checkpoint.save(seen)
+        loaded += len(batch)
+        if loaded // PROGRESS_EVERY != (loaded - len(batch)) // PROGRESS_EVERY:
+            rate = loaded / (time.perf_counter() - started)
+            print(f"  {seen} objects ({rate:,.0f} rows/s)")
+        batch, m2m_rows, ignore_conflicts = [], [], False
+
+    for record in iter_records(path):
+        seen += 1
+        label = record["model"].lower()
+        loader = loaders.get(label)
+        if loader is None:
+            loader = loaders[label] = ModelLoader(apps.get_model(label))
+        if seen <= checkpoint.done:
+            continue
+        instance, rows = loader.build(record)
+        batch.append(instance)
+        m2m_rows.extend([label, *row] for row in rows)
+        if len(batch) >= batch_size:
+            commit()
+    if batch:
+        commit()
+
+    m2m_loaded = load_m2m(checkpoint.spool_path, loaders, batch_size)
+    reset_sequences([loader.model for loader in loaders.values()])
+    checkpoint.clear()
+
+    elapsed = time.perf_counter() - started
+    rate = loaded / elapsed if elapsed else 0
+    print(f"  loaded {loaded} objects, {m2m_loaded} m2m rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    for loader in loaders.values():
+        if loader.unknown:
+            print(f"  ignored fields on {loader.model._meta.label}: {', '.join(sorted(loader.unknown))}")
+    return loaded, {loader.model for loader in loaders.values()}
+
+
+def reset_sequences(models):
+    # như loaddata: đưa sequence về sau pk lớn nhất (PostgreSQL/Oracle; SQLite/MySQL tự làm)
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Bulk-load fixture files with bulk_create, resumable.")
+    p.add_argument("files", nargs="+", help="Fixture files (.json/.jsonl, optionally .gz/.zst), loaded in order")
+    p.add_argument("--batch-size", "-b", type=int, default=1000, help="Objects per bulk_create/transaction")
+    p.add_argument("--restart", action="store_true", help="Ignore existing checkpoints and start from the beginning")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    total, models = 0, set()
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"✖ File not found: {path}")
+            sys.exit(1)
+        loaded, file_models = load_file(path, batch_size=args.batch_size, restart=args.restart)
+        total += loaded
+        models |= file_models
+
+    if any(model._meta.app_label == "products" for model in models):
+        # bulk_create không gửi signal: báo cho cache/chỉ mục catalog dựng lại.
+        # Phiên bản nằm trong cache dùng chung (CACHES) nên server đang chạy cũng thấy.
+        from core.versions import bump_version
+        from products.utils import CATALOG_VERSION, MEDIA_VERSION, STOCK_VERSION
+        bump_version(CATALOG_VERSION, STOCK_VERSION, MEDIA_VERSION)
+    print(f"Done. Total objects loaded: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'cart',
     'orders',
     'accounts',
+    'reports',
     'tailwind',
     'theme',
     'django_browser_reload',
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # phiên bản dữ liệu đọc một lần mỗi request (core/versions.py)
+    'core.middleware.VersionSnapshotMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,6 +91,30 @@ DATABASES = {
 }
 
 
+# Cache
+# Phải dùng chung giữa các tiến trình: phiên bản dữ liệu (core/versions.py),
+# điều hướng, fragment cache và số liệu hit/miss đều dựa vào nó, và script/
+# management command chỉ báo được cho server qua đây. Có REDIS_URL thì dùng
+# Redis, không thì bảng cache trong DB (python manage.py createcachetable).
+
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'luxora_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,4 +173,6 @@ MEDIA_ROOT = BASE_DIR / 'media'
 AUTH_USER_MODEL = 'accounts.User'
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+# session lưu DB, chỉ ghi lại khi dữ liệu đổi (core/sessions.py)
+SESSION_ENGINE = 'core.sessions'
@@ -21,6 +21,7 @@ urlpatterns = [
     path('cart/', include(('cart.urls', 'cart'), namespace='cart')),
     path('orders/', include(('orders.urls', 'orders'), namespace='orders')),
     path('accounts/', include(('accounts.urls', 'accounts'), namespace='accounts')),
+    path('reports/', include(('reports.urls', 'reports'), namespace='reports')),
 ]
 
 # Cấu hình hiển thị ảnh & media trong môi trường DEBUG
@@ -1,22 +1,23 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import Order, OrderItem
+from .utils import cancel_orders
+from core.pagination import EstimatedCountPaginator
+from reports.rollups import record_orders_cancelled
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ('product', 'quantity', 'price', 'subtotal_display')
 
+    def get_queryset(self, request):
+        # tên sản phẩm hiển thị ở mỗi dòng: nạp cùng lúc thay vì một query mỗi dòng
+        return super().get_queryset(request).select_related('product')
+
     def subtotal_display(self, obj):
-        # trả giá trị subtotal nếu model có thuộc tính/field subtotal,
-        # nếu không tính tạm bằng quantity * price (nếu có)
-        try:
-            if hasattr(obj, 'subtotal'):
-                return obj.subtotal
-            qty = getattr(obj, 'quantity', None) or 0
-            price = getattr(obj, 'price', None) or 0
-            return qty * price
-        except Exception:
+        # dòng mẫu (trống) của inline chưa có giá/số lượng
+        if obj.pk is None:
             return ''
+        return obj.subtotal
     subtotal_display.short_description = 'Thành tiền'
 
 @admin.register(Order)
@@ -25,23 +26,51 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('user__email', 'id')
     inlines = [OrderItemInline]
+    actions = ['cancel_selected_orders']
+    list_select_related = ('user',)
+    # ô chọn user/sản phẩm dạng dropdown sẽ nạp cả bảng vào form
+    raw_id_fields = ('user',)
+    # id tăng cùng created_at: sắp theo khóa chính thay vì sort cả bảng theo created_at
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # tổng tiền tính bằng subquery trong câu lấy trang, không query lại từng đơn
+        return super().get_queryset(request).with_totals()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            # đổi trạng thái tay không đi qua cancel_orders: chỉ cộng/trừ phần "đã hủy"
+            # của đơn này vào báo cáo, sau khi lần lưu commit
+            was_cancelled = form.initial.get('status') == 'cancelled'
+            if was_cancelled != (obj.status == 'cancelled'):
+                record_orders_cancelled([obj.pk], sign=-1 if was_cancelled else 1)
 
+    @admin.action(description='Hủy các đơn đã chọn và trả lại tồn kho')
+    def cancel_selected_orders(self, request, queryset):
+        # lấy pk trước khi hủy: với bộ lọc trạng thái, queryset chạy lại sau khi hủy sẽ không còn các đơn này
+        selected = list(queryset.values_list('pk', flat=True))
+        result = cancel_orders(selected)
+        skipped = len(selected) - result['orders']
+        self.message_user(
+            request,
+            f"Đã hủy {result['orders']} đơn, trả {result['units']} sản phẩm về kho "
+            f"({result['orders_per_second']:.0f} đơn/s, {result['units_per_second']:.0f} sản phẩm/s)."
+            + (f" Bỏ qua {skipped} đơn không thể hủy." if skipped else ""),
+            messages.SUCCESS if result['orders'] else messages.WARNING,
+        )
+
+    @admin.display(description='Tổng tiền', ordering='_total_amount')
     def total_amount_display(self, obj):
-        # trả total_amount nếu model có, nếu không cộng tay từ items
-        try:
-            if hasattr(obj, 'total_amount'):
-                return obj.total_amount
-            total = 0
-            for it in getattr(obj, 'items', []).all():
-                qty = getattr(it, 'quantity', 0) or 0
-                price = getattr(it, 'price', 0) or 0
-                total += qty * price
-            return total
-        except Exception:
-            return ''
-    total_amount_display.short_description = 'Tổng tiền'
+        return obj.total_amount
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'order', 'product', 'quantity', 'price')
     search_fields = ('product__name',)
+    list_select_related = ('order', 'product')
+    raw_id_fields = ('order', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import Order
+from orders.utils import CANCELLABLE_STATUSES, cancel_orders
+
+
+class Command(BaseCommand):
+    help = "Hủy hàng loạt đơn hàng (vd. cả tuyến giao thất bại) và trả lại tồn kho."
+
+    def add_arguments(self, parser):
+        parser.add_argument("order_ids", nargs="*", type=int, help="Mã đơn cần hủy")
+        parser.add_argument("--file", help="File chứa mã đơn, mỗi dòng một mã")
+        parser.add_argument("--status", choices=CANCELLABLE_STATUSES, help="Hủy mọi đơn đang ở trạng thái này")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Số đơn khóa trong mỗi transaction")
+
+    def handle(self, *args, order_ids, file, status, chunk_size, **options):
+        ids = list(order_ids)
+        if file:
+            with open(file, encoding="utf-8") as f:
+                ids += [int(line) for line in f if line.strip()]
+        if status:
+            ids += list(Order.objects.filter(status=status).values_list("pk", flat=True))
+        if not ids:
+            raise CommandError("Không có đơn nào được chỉ định (dùng order_ids, --file hoặc --status).")
+
+        ids = sorted(set(ids))
+        orders = units = 0
+        start = time.perf_counter()
+        # chia lô để mỗi transaction chỉ khóa một nhóm đơn trong thời gian ngắn
+        for offset in range(0, len(ids), chunk_size):
+            result = cancel_orders(ids[offset:offset + chunk_size])
+            orders += result["orders"]
+            units += result["units"]
+            self.stdout.write(
+                f"  lô {offset // chunk_size + 1}: {result['orders']} đơn, {result['units']} sản phẩm, "
+                f"{result['products']} mã hàng trong {result['elapsed']:.3f}s"
+            )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã hủy {orders}/{len(ids)} đơn, trả {units} sản phẩm về kho trong {elapsed:.2f}s "
+            f"({orders / elapsed:.1f} đơn/s, {units / elapsed:.1f} sản phẩm/s)"
+        ))
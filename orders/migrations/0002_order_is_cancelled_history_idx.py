@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='is_cancelled',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='cancelled', then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'is_cancelled', '-created_at', '-id'], name='order_user_history_idx'),
+        ),
+    ]
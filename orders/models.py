@@ -1,8 +1,34 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from products.models import Product
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        # tổng tiền và số dòng tính trong SQL thay vì cộng từng item trên Python; dùng subquery
+        # tương quan thay cho JOIN + GROUP BY để ORDER BY ... LIMIT vẫn đi theo index của Order
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.annotate(
+            _total_amount=Coalesce(
+                Subquery(items.annotate(total=Sum(F('price') * F('quantity'), output_field=money)).values('total')),
+                Value(0), output_field=money,
+            ),
+            _item_count=Coalesce(Subquery(items.annotate(count=Count('pk')).values('count')), Value(0)),
+        )
+
+    def with_items(self):
+        # nạp item + product của cả trang đơn trong một lần
+        return self.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+        )
+
+    def history(self):
+        return self.with_totals().with_items()
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Đang xử lý'),
@@ -24,9 +50,23 @@ class Order(models.Model):
     transaction_code = models.CharField(max_length=50, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # cột STORED để "đơn đã hủy xếp cuối" trong lịch sử đơn đi theo index thay vì sắp xếp trên CASE
+    is_cancelled = models.GeneratedField(
+        expression=models.Case(models.When(status='cancelled', then=models.Value(True)), default=models.Value(False)),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # lịch sử đơn của một user (orders.views.ORDER_LIST_ORDERING)
+            models.Index(fields=['user', 'is_cancelled', '-created_at', '-id'], name='order_user_history_idx'),
+            # đơn theo khoảng ngày (tính lại báo cáo, reports.rollups.rebuild_days)
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
         verbose_name = "Đơn hàng"
         verbose_name_plural = "Các đơn hàng"
 
@@ -35,8 +75,16 @@ class Order(models.Model):
 
     @property
     def total_amount(self):
+        if hasattr(self, '_total_amount'):
+            return self._total_amount
         return sum(item.subtotal for item in self.items.all())
 
+    @property
+    def item_count(self):
+        if hasattr(self, '_item_count'):
+            return self._item_count
+        return self.items.count()
+
     def can_cancel(self):
         return self.status in ('pending', 'shipping')
 
@@ -0,0 +1,273 @@
+import threading
+import time
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from accounts.models import Address, User
+from cart.models import Cart, CartItem
+from cart.utils import prefetch_cart_items
+from core.versions import get_version
+from products.facets import facet_index
+from products.models import Product
+from products.search import search_index
+from products.utils import STOCK_VERSION
+from .models import Order, OrderItem
+from .utils import InsufficientStock, cancel_orders, place_order
+
+# số lần thử lại khi SQLite báo khóa bảng (xem _retry_locked)
+LOCK_RETRIES = 500
+MIN_ORDERS_PER_SECOND = 5
+
+# số query của các trang admin, không phụ thuộc số dòng trên trang
+ADMIN_QUERY_BUDGETS = {
+    "order changelist": 6,
+    "order changelist (lọc trạng thái)": 5,
+    "order change": 6,
+    "orderitem changelist": 6,
+}
+
+
+def _retry_locked(action):
+    # SQLite trong bộ nhớ (DB test mặc định) báo "table is locked" ngay thay vì chờ
+    # như MySQL/PostgreSQL (khóa dòng) hay SQLite file (busy timeout): thử lại để
+    # các luồng vẫn chạy xen kẽ; transaction lỗi đã được rollback toàn bộ
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return action()
+        except OperationalError as exc:
+            if "locked" not in str(exc) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.001)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Nhiều người cùng mua những đơn vị hàng cuối cùng: không bao giờ bán vượt tồn kho.
+
+    Chạy trên DB test mặc định (SQLite) lẫn MySQL của môi trường thật; số đơn
+    mỗi giây đo được có ý nghĩa nhất khi chạy trên MySQL (settings gốc, biến DB_*).
+    """
+
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Đèn cuối kho", slug="den-cuoi-kho", price=100_000, stock=self.stock)
+        self.carts = []
+        for n in range(self.buyers):
+            user = User.objects.create_user(f"nguoi-mua-{n}")
+            Address.objects.create(user=user, recipient_name=user.username, phone="0900000000", address="1 Lê Lợi",
+                                   is_default=True)
+            cart = Cart.objects.create(user=user)
+            self.carts.append(cart)
+
+    def _checkout_concurrently(self, rounds=1):
+        results = {"placed": 0, "sold_out": 0}
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(self.carts))
+
+        def checkout(cart):
+            try:
+                address = cart.user.addresses.get()
+                barrier.wait(timeout=30)
+                for _ in range(rounds):
+                    _retry_locked(lambda: CartItem.objects.create(cart=cart, product=self.product, quantity=1))
+                    try:
+                        _retry_locked(lambda: place_order(prefetch_cart_items(cart), cart.user, address))
+                        outcome = "placed"
+                    except InsufficientStock:
+                        outcome = "sold_out"
+                    with lock:
+                        results[outcome] += 1
+            except Exception as exc:
+                # lỗi khác (deadlock, barrier hỏng...) đều làm hỏng bài test
+                with lock:
+                    errors.append(f"{cart.user.username}: {exc!r}")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(cart,)) for cart in self.carts]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results["elapsed"] = time.perf_counter() - started
+        return results, errors
+
+    def test_last_units_are_never_oversold(self):
+        results, errors = self._checkout_concurrently()
+
+        self.assertEqual(errors, [])
+        self.product.refresh_from_db()
+        self.assertGreaterEqual(self.product.stock, 0)
+        self.assertEqual(results["placed"], self.stock)
+        self.assertEqual(results["sold_out"], self.buyers - self.stock)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(self.product.stock, 0)
+
+    def test_orders_per_second(self):
+        rounds = 5
+        Product.objects.filter(pk=self.product.pk).update(stock=self.buyers * rounds)
+
+        results, errors = self._checkout_concurrently(rounds)
+
+        self.assertEqual(errors, [])
+        placed = self.buyers * rounds
+        self.assertEqual((results["placed"], results["sold_out"]), (placed, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=self.product).count(), placed)
+        orders_per_second = placed / results["elapsed"]
+        # sàn rất thấp: chỉ bắt lỗi kiểu các đơn chờ khóa nhau tới timeout
+        self.assertGreater(orders_per_second, MIN_ORDERS_PER_SECOND,
+                           f"{placed} đơn trong {results['elapsed']:.2f}s ({orders_per_second:.1f} đơn/giây)")
+
+    def test_oversell_is_rejected(self):
+        self.product.stock = 0
+        self.product.save(update_fields=["stock"])
+        CartItem.objects.create(cart=self.carts[0], product=self.product, quantity=1)
+        cart = prefetch_cart_items(self.carts[0])
+
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(cart, cart.user, cart.user.addresses.get())
+
+        self.assertEqual([available for _, available in raised.exception.lines], [0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StockVersionTests(TestCase):
+    """Đặt/hủy đơn chỉ làm cũ cache trang khi tồn kho khách thấy thay đổi ("Chỉ còn N", hết hàng)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("nguoi-mua")
+        cls.address = Address.objects.create(user=cls.user, recipient_name="Khách", phone="0900000000",
+                                             address="1 Lê Lợi", is_default=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def _list_page(self):
+        # sidebar facet chưa có số đếm thì trang không được gắn ETag: dựng sẵn chỉ mục;
+        # lượt đầu nhận cookie CSRF (một phần của ETag)
+        facet_index.build()
+        search_index.build()
+        url = reverse("products:list")
+        self.client.get(url)
+        return url
+
+    def _checkout(self, product, quantity=1):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(prefetch_cart_items(cart), self.user, self.address)
+        # bitmap kho bình thường làm mới ở nền khi STOCK_VERSION đổi
+        facet_index.refresh()
+        return order
+
+    def _product(self, stock):
+        return Product.objects.create(name=f"Sofa còn {stock}", slug=f"sofa-con-{stock}", price=9_000_000,
+                                      stock=stock)
+
+    def test_checkout_of_plentiful_product_keeps_pages_cached(self):
+        product = self._product(50)
+        url = self._list_page()
+        etag = self.client.get(url)["ETag"]
+        before = get_version(STOCK_VERSION)
+
+        self._checkout(product)
+
+        self.assertEqual(get_version(STOCK_VERSION), before)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_checkout_into_low_stock_refreshes_pages(self):
+        product = self._product(6)
+        url = self._list_page()
+        etag = self.client.get(url)["ETag"]
+
+        self._checkout(product)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Chỉ còn 5")
+
+    def test_last_unit_marks_product_sold_out(self):
+        product = self._product(1)
+        url = self._list_page()
+        self.client.get(url)
+
+        self._checkout(product)
+
+        self.assertContains(self.client.get(url), "Hết hàng")
+
+    def test_cancel_only_refreshes_when_stock_was_low(self):
+        plentiful = self._checkout(self._product(40))
+        before = get_version(STOCK_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders([plentiful.pk])
+        self.assertEqual(get_version(STOCK_VERSION), before)
+
+        sold_out = self._checkout(self._product(2), quantity=2)
+        before = get_version(STOCK_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders([sold_out.pk])
+        self.assertGreater(get_version(STOCK_VERSION), before)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class OrderAdminQueryTests(TestCase):
+    """Trang admin của Order/OrderItem tốn số query cố định dù có ít hay nhiều đơn."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("quan-tri", "quan-tri@example.com", "mat-khau-thu-123")
+        cls.customers = User.objects.bulk_create([User(username=f"khach-{n}") for n in range(5)])
+        cls.products = Product.objects.bulk_create([
+            Product(name=f"Bàn thử {n}", slug=f"ban-thu-{n}", price=300_000 + n, stock=10) for n in range(5)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _add_orders(self, count):
+        orders = Order.objects.bulk_create([
+            Order(user=self.customers[n % len(self.customers)], full_name="Khách", phone="0900000000",
+                  address="1 Lê Lợi")
+            for n in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders for product in self.products[:3]
+        ])
+        return orders[-1]
+
+    def _pages(self, order):
+        changelist = reverse("admin:orders_order_changelist")
+        return {
+            "order changelist": changelist,
+            "order changelist (lọc trạng thái)": changelist + "?status__exact=pending",
+            "order change": reverse("admin:orders_order_change", args=[order.pk]),
+            "orderitem changelist": reverse("admin:orders_orderitem_changelist"),
+        }
+
+    def _assert_budgets(self, order):
+        for name, url in self._pages(order).items():
+            with self.subTest(name):
+                self.client.get(url)  # làm nóng content type, session...
+                with self.assertNumQueries(ADMIN_QUERY_BUDGETS[name]):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_pages_with_few_orders(self):
+        self._assert_budgets(self._add_orders(2))
+
+    def test_admin_pages_with_full_page_of_orders(self):
+        # nhiều hơn một trang changelist (100 dòng)
+        self._assert_budgets(self._add_orders(120))
@@ -0,0 +1,118 @@
+import time
+from django.db import transaction
+from django.db.models import F, Sum
+from cart.models import CartItem
+from cart.utils import bump_cart_version
+from core.versions import bump_version
+from products.models import Product
+from products.utils import LOW_STOCK_THRESHOLD, STOCK_VERSION
+from reports.rollups import record_order_placed, record_orders_cancelled
+from .models import Order, OrderItem
+
+
+CANCELLABLE_STATUSES = ("pending", "shipping")
+
+
+class InsufficientStock(Exception):
+    """Một hoặc nhiều dòng trong giỏ không đủ tồn kho; `lines` là [(cart_item, số còn lại)]."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__("; ".join(f"{item.product.name} chỉ còn {available}" for item, available in lines))
+
+
+def place_order(cart, user, address):
+    """Tạo đơn từ giỏ hàng, giữ tồn kho bằng UPDATE có điều kiện.
+
+    Mỗi dòng chạy `UPDATE ... SET stock = stock - q WHERE id = ? AND stock >= q`
+    nên không cần đọc-rồi-ghi; các dòng được xử lý theo thứ tự product_id để
+    hai đơn chạy song song luôn khóa sản phẩm cùng một thứ tự (tránh deadlock).
+    Nếu có dòng thiếu hàng thì rollback toàn bộ và báo đúng các dòng đó.
+    """
+    items = sorted(cart.items.all(), key=lambda item: (item.product_id, item.pk))
+
+    with transaction.atomic():
+        failed = []
+        for item in items:
+            reserved = Product.objects.filter(pk=item.product_id, stock__gte=item.quantity).update(
+                stock=F("stock") - item.quantity
+            )
+            if not reserved:
+                failed.append(item)
+
+        if failed:
+            available = dict(Product.objects.filter(pk__in=[item.product_id for item in failed]).values_list("id", "stock"))
+            raise InsufficientStock([(item, available.get(item.product_id, 0)) for item in failed])
+
+        # update() không gửi signal: báo tồn kho đổi (ETag trang, bitmap kho của facet),
+        # nhưng chỉ khi khách thấy khác ("Chỉ còn N"/hết hàng); sản phẩm còn nhiều
+        # hàng thì mỗi đơn không làm cũ cache của cả site
+        product_ids = [item.product_id for item in items]
+        if Product.objects.filter(pk__in=product_ids, stock__lte=LOW_STOCK_THRESHOLD).exists():
+            transaction.on_commit(lambda: bump_version(STOCK_VERSION))
+
+        order = Order.objects.create(
+            user=user,
+            full_name=address.recipient_name,
+            phone=address.phone,
+            address=address.address,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=item.product_id, quantity=item.quantity, price=item.product.price)
+            for item in items
+        ])
+        record_order_placed(order, items)
+        CartItem.objects.filter(cart=cart).delete()
+        transaction.on_commit(lambda: bump_cart_version(cart))
+
+    return order
+
+
+def cancel_orders(order_ids):
+    """Hủy hàng loạt đơn và trả lại tồn kho.
+
+    Khóa các đơn (theo thứ tự pk), cộng dồn số lượng theo sản phẩm rồi chạy
+    một `UPDATE stock = stock + n` cho mỗi sản phẩm, nên số câu lệnh phụ thuộc
+    số sản phẩm khác nhau chứ không phụ thuộc số dòng đơn hàng. Những đơn đã
+    hủy/hoàn tất bị bỏ qua.
+    """
+    start = time.perf_counter()
+    with transaction.atomic():
+        locked = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=list(order_ids), status__in=CANCELLABLE_STATUSES)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        restock = (
+            OrderItem.objects.filter(order_id__in=locked, product__isnull=False)
+            .values("product_id")
+            .annotate(units=Sum("quantity"))
+            .order_by("product_id")
+        )
+        restock = list(restock)
+        # như place_order: chỉ báo khi có sản phẩm đang hiện "Chỉ còn N"/hết hàng
+        low = Product.objects.filter(
+            pk__in=[row["product_id"] for row in restock], stock__lte=LOW_STOCK_THRESHOLD
+        )
+        if restock and low.exists():
+            transaction.on_commit(lambda: bump_version(STOCK_VERSION))
+        units = 0
+        products = 0
+        for row in restock:
+            Product.objects.filter(pk=row["product_id"]).update(stock=F("stock") + row["units"])
+            units += row["units"]
+            products += 1
+        Order.objects.filter(pk__in=locked).update(status="cancelled")
+        record_orders_cancelled(locked)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "order_ids": locked,
+        "orders": len(locked),
+        "units": units,
+        "products": products,
+        "elapsed": elapsed,
+        "orders_per_second": len(locked) / elapsed if elapsed else 0,
+        "units_per_second": units / elapsed if elapsed else 0,
+    }
@@ -1,25 +1,24 @@
 from django.contrib import messages
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Order, OrderItem
-from products.models import Product
+from .models import Order
 from cart.utils import get_cart 
-from django.db import transaction
 from django.http import HttpResponseBadRequest, JsonResponse, HttpResponse
 from accounts.models import Address
-from django.db.models import Case, When, Value, IntegerField
 from django.urls import reverse
 from django.template.loader import render_to_string
+from django.utils.html import escape
+from .utils import InsufficientStock, cancel_orders, place_order
+from core.pagination import keyset_page
+
+ORDER_PAGE_SIZE = 10
+# khớp index order_user_history_idx
+ORDER_LIST_ORDERING = ('is_cancelled', '-created_at', '-id')
+
 
 # helper: ordered queryset where cancelled orders are placed last
 def get_user_orders_ordered(user):
-    return Order.objects.filter(user=user).annotate(
-        _is_cancelled=Case(
-            When(status='cancelled', then=Value(1)),
-            default=Value(0),
-            output_field=IntegerField()
-        )
-    ).order_by('_is_cancelled', '-created_at')
+    return Order.objects.filter(user=user).history().order_by(*ORDER_LIST_ORDERING)
 
 
 @login_required
@@ -56,35 +55,14 @@ def order_checkout_confirm(request):
             resp['HX-Redirect'] = reverse('accounts:profile')
             return resp
 
-    # check stock
-    insufficient = []
-    for item in cart.items.select_related('product').all():
-        if item.product.stock is not None and item.quantity > item.product.stock:
-            insufficient.append(f"{item.product.name} chỉ còn {item.product.stock}")
-
-    if insufficient:
-        resp = HttpResponse(f'<p class="text-sm font-medium text-red-600">{"; ".join(insufficient)}</p>')
+    # giữ tồn kho + tạo đơn trong một transaction; báo đúng những dòng thiếu hàng
+    try:
+        place_order(cart, user, default_addr)
+    except InsufficientStock as exc:
+        resp = HttpResponse(f'<p class="text-sm font-medium text-red-600">{escape(str(exc))}</p>')
         resp['HX-Redirect'] = reverse('cart:cart')
         return resp
-
-    # create order
-    with transaction.atomic():
-        order = Order.objects.create(
-            user=user,
-            full_name=default_addr.recipient_name,
-            phone=default_addr.phone,
-            address=default_addr.address
-        )
-
-        for item in cart.items.all():
-            OrderItem.objects.create(order=order, product=item.product,
-                                     quantity=item.quantity, price=item.product.price)
-            if item.product.stock is not None:
-                item.product.stock -= item.quantity
-                item.product.save(update_fields=['stock'])
-
-        cart.items.all().delete()
-        request.session.pop('cart_id', None)
+    request.session.pop('cart_id', None)
 
     resp = HttpResponse('<p class="text-sm font-medium text-green-600">Thanh toán thành công!</p>')
     resp['HX-Redirect'] = reverse('accounts:profile')
@@ -93,14 +71,18 @@ def order_checkout_confirm(request):
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.history(), id=order_id, user=request.user)
     return render(request, "orders/partials/order_detail.html", {"order": order})
 
 
 @login_required
 def order_list(request):
-    orders = get_user_orders_ordered(request.user)
-    return render(request, 'orders/list.html', {'orders': orders})
+    orders, next_cursor = keyset_page(get_user_orders_ordered(request.user), ORDER_LIST_ORDERING,
+                                      request.GET.get('cursor'), ORDER_PAGE_SIZE)
+    context = {'orders': orders, 'next_cursor': next_cursor}
+    if request.headers.get('HX-Request'):
+        return render(request, 'orders/partials/order_page.html', context)
+    return render(request, 'orders/list.html', context)
 
 
 @login_required
@@ -114,25 +96,13 @@ def cancel_order(request, order_id):
     if getattr(order, "status", None) not in ("pending", "shipping"):
         return JsonResponse({"success": False, "message": "Không thể hủy đơn hàng ở trạng thái này."}, status=400)
 
-    # atomic + select_for_update để tránh race khi cập nhật stock
-    with transaction.atomic():
-        order = Order.objects.select_for_update().get(pk=order.pk)
-
-        # nếu đã hủy trước đó thì không làm gì
-        if order.status == "cancelled":
-            return JsonResponse({"success": False, "message": "Đơn hàng đã bị hủy trước đó."}, status=400)
-
-        # Trả lại số lượng cho từng sản phẩm (nếu model Product có trường `stock`)
-        for item in order.items.select_related("product").all():
-            product = item.product
-            if product is None:
-                continue
-            if getattr(product, "stock", None) is not None:
-                product.stock = (product.stock or 0) + (item.quantity or 0)
-                product.save(update_fields=["stock"])
-
-        order.status = "cancelled"
-        order.save(update_fields=["status"])
+    # khóa đơn + trả tồn kho theo từng sản phẩm (xem orders.utils.cancel_orders)
+    result = cancel_orders([order.pk])
+
+    # nếu đã bị hủy (hoặc đổi trạng thái) trước đó thì không làm gì
+    if not result["orders"]:
+        return JsonResponse({"success": False, "message": "Đơn hàng đã bị hủy trước đó."}, status=400)
+    order.status = "cancelled"
 
     # Nếu request từ HTMX: trả về updated order-card (oob) và clear detail (oob) để update UI ngay
     if request.headers.get("HX-Request"):
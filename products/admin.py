@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Category, Product
 from adminsortable2.admin import SortableAdminMixin
+from core.pagination import EstimatedCountPaginator
 
 @admin.register(Category)
 class CategoryAdmin(SortableAdminMixin, admin.ModelAdmin): 
@@ -14,4 +15,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('categories',)
     search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
-    filter_horizontal = ('categories',)
\ No newline at end of file
+    filter_horizontal = ('categories',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
\ No newline at end of file
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from core.versions import preload
+        from . import signals  # noqa: F401
+        from .fragments import PAGE_NAMESPACES
+        # trang nào cũng cần phiên bản catalog (điều hướng, fragment): đọc cùng lượt đầu tiên của request
+        preload(*PAGE_NAMESPACES)
+        from .category_images import category_images
+        category_images.load()
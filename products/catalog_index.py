@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import timedelta
+from core.versions import aget_versions, get_versions
+
+# nhật ký CatalogChange được giữ lâu như vậy (dọn trong products/signals.py)
+CHANGE_RETENTION = timedelta(days=1)
+# đọc lại vài dòng nhật ký đã áp dụng: id tự tăng được cấp trước khi commit, nên
+# một dòng id nhỏ hơn có thể hiện ra sau dòng id lớn hơn
+CHANGE_OVERLAP = 20
+
+
+class CatalogIndex:
+    """Chỉ mục trong tiến trình dựng từ bảng Product, gắn với phiên bản catalog.
+
+    Lớp con cài `build()` (đọc DB rồi thay toàn bộ dữ liệu, cuối cùng gán
+    `self.version` và `self.change_id`), `index_product(product)` và
+    `remove(product_id)`. Luôn dựng ở nền (thread riêng, mỗi lúc chỉ một lần
+    dựng): lần dùng đầu tiên trong tiến trình thì chỉ mục chưa sẵn sàng và nơi
+    gọi phải có đường dự phòng. Sau đó mọi tiến trình, kể cả tiến trình vừa
+    lưu, chỉ cập nhật các sản phẩm có trong nhật ký CatalogChange
+    (`apply_changes`, products/signals.py); tiến trình khác thấy phiên bản đổi
+    thì làm việc đó ở nền và tạm dùng bản cũ.
+    """
+
+    name = "catalog-index"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        self.version = None
+        self.change_id = None
+        self._synced_at = 0.0
+
+    def build(self):
+        raise NotImplementedError
+
+    def index_product(self, product):
+        raise NotImplementedError
+
+    def remove(self, product_id):
+        raise NotImplementedError
+
+    def namespaces(self):
+        # phiên bản dữ liệu mà chỉ mục phụ thuộc (core/versions.py)
+        from .utils import CATALOG_VERSION
+        return (CATALOG_VERSION,)
+
+    def current_version(self):
+        return get_versions(*self.namespaces())
+
+    def latest_change_id(self):
+        # đọc trước khi đọc Product trong build(): thay đổi xảy ra trong lúc dựng sẽ được áp dụng lại
+        from .models import CatalogChange
+        return CatalogChange.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+    def _built(self, version, change_id):
+        self.version = version
+        self.change_id = change_id
+        self._synced_at = time.monotonic()
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def apply_changes(self):
+        """Cập nhật riêng các sản phẩm ghi trong nhật ký từ lần đồng bộ trước.
+
+        Trả về False (không đổi gì) khi phải dựng lại toàn bộ: chưa dựng lần
+        nào, danh mục đổi, phiên bản đổi mà nhật ký không có gì mới (nạp
+        fixture, generate_data) hoặc đã quá lâu nên nhật ký có thể đã bị dọn.
+        """
+        from .models import CatalogChange, Product
+
+        if self.change_id is None or time.monotonic() - self._synced_at > CHANGE_RETENTION.total_seconds() / 2:
+            return False
+        version = self.current_version()
+        changes = list(
+            CatalogChange.objects.filter(pk__gt=self.change_id - CHANGE_OVERLAP)
+            .order_by("pk")
+            .values_list("pk", "product_id")
+        )
+        new = [product_id for pk, product_id in changes if pk > self.change_id]
+        if not new or None in new:
+            return False
+
+        product_ids = {product_id for _, product_id in changes}
+        products = Product.objects.filter(pk__in=product_ids).prefetch_related("categories")
+        with self._lock:
+            for product in products:
+                self.index_product(product)
+                product_ids.discard(product.pk)
+            for product_id in product_ids:
+                self.remove(product_id)
+            self._built(version, changes[-1][0])
+        return True
+
+    def refresh(self):
+        """Đưa chỉ mục về phiên bản hiện tại: theo nhật ký nếu được, không thì dựng lại."""
+        if not self.apply_changes():
+            self.build()
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            from django.db import connection
+            try:
+                self.refresh()
+            finally:
+                self._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=run, name=f"{self.name}-rebuild", daemon=True).start()
+
+    def ensure_current(self):
+        """True nếu dùng được chỉ mục (có thể là bản cũ trong lúc làm mới ở nền)."""
+        if self.version is None:
+            self._rebuild_in_background()
+            return False
+        if self.version != self.current_version():
+            self._rebuild_in_background()
+        return True
+
+    async def aensure_current(self):
+        if self.version is None:
+            self._rebuild_in_background()
+            return False
+        if self.version != await aget_versions(*self.namespaces()):
+            self._rebuild_in_background()
+        return True
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from django.conf import settings
+
+CATEGORY_IMAGE_DIR = 'core/images/categories'
+DEFAULT_CATEGORY_IMAGE = 'core/images/default-category.jpg'
+IMAGE_EXTENSIONS = ('jpg', 'png', 'webp')
+# khoảng thời gian tối thiểu giữa hai lần kiểm tra manifest của collectstatic
+RECHECK_SECONDS = 60
+
+
+class CategoryImageManifest:
+    """Bảng slug -> đường dẫn static của ảnh danh mục, dựng một lần từ STATIC_ROOT.
+
+    Thay cho việc gọi os.path.exists cho từng danh mục ở mỗi lần render; chỉ
+    đọc lại khi staticfiles.json hoặc thư mục ảnh danh mục đổi mtime (kiểm tra
+    tối đa mỗi RECHECK_SECONDS giây).
+    """
+
+    def __init__(self):
+        self._images = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        root = settings.STATIC_ROOT or ''
+        return os.path.join(root, 'staticfiles.json'), os.path.join(root, CATEGORY_IMAGE_DIR)
+
+    def _current_signature(self):
+        signature = []
+        for path in self._paths():
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load(self):
+        images = {}
+        _, directory = self._paths()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    slug, ext = os.path.splitext(entry.name)
+                    ext = ext[1:].lower()
+                    if ext in IMAGE_EXTENSIONS and entry.is_file():
+                        images.setdefault(slug, {})[ext] = f'{CATEGORY_IMAGE_DIR}/{entry.name}'
+        except OSError:
+            pass
+        with self._lock:
+            self._images = images
+            self._signature = self._current_signature()
+            self._checked_at = time.monotonic()
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < RECHECK_SECONDS:
+            return
+        self._checked_at = now
+        if self._current_signature() != self._signature:
+            self.load()
+
+    def resolve(self, slug, ext_list=IMAGE_EXTENSIONS):
+        self._reload_if_changed()
+        found = self._images.get(slug, {})
+        for ext in ext_list:
+            if ext in found:
+                return found[ext]
+        return DEFAULT_CATEGORY_IMAGE
+
+
+category_images = CategoryImageManifest()
@@ -0,0 +1,285 @@
+from collections import defaultdict, namedtuple
+from urllib.parse import urlencode
+from django.db.models import Q
+from .catalog_index import CatalogIndex
+
+# khoảng giá [low, high) theo VND, None = không giới hạn
+PriceBand = namedtuple("PriceBand", "key label low high")
+PRICE_BANDS = (
+    PriceBand("duoi-150k", "Dưới 150.000₫", None, 150_000),
+    PriceBand("150k-200k", "150.000₫ – 200.000₫", 150_000, 200_000),
+    PriceBand("200k-250k", "200.000₫ – 250.000₫", 200_000, 250_000),
+    PriceBand("tu-250k", "Từ 250.000₫", 250_000, None),
+)
+PRICE_BANDS_BY_KEY = {band.key: band for band in PRICE_BANDS}
+STOCK_STATES = (("in_stock", "Còn hàng"), ("out_of_stock", "Hết hàng"))
+
+
+def price_band(price):
+    for band in PRICE_BANDS:
+        if (band.low is None or price >= band.low) and (band.high is None or price < band.high):
+            return band.key
+    return None
+
+
+def stock_state(stock):
+    return "out_of_stock" if stock <= 0 else "in_stock"
+
+
+class ProductFilters(namedtuple("ProductFilters", "category_id prices stocks")):
+    """Bộ lọc của trang danh sách: danh mục (theo URL), khoảng giá và tình trạng kho (chọn nhiều)."""
+
+    @classmethod
+    def from_params(cls, params, category_id=None):
+        prices = tuple(key for key in dict.fromkeys(params.getlist("price")) if key in PRICE_BANDS_BY_KEY)
+        states = dict(STOCK_STATES)
+        stocks = tuple(key for key in dict.fromkeys(params.getlist("stock")) if key in states)
+        return cls(category_id, prices, stocks)
+
+    def q(self):
+        """Điều kiện giá/kho cho queryset (danh mục đã nằm trong queryset gốc)."""
+        condition = Q()
+        if self.prices:
+            bands = Q()
+            for key in self.prices:
+                band = PRICE_BANDS_BY_KEY[key]
+                step = Q()
+                if band.low is not None:
+                    step &= Q(price__gte=band.low)
+                if band.high is not None:
+                    step &= Q(price__lt=band.high)
+                bands |= step
+            condition &= bands
+        if len(self.stocks) == 1:
+            condition &= Q(is_out_of_stock=self.stocks[0] == "out_of_stock")
+        return condition
+
+    def query_string(self, sort=None):
+        params = [("price", key) for key in self.prices] + [("stock", key) for key in self.stocks]
+        if sort:
+            params.append(("sort", sort))
+        return urlencode(params)
+
+
+def _bitmap(positions, size):
+    # dựng int từ bytearray: O(n) thay vì OR từng bit vào một int lớn
+    buffer = bytearray((size >> 3) + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def pending_facets(filters):
+    """Facet khi chỉ mục đang dựng lần đầu: giữ các lựa chọn, chưa có số lượng (None)."""
+    return {
+        "pending": True,
+        "total": None,
+        "all_categories": None,
+        "categories": {},
+        "prices": [(band, None, band.key in filters.prices) for band in PRICE_BANDS],
+        "stocks": [(key, label, None, key in filters.stocks) for key, label in STOCK_STATES],
+    }
+
+
+class ProductFacetIndex(CatalogIndex):
+    """Bitmap (int Python) cho từng danh mục, khoảng giá và tình trạng kho.
+
+    Mỗi sản phẩm giữ một vị trí bit; đếm facet là AND các bitmap rồi
+    `int.bit_count()`, nên số lượng của mọi facet khi kết hợp bộ lọc không
+    cần thêm câu COUNT nào. Trang sản phẩm vẫn lấy từ DB (keyset) với cùng
+    điều kiện lọc.
+    """
+
+    name = "product-facets"
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._slots = {}                 # product_id -> vị trí bit
+        self._free = []                  # vị trí của sản phẩm đã xóa, dùng lại
+        self._size = 0
+        self._all = 0
+        self._categories = {}            # category_id -> bitmap
+        self._prices = {}                # khóa khoảng giá -> bitmap
+        self._stocks = {}                # in_stock/out_of_stock -> bitmap
+        self._attributes = {}            # product_id -> (category_ids, khoảng giá, kho)
+
+    # --- cập nhật ---
+
+    def _remove_locked(self, product_id):
+        position = self._slots.pop(product_id, None)
+        if position is None:
+            return
+        mask = ~(1 << position)
+        category_ids, band, state = self._attributes.pop(product_id)
+        for category_id in category_ids:
+            self._categories[category_id] &= mask
+        if band is not None:
+            self._prices[band] &= mask
+        self._stocks[state] &= mask
+        self._all &= mask
+        self._free.append(position)
+
+    def _add_locked(self, product_id, category_ids, price, stock):
+        self._remove_locked(product_id)
+        if self._free:
+            position = self._free.pop()
+        else:
+            position = self._size
+            self._size += 1
+        bit = 1 << position
+        band, state = price_band(price), stock_state(stock)
+        for category_id in category_ids:
+            self._categories[category_id] = self._categories.get(category_id, 0) | bit
+        if band is not None:
+            self._prices[band] = self._prices.get(band, 0) | bit
+        self._stocks[state] = self._stocks.get(state, 0) | bit
+        self._all |= bit
+        self._slots[product_id] = position
+        self._attributes[product_id] = (tuple(category_ids), band, state)
+
+    def add(self, product_id, category_ids, price, stock):
+        with self._lock:
+            self._add_locked(product_id, category_ids, price, stock)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def index_product(self, product):
+        self.add(product.pk, [category.pk for category in product.categories.all()], product.price, product.stock)
+
+    def namespaces(self):
+        # tình trạng kho đổi theo từng đơn hàng: theo dõi riêng để chỉ làm mới bitmap kho
+        from .utils import CATALOG_VERSION, STOCK_VERSION
+        return (CATALOG_VERSION, STOCK_VERSION)
+
+    def refresh(self):
+        current = self.current_version()
+        if self.version is not None and self.version[0] == current[0]:
+            self.refresh_stock()
+        elif not self.apply_changes():
+            self.build()
+
+    def apply_changes(self):
+        previous = self.version
+        if not super().apply_changes():
+            return False
+        # đơn hàng đổi tồn kho mà không ghi nhật ký: phiên bản kho đổi thì đọc lại bitmap kho
+        if previous[1] != self.version[1]:
+            self.refresh_stock()
+        return True
+
+    def refresh_stock(self):
+        """Đọc lại riêng tập sản phẩm hết hàng (qua index is_out_of_stock) và thay bitmap kho.
+
+        Đơn hàng chỉ đổi tồn kho; không cần dựng lại cả chỉ mục như khi
+        sản phẩm/danh mục đổi.
+        """
+        from .models import Product
+
+        version = self.current_version()
+        out_of_stock = set(Product.objects.filter(is_out_of_stock=True).values_list("id", flat=True).iterator(chunk_size=5000))
+        with self._lock:
+            positions = [self._slots[product_id] for product_id in out_of_stock if product_id in self._slots]
+            out = _bitmap(positions, self._size) & self._all
+            self._stocks = {"out_of_stock": out, "in_stock": self._all & ~out}
+            for product_id, (category_ids, band, state) in self._attributes.items():
+                new_state = "out_of_stock" if product_id in out_of_stock else "in_stock"
+                if new_state != state:
+                    self._attributes[product_id] = (category_ids, band, new_state)
+            # chỉ phần kho: thay đổi catalog (nếu có) vẫn chờ apply_changes/build
+            self.version = (self.version[0], version[1])
+
+    def build(self):
+        from .models import Product
+
+        version, change_id = self.current_version(), self.latest_change_id()
+        fresh = ProductFacetIndex()
+        prices, stocks = defaultdict(list), defaultdict(list)
+        rows = Product.objects.order_by("id").values_list("id", "price", "stock").iterator(chunk_size=5000)
+        for position, (product_id, price, stock) in enumerate(rows):
+            band, state = price_band(price), stock_state(stock)
+            fresh._slots[product_id] = position
+            fresh._attributes[product_id] = ((), band, state)
+            if band is not None:
+                prices[band].append(position)
+            stocks[state].append(position)
+        size = fresh._size = len(fresh._slots)
+
+        categories, memberships = defaultdict(list), defaultdict(list)
+        through = Product.categories.through.objects.values_list("product_id", "category_id")
+        for product_id, category_id in through.iterator(chunk_size=5000):
+            position = fresh._slots.get(product_id)
+            if position is not None:
+                categories[category_id].append(position)
+                memberships[product_id].append(category_id)
+        for product_id, category_ids in memberships.items():
+            _, band, state = fresh._attributes[product_id]
+            fresh._attributes[product_id] = (tuple(category_ids), band, state)
+
+        fresh._all = (1 << size) - 1
+        fresh._prices = {key: _bitmap(positions, size) for key, positions in prices.items()}
+        fresh._stocks = {key: _bitmap(positions, size) for key, positions in stocks.items()}
+        fresh._categories = {key: _bitmap(positions, size) for key, positions in categories.items()}
+
+        with self._lock:
+            self._slots, self._free, self._size, self._all = fresh._slots, [], size, fresh._all
+            self._categories, self._prices, self._stocks = fresh._categories, fresh._prices, fresh._stocks
+            self._attributes = fresh._attributes
+            self._built(version, change_id)
+
+    # --- truy vấn ---
+
+    def _union(self, bitmaps, keys):
+        if not keys:
+            return self._all
+        result = 0
+        for key in keys:
+            result |= bitmaps.get(key, 0)
+        return result
+
+    def facets(self, filters):
+        """Số sản phẩm của từng giá trị facet.
+
+        Mỗi facet được đếm với bộ lọc của các facet khác (chọn nhiều trong
+        cùng một facet là OR), như sidebar lọc thông thường.
+        """
+        if not self.ensure_current():
+            return pending_facets(filters)
+        return self._count(filters)
+
+    async def afacets(self, filters):
+        if not await self.aensure_current():
+            return pending_facets(filters)
+        return self._count(filters)
+
+    def _count(self, filters):
+        with self._lock:
+            if filters.category_id is None:
+                category = self._all
+            else:
+                category = self._categories.get(filters.category_id, 0)
+            price = self._union(self._prices, filters.prices)
+            stock = self._union(self._stocks, filters.stocks)
+
+            others = price & stock
+            categories = {key: (bitmap & others).bit_count() for key, bitmap in self._categories.items()}
+            others = category & stock
+            prices = [(band, (self._prices.get(band.key, 0) & others).bit_count(), band.key in filters.prices)
+                      for band in PRICE_BANDS]
+            others = category & price
+            stocks = [(key, label, (self._stocks.get(key, 0) & others).bit_count(), key in filters.stocks)
+                      for key, label in STOCK_STATES]
+            return {
+                "total": (category & price & stock).bit_count(),
+                "all_categories": (price & stock).bit_count(),
+                "categories": categories,
+                "prices": prices,
+                "stocks": stocks,
+            }
+
+
+facet_index = ProductFacetIndex()
@@ -0,0 +1,308 @@
+import atexit
+import hashlib
+import threading
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from accounts.utils import arequest_user_namespace, request_user_namespace
+from cart.utils import arequest_cart_namespace, request_cart_namespace
+from core.versions import aget_versions, get_versions
+from .utils import CATALOG_VERSION, MEDIA_VERSION, STOCK_VERSION, visible_stock
+
+# fragment phụ thuộc dữ liệu sản phẩm/danh mục và biến thể ảnh; tồn kho nằm trong
+# khóa của từng sản phẩm (product_vary) nên một đơn hàng chỉ làm cũ thẻ của sản phẩm đó
+FRAGMENT_NAMESPACES = (CATALOG_VERSION, MEDIA_VERSION)
+# ETag/cache của cả trang và partial còn phụ thuộc thứ tự còn/hết hàng và số đếm facet:
+# STOCK_VERSION chỉ tăng khi tồn kho khách thấy thay đổi (orders.utils)
+PAGE_NAMESPACES = (*FRAGMENT_NAMESPACES, STOCK_VERSION)
+# khóa đã chứa phiên bản nên bản cache không bao giờ cũ; TTL chỉ để dọn bản của phiên bản trước
+FRAGMENT_TTL = 60 * 60 * 24
+# partial HTMX dùng chung cho mọi người: CDN/proxy được giữ chừng này giây, trình duyệt luôn hỏi lại
+PARTIAL_EDGE_MAX_AGE = 60
+# số liệu hit/miss được cộng dồn trong tiến trình rồi đẩy lên cache dùng chung (CACHES)
+# định kỳ và khi tiến trình thoát, để fragment_cache_stats (tiến trình khác) đọc được
+STATS_FLUSH_SECONDS = 10
+STATS_FIELDS = ("hits", "misses", "render_ns", "saved_ns")
+
+
+def catalog_versions():
+    # trong request: lấy từ bản đọc một lần của request (core/versions.py)
+    return get_versions(*FRAGMENT_NAMESPACES)
+
+
+def page_versions():
+    return get_versions(*PAGE_NAMESPACES)
+
+
+async def apage_versions():
+    return await aget_versions(*PAGE_NAMESPACES)
+
+
+def product_vary(product):
+    # phần khóa fragment theo sản phẩm, kèm tồn kho như thẻ hiển thị
+    return (product.pk, visible_stock(product.stock))
+
+
+def fragment_key(name, vary, versions):
+    raw = ":".join(str(part) for part in (*versions, *vary))
+    return f"fragment:{name}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+class FragmentStats:
+    """Đếm hit/miss và thời gian render (đã tốn / tiết kiệm được) của fragment cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = dict.fromkeys(STATS_FIELDS, 0)
+        self._flushed_at = time.monotonic()
+
+    def record(self, hit, render_ns):
+        with self._lock:
+            if hit:
+                self._pending["hits"] += 1
+                self._pending["saved_ns"] += render_ns
+            else:
+                self._pending["misses"] += 1
+                self._pending["render_ns"] += render_ns
+            if time.monotonic() - self._flushed_at < STATS_FLUSH_SECONDS:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, dict.fromkeys(STATS_FIELDS, 0)
+            self._flushed_at = time.monotonic()
+        for field, value in pending.items():
+            if not value:
+                continue
+            key = f"fragment:stats:{field}"
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, None)
+
+    def totals(self):
+        self.flush()
+        stored = cache.get_many([f"fragment:stats:{field}" for field in STATS_FIELDS])
+        return {field: stored.get(f"fragment:stats:{field}", 0) for field in STATS_FIELDS}
+
+    def reset(self):
+        with self._lock:
+            self._pending = dict.fromkeys(STATS_FIELDS, 0)
+        cache.delete_many([f"fragment:stats:{field}" for field in STATS_FIELDS])
+
+
+fragment_stats = FragmentStats()
+# worker dừng (reload, scale down) không làm mất phần chưa đẩy lên cache
+atexit.register(fragment_stats.flush)
+
+
+def prefetch_fragments(request, name, varies):
+    """Đọc trước bản cache của nhiều fragment `name` (mỗi `vary` một bản) trong một get_many.
+
+    Lưới sản phẩm gọi trước vòng lặp để mỗi thẻ không phải đọc cache riêng
+    (với DatabaseCache mỗi lượt đọc là một câu SELECT); render_fragment lấy
+    kết quả ở đây, kể cả kết quả "không có" để khỏi hỏi lại cache.
+    """
+    if request is None:
+        return
+    versions = catalog_versions()
+    keys = [fragment_key(name, vary, versions) for vary in varies]
+    prefetched = getattr(request, "_fragments", None)
+    if prefetched is None:
+        prefetched = request._fragments = {}
+    keys = [key for key in keys if key not in prefetched]
+    if keys:
+        stored = cache.get_many(keys)
+        prefetched.update((key, stored.get(key)) for key in keys)
+
+
+def render_fragment(name, vary, render, request=None):
+    """HTML của fragment `name` từ cache, hoặc gọi `render()` rồi lưu lại."""
+    key = fragment_key(name, vary, catalog_versions())
+    prefetched = getattr(request, "_fragments", None)
+    if prefetched is not None and key in prefetched:
+        cached = prefetched.pop(key)
+    else:
+        cached = cache.get(key)
+    if cached is not None:
+        content, render_ns = cached
+        fragment_stats.record(True, render_ns)
+        return content
+
+    start = time.perf_counter_ns()
+    content = render()
+    render_ns = time.perf_counter_ns() - start
+    cache.set(key, (content, render_ns), FRAGMENT_TTL)
+    fragment_stats.record(False, render_ns)
+    return content
+
+
+def skip_response_cache(response):
+    """Không cache / không gắn ETag cho response này (nội dung tạm, vd. facet đang chờ chỉ mục)."""
+    response.skip_response_cache = True
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming and not getattr(response, "skip_response_cache", False)
+
+
+def _partial_validators(request, view, versions):
+    key = fragment_key(f"view:{view.__module__}.{view.__name__}", (request.get_full_path(),), versions)
+    etag = '"%s"' % key.rsplit(":", 1)[1]
+    # phiên bản là thời điểm thay đổi (nanosecond)
+    last_modified = max(versions) // 1_000_000_000
+    return key, etag, last_modified
+
+
+def _finish_partial(request, response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ("HX-Request",))
+    # trình duyệt luôn hỏi lại (rẻ: 304 khi phiên bản chưa đổi), CDN giữ tối đa PARTIAL_EDGE_MAX_AGE giây
+    patch_cache_control(response, public=True, max_age=0, s_maxage=PARTIAL_EDGE_MAX_AGE)
+    # context processor có đọc session khi render nhưng nội dung không phụ thuộc
+    # người dùng: không để SessionMiddleware thêm Vary: Cookie làm vỡ cache dùng chung
+    session = getattr(request, "session", None)
+    if session is not None and not session.modified:
+        session.accessed = False
+    return response
+
+
+def _is_partial_request(request):
+    return request.method in ("GET", "HEAD") and request.headers.get("HX-Request")
+
+
+def cached_partial(view):
+    """Cache response HTMX của view theo đường dẫn + phiên bản catalog.
+
+    Chỉ dùng cho partial không phụ thuộc người dùng. ETag/Last-Modified suy ra
+    từ phiên bản nên request có điều kiện nhận 304 trước khi chạm DB hay
+    render; request không phải HTMX đi thẳng vào view. Dùng được cho cả view
+    sync lẫn async.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _is_partial_request(request):
+                return await view(request, *args, **kwargs)
+
+            key, etag, last_modified = _partial_validators(request, view, await apage_versions())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                cached = await cache.aget(key)
+                if cached is not None:
+                    content, content_type, render_ns = cached
+                    response = HttpResponse(content, content_type=content_type)
+                    fragment_stats.record(True, render_ns)
+                else:
+                    start = time.perf_counter_ns()
+                    response = await view(request, *args, **kwargs)
+                    render_ns = time.perf_counter_ns() - start
+                    if not _cacheable(response):
+                        return response
+                    await cache.aset(key, (response.content, response["Content-Type"], render_ns), FRAGMENT_TTL)
+                    fragment_stats.record(False, render_ns)
+            return _finish_partial(request, response, etag, last_modified)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _is_partial_request(request):
+            return view(request, *args, **kwargs)
+
+        key, etag, last_modified = _partial_validators(request, view, page_versions())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type, render_ns = cached
+                response = HttpResponse(content, content_type=content_type)
+                fragment_stats.record(True, render_ns)
+            else:
+                start = time.perf_counter_ns()
+                response = view(request, *args, **kwargs)
+                render_ns = time.perf_counter_ns() - start
+                if not _cacheable(response):
+                    return response
+                cache.set(key, (response.content, response["Content-Type"], render_ns), FRAGMENT_TTL)
+                fragment_stats.record(False, render_ns)
+        return _finish_partial(request, response, etag, last_modified)
+
+    return wrapper
+
+
+def _page_etag(request, owner_namespaces, owner_versions, versions):
+    parts = (
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ""),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        *owner_namespaces,
+        *owner_versions,
+    )
+    return 'W/"%s"' % fragment_key("page", parts, versions).rsplit(":", 1)[1]
+
+
+def _finish_page(response, etag):
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Cookie", "HX-Request"))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _is_page_request(request):
+    return request.method in ("GET", "HEAD") and not request.headers.get("HX-Request")
+
+
+def catalog_page(view):
+    """Conditional GET cho trang catalog đầy đủ (không phải HTMX).
+
+    Trang nhúng CSRF token, user và ngăn giỏ hàng nên chỉ được cache riêng
+    (private) và luôn hỏi lại. ETag yếu tính trước khi chạy view từ phiên
+    bản catalog/tồn kho, phiên bản giỏ và hồ sơ user, session và cookie CSRF; khớp
+    If-None-Match thì trả 304 mà không chạy queryset hay render nào.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _is_page_request(request):
+                return await view(request, *args, **kwargs)
+
+            owner = [ns for ns in (await arequest_cart_namespace(request), await arequest_user_namespace(request)) if ns]
+            # phiên bản của chủ trang và của catalog trong cùng một lượt đọc
+            versions = await aget_versions(*owner, *PAGE_NAMESPACES)
+            etag = _page_etag(request, owner, versions[:len(owner)], versions[len(owner):])
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if not _cacheable(response):
+                    return response
+            return _finish_page(response, etag)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _is_page_request(request):
+            return view(request, *args, **kwargs)
+
+        owner = [ns for ns in (request_cart_namespace(request), request_user_namespace(request)) if ns]
+        versions = get_versions(*owner, *PAGE_NAMESPACES)
+        etag = _page_etag(request, owner, versions[:len(owner)], versions[len(owner):])
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if not _cacheable(response):
+                return response
+        return _finish_page(response, etag)
+
+    return wrapper
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from products.models import Category, Product
+
+
+def _server_command(interface, port):
+    if interface == "wsgi":
+        # runserver đa luồng; chế độ WSGI của uvicorn từ chối header Set-Cookie của Django
+        return [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload"]
+    return [sys.executable, "-m", "uvicorn", "luxora.asgi:application", "--port", str(port),
+            "--no-access-log", "--log-level", "warning"]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _fetch(port, path, headers):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"GET {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close", *headers, "", ""]
+    writer.write("\r\n".join(lines).encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    parts = status_line.split()
+    status = int(parts[1]) if len(parts) > 1 else 0
+    return status, time.perf_counter() - start
+
+
+async def _load(port, requests, concurrency, total):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for n in range(total):
+        queue.put_nowait(requests[n % len(requests)])
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path, headers = queue.get_nowait()
+            try:
+                status, elapsed = await _fetch(port, path, headers)
+            except OSError:
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = "Đo tải các trang catalog/giỏ hàng qua WSGI (runserver) và ASGI (uvicorn): req/s, p50, p99."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument("--path", action="append", dest="paths", help="đường dẫn cần đo (lặp lại được)")
+
+    def handle(self, *args, requests, concurrency, warmup, paths, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("Cần cài uvicorn để chạy benchmark này: pip install uvicorn")
+
+        targets = [(path, ()) for path in paths] if paths else self._default_targets()
+        if not targets:
+            raise CommandError("Chưa có sản phẩm/danh mục nào để đo.")
+
+        self.stdout.write(f"{len(targets)} đường dẫn, {requests} request, concurrency={concurrency}")
+        self.stdout.write(f"{'server':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'lỗi':>6}")
+        for interface in ("wsgi", "asgi"):
+            port = _free_port()
+            server = subprocess.Popen(
+                _server_command(interface, port), cwd=settings.BASE_DIR, env=os.environ.copy(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                self._wait_for(port, server)
+                asyncio.run(_load(port, targets, concurrency, warmup))
+                latencies, errors, elapsed = asyncio.run(_load(port, targets, concurrency, requests))
+            finally:
+                server.terminate()
+                server.wait()
+
+            if not latencies:
+                self.stdout.write(f"{interface:<8} {'-':>8} {'-':>8} {'-':>8} {errors:>6}")
+                continue
+            cuts = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"{interface:<8} {len(latencies) / elapsed:>8.1f} {cuts[49] * 1000:>8.1f} "
+                f"{cuts[98] * 1000:>8.1f} {errors:>6}"
+            )
+
+    def _default_targets(self):
+        product = Product.objects.order_by("id").first()
+        category = Category.objects.filter(products__isnull=False).order_by("id").first()
+        if product is None or category is None:
+            return []
+        htmx = ("HX-Request: true",)
+        return [
+            (reverse("products:list"), ()),
+            (reverse("products:list") + "?sort=price_asc", htmx),
+            (reverse("products:category", args=[category.slug]), ()),
+            (reverse("products:detail", args=[product.slug]), ()),
+            (reverse("cart:cart_tab"), htmx),
+            (reverse("nav_category_products", args=[category.slug]), htmx),
+        ]
+
+    def _wait_for(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"server thoát với mã {server.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("server không khởi động kịp")
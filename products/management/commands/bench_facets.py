@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.facets import PRICE_BANDS, STOCK_STATES, ProductFilters, facet_index
+from products.models import Category, Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "So sánh đếm facet bằng bitmap với các câu COUNT trên DB (dữ liệu được rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100_000)
+        parser.add_argument("--categories", type=int, default=8)
+        parser.add_argument("--runs", type=int, default=100)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, size, categories, runs, batch_size, **options):
+        try:
+            with transaction.atomic():
+                self._run(size, categories, runs, batch_size)
+                raise _Rollback
+        except _Rollback:
+            pass
+        # chỉ mục đang chứa dữ liệu đã rollback
+        facet_index.version = None
+
+    def _run(self, size, category_count, runs, batch_size):
+        rng = random.Random(0)
+        category_ids = [
+            Category.objects.create(name=f"__bench_facets_{n}", slug=f"bench-facets-{n}").pk
+            for n in range(category_count)
+        ]
+        through = Product.categories.through
+        for start in range(0, size, batch_size):
+            batch = [
+                Product(name=f"__bench_facets_{n}", slug=f"bench-facets-{n}",
+                        price=rng.randrange(100_000, 320_000, 1_000), stock=rng.choice([0, 1, 5, 20]))
+                for n in range(start, min(size, start + batch_size))
+            ]
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+            ids = Product.objects.filter(slug__in=[p.slug for p in batch]).values_list("id", flat=True)
+            through.objects.bulk_create([
+                through(product_id=pk, category_id=category_id)
+                for pk in ids for category_id in rng.sample(category_ids, 2)
+            ])
+
+        started = time.perf_counter()
+        facet_index.build()
+        self.stdout.write(f"build: {size} sản phẩm trong {time.perf_counter() - started:.2f}s")
+
+        cases = [
+            ProductFilters(None, (), ()),
+            ProductFilters(category_ids[0], (), ()),
+            ProductFilters(category_ids[0], (PRICE_BANDS[1].key,), ("in_stock",)),
+            ProductFilters(None, (PRICE_BANDS[0].key, PRICE_BANDS[3].key), ("in_stock",)),
+        ]
+        self.stdout.write(f"{'bộ lọc':<40} {'bitmap ms':>10} {'COUNT ms':>10} {'queries':>8}")
+        for filters in cases:
+            bitmap_ms = self._time(runs, lambda: facet_index.facets(filters))
+            db_ms = self._time(max(runs // 20, 3), lambda: self._count_queries(filters))
+            label = f"cat={filters.category_id} price={','.join(filters.prices) or '-'} stock={','.join(filters.stocks) or '-'}"
+            self.stdout.write(f"{label:<40} {bitmap_ms:>10.3f} {db_ms:>10.1f} {self._queries:>8}")
+
+    def _count_queries(self, filters):
+        # cách làm không có bitmap: một COUNT cho mỗi giá trị facet
+        base = Product.objects.all()
+        if filters.category_id:
+            base = base.filter(categories=filters.category_id)
+        self._queries = 0
+        for category in Category.objects.values_list("id", flat=True):
+            Product.objects.filter(categories=category).filter(filters.q()).count()
+            self._queries += 1
+        for band in PRICE_BANDS:
+            base.filter(filters._replace(prices=(band.key,)).q()).count()
+            self._queries += 1
+        for key, _ in STOCK_STATES:
+            base.filter(filters._replace(stocks=(key,)).q()).count()
+            self._queries += 1
+
+    def _time(self, runs, func):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
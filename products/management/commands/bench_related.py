@@ -0,0 +1,59 @@
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from products.models import Category, Product
+from products.utils import get_related_products, related_bounds_key
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Đo độ trễ của get_related_products khi catalog tăng từ 100 đến 1.000.000 sản phẩm (dữ liệu được rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1_000, 10_000, 100_000, 1_000_000])
+        parser.add_argument("--runs", type=int, default=50, help="Số lần gọi cho mỗi kích thước")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, sizes, runs, batch_size, **options):
+        try:
+            with transaction.atomic():
+                self._run(sorted(sizes), runs, batch_size)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, runs, batch_size):
+        category = Category.objects.create(name="__bench_related__", slug="bench-related")
+        through = Product.categories.through
+        created = 0
+        self.stdout.write(f"{'products':>10} {'median ms':>10} {'p95 ms':>8} {'queries':>8}")
+        for size in sizes:
+            while created < size:
+                batch = [
+                    Product(name=f"__bench_{n}", slug=f"bench-{n}", price=100_000 + n % 900_000, stock=n % 20)
+                    for n in range(created, min(size, created + batch_size))
+                ]
+                Product.objects.bulk_create(batch, batch_size=batch_size)
+                # bulk_create không trả pk trên MySQL nên đọc lại id của lô vừa tạo
+                ids = Product.objects.filter(slug__in=[p.slug for p in batch]).values_list("id", flat=True)
+                through.objects.bulk_create([through(product_id=pk, category_id=category.pk) for pk in ids])
+                created += len(batch)
+
+            cache.delete_many([related_bounds_key(), related_bounds_key([category.pk])])
+            product = Product.objects.filter(slug=f"bench-{size // 2}").first()
+            timings, queries = [], 0
+            for _ in range(runs):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    get_related_products(product)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = max(queries, len(ctx.captured_queries))
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f"{size:>10} {statistics.median(timings):>10.2f} {p95:>8.2f} {queries:>8}")
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from products.models import Category, Product
+from products.search import search_index
+
+WORDS = ["den", "ban", "tuong", "tran", "treo", "go", "kinh", "dong", "mini", "tron",
+         "vuong", "cao", "nho", "vang", "bac", "trang", "xoay", "led", "cong"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "So sánh chỉ mục tìm kiếm trong bộ nhớ với lọc icontains trên DB (dữ liệu được rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=50_000)
+        parser.add_argument("--runs", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, size, runs, batch_size, **options):
+        try:
+            with transaction.atomic():
+                self._run(size, runs, batch_size)
+                raise _Rollback
+        except _Rollback:
+            pass
+        # chỉ mục đang chứa dữ liệu đã rollback
+        search_index.version = None
+
+    def _run(self, size, runs, batch_size):
+        rng = random.Random(0)
+        # từ vựng phân bố kiểu Zipf: vài từ rất phổ biến, phần lớn hiếm
+        vocabulary = WORDS + [f"tu{n}" for n in range(2_000)]
+        frequency = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        def words(count):
+            return " ".join(rng.choices(vocabulary, frequency, k=count))
+
+        category = Category.objects.create(name="__bench_search__", slug="bench-search")
+        through = Product.categories.through
+        for start in range(0, size, batch_size):
+            batch = [
+                Product(
+                    name=words(3).title() + f" {n}",
+                    slug=f"bench-search-{n}",
+                    description=words(30),
+                    price=100_000, stock=1,
+                )
+                for n in range(start, min(size, start + batch_size))
+            ]
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+            ids = Product.objects.filter(slug__in=[p.slug for p in batch]).values_list("id", flat=True)
+            through.objects.bulk_create([through(product_id=pk, category_id=category.pk) for pk in ids])
+
+        started = time.perf_counter()
+        search_index.build()
+        self.stdout.write(f"build: {size} sản phẩm trong {time.perf_counter() - started:.2f}s")
+
+        queries = ["den", "den ban", "tuong go", "kinh", "vuong cao led", "tro", "tu150 tu17"]
+        self.stdout.write(f"{'query':<16} {'index ms':>9} {'icontains ms':>13}")
+        for query in queries:
+            index_ms = self._time(runs, lambda: search_index.search(query, 24))
+
+            def icontains():
+                condition = Q()
+                for term in query.split():
+                    condition &= Q(name__icontains=term) | Q(description__icontains=term)
+                return list(Product.objects.filter(condition).values_list("id", flat=True)[:24])
+
+            db_ms = self._time(max(runs // 10, 5), icontains)
+            self.stdout.write(f"{query:<16} {index_ms:>9.3f} {db_ms:>13.3f}")
+
+    def _time(self, runs, func):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
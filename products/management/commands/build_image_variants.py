@@ -0,0 +1,91 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+from core.versions import bump_version
+from products.models import Product
+from products.thumbnails import delete_variants, generate_variants, manifest_paths, needs_variants
+from products.utils import MEDIA_VERSION
+
+# biến thể dùng để so sánh với ảnh gốc: thẻ sản phẩm trên lưới
+REPORT_FORMAT, REPORT_WIDTH = "webp", 384
+
+
+def _decode(data):
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+    return time.perf_counter() - start
+
+
+def _build(name):
+    # chạy trong tiến trình con: chỉ đọc/ghi file, không chạm DB
+    manifest = generate_variants(name)
+    with default_storage.open(name, "rb") as source:
+        original = source.read()
+    variants = dict(manifest["formats"].get(REPORT_FORMAT, []))
+    path = variants.get(REPORT_WIDTH) or (variants[max(variants)] if variants else None)
+    variant = b""
+    if path:
+        with default_storage.open(path, "rb") as source:
+            variant = source.read()
+    stats = (len(original), _decode(original), len(variant), _decode(variant) if variant else 0.0)
+    return manifest, stats
+
+
+class Command(BaseCommand):
+    help = "Tạo biến thể ảnh cho sản phẩm chưa có (hoặc tất cả với --force), song song trên nhiều tiến trình."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--force", action="store_true", help="tạo lại cả ảnh đã có biến thể")
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, workers, force, batch_size, **options):
+        products = Product.objects.exclude(image="").exclude(image__isnull=True).only("id", "image", "image_variants")
+        pending = [product for product in products.iterator(chunk_size=2000) if force or needs_variants(product)]
+        if not pending:
+            self.stdout.write("Không có ảnh nào cần tạo biến thể.")
+            return
+
+        self.stdout.write(f"{len(pending)} ảnh, {workers} tiến trình")
+        started = time.perf_counter()
+        done, errors, totals, batch = 0, 0, [0, 0.0, 0, 0.0], []
+        # không để tiến trình con thừa hưởng kết nối DB đang mở
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {pool.submit(_build, product.image.name): product for product in pending}
+            for future in as_completed(futures):
+                product = futures[future]
+                try:
+                    manifest, stats = future.result()
+                except Exception as exc:
+                    errors += 1
+                    self.stderr.write(f"{product.image.name}: {exc}")
+                    continue
+                delete_variants(product.image_variants, keep=manifest_paths(manifest))
+                product.image_variants = manifest
+                batch.append(product)
+                totals = [total + value for total, value in zip(totals, stats)]
+                done += 1
+                if len(batch) >= batch_size:
+                    Product.objects.bulk_update(batch, ["image_variants"])
+                    batch = []
+        if batch:
+            Product.objects.bulk_update(batch, ["image_variants"])
+        if done:
+            bump_version(MEDIA_VERSION)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"xong {done} ảnh, {errors} lỗi trong {elapsed:.1f}s")
+        if done:
+            original_bytes, original_decode, variant_bytes, variant_decode = (value / done for value in totals)
+            self.stdout.write(
+                f"trung bình mỗi thẻ sản phẩm: ảnh gốc {original_bytes / 1024:.0f} KB, giải mã {original_decode * 1000:.1f} ms"
+                f" -> {REPORT_FORMAT} {REPORT_WIDTH}px {variant_bytes / 1024:.0f} KB, giải mã {variant_decode * 1000:.1f} ms"
+            )
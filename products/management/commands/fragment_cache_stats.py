@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from products.fragments import FRAGMENT_NAMESPACES, catalog_versions, fragment_stats
+
+
+class Command(BaseCommand):
+    help = ("Tỉ lệ hit và thời gian render tiết kiệm được của fragment cache, cộng dồn từ mọi worker qua "
+            "cache dùng chung (số liệu của worker đang chạy trễ tối đa STATS_FLUSH_SECONDS).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Xóa số liệu sau khi in")
+
+    def handle(self, *args, reset, **options):
+        totals = fragment_stats.totals()
+        hits, misses = totals["hits"], totals["misses"]
+        lookups = hits + misses
+        versions = ", ".join(f"{name}={version}" for name, version in zip(FRAGMENT_NAMESPACES, catalog_versions()))
+
+        self.stdout.write(f"phiên bản: {versions}")
+        self.stdout.write(f"hits: {hits}  misses: {misses}  hit ratio: {hits / lookups:.1%}" if lookups else "chưa có lượt tra cache nào được ghi nhận")
+        if lookups:
+            self.stdout.write(f"thời gian render (miss): {totals['render_ns'] / 1e6:.1f} ms")
+            self.stdout.write(f"thời gian render tiết kiệm (hit): {totals['saved_ns'] / 1e6:.1f} ms")
+        if reset:
+            fragment_stats.reset()
+            self.stdout.write("đã xóa số liệu")
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_delete_productimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_out_of_stock',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(stock__lte=0, then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_out_of_stock', 'price', 'id'], name='product_stock_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_out_of_stock', '-price', '-id'], name='product_stock_price_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_out_of_stock', '-id'], name='product_stock_newest_idx'),
+        ),
+    ]
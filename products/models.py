@@ -1,7 +1,6 @@
-import os
-from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
+from .category_images import IMAGE_EXTENSIONS, category_images
 
 # Danh mục sản phẩm
 class Category(models.Model):
@@ -14,13 +13,9 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
-    def get_image(self, ext_list=['jpg', 'png', 'webp']):
-        for ext in ext_list:
-            path = f'core/images/categories/{self.slug}.{ext}'
-            full_path = os.path.join(settings.STATIC_ROOT, path)
-            if os.path.exists(full_path):
-                return path
-        return 'core/images/default-category.jpg'
+    def get_image(self, ext_list=IMAGE_EXTENSIONS):
+        # tra manifest dựng sẵn lúc khởi động, không đụng tới filesystem mỗi lần render
+        return category_images.resolve(self.slug, ext_list)
 
     def __str__(self):
         return self.name
@@ -38,10 +33,24 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=12, decimal_places=0)
     stock = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # manifest biến thể (products/thumbnails.py), được điền ở nền sau khi lưu ảnh
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # cột do DB tự tính (STORED) để sắp hàng hết về cuối bằng index, kể cả khi stock đổi qua update()
+    is_out_of_stock = models.GeneratedField(
+        expression=models.Case(models.When(stock__lte=0, then=models.Value(True)), default=models.Value(False)),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
 
     class Meta:
         ordering = ['-created_at']
+        # một index cho mỗi kiểu sắp xếp của product_list (phân trang keyset)
+        indexes = [
+            models.Index(fields=['is_out_of_stock', 'price', 'id'], name='product_stock_price_idx'),
+            models.Index(fields=['is_out_of_stock', '-price', '-id'], name='product_stock_price_desc_idx'),
+            models.Index(fields=['is_out_of_stock', '-id'], name='product_stock_newest_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -49,4 +58,14 @@ class Product(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+# Nhật ký sản phẩm thay đổi (ghi sau commit, products/signals.py): tiến trình khác
+# đọc các dòng mới để cập nhật chỉ mục trong bộ nhớ theo từng sản phẩm thay vì dựng lại
+class CatalogChange(models.Model):
+    # không dùng khóa ngoại: sản phẩm có thể đã bị xóa; None = phải dựng lại toàn bộ (danh mục đổi)
+    product_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.pk} sản phẩm {self.product_id or 'toàn bộ'}"
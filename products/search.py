@@ -0,0 +1,271 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from django.db.models import Q
+from .catalog_index import CatalogIndex
+
+# trọng số theo trường: khớp tên quan trọng hơn danh mục, danh mục hơn mô tả
+FIELD_WEIGHTS = (("name", 3.0), ("categories", 2.0), ("description", 1.0))
+# số token tối đa mà một tiền tố (đang gõ dở) được mở rộng thành
+PREFIX_EXPANSION_LIMIT = 64
+# token ngắn hơn thì không sửa lỗi chính tả (quá nhiều ứng viên)
+TYPO_MIN_LENGTH = 4
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    """Bỏ dấu tiếng Việt và viết thường: "Đèn bàn" -> "den ban"."""
+    text = (text or "").lower().replace("đ", "d")
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def _deletes(token):
+    # các biến thể xóa một ký tự, dùng để tìm token cách nhau một lỗi gõ (kiểu SymSpell)
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class ProductSearchIndex(CatalogIndex):
+    """Chỉ mục đảo ngược trong tiến trình cho tên, mô tả và tên danh mục của sản phẩm."""
+
+    name = "product-search"
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)  # token -> {product_id: trọng số}
+        self._documents = {}                # product_id -> {token: trọng số}
+        self._terms = []                    # token đã sắp xếp, cho tìm theo tiền tố
+        self._typos = defaultdict(set)      # biến thể xóa 1 ký tự -> token
+        self._ranked = {}                   # token -> [(trọng số, product_id)] giảm dần, dựng lười
+
+    # --- cập nhật chỉ mục ---
+
+    def _weights(self, name, description, category_names):
+        weights = defaultdict(float)
+        fields = {"name": name, "description": description, "categories": " ".join(category_names)}
+        for field, weight in FIELD_WEIGHTS:
+            tokens = tokenize(fields[field])
+            for token in tokens:
+                # chuẩn hóa theo độ dài trường để mô tả dài không lấn át tên
+                weights[token] += weight / math.sqrt(len(tokens))
+        return weights
+
+    def _add_term(self, token):
+        bisect.insort(self._terms, token)
+        self._add_typos(token)
+
+    def _add_typos(self, token):
+        if len(token) >= TYPO_MIN_LENGTH:
+            for variant in _deletes(token) | {token}:
+                self._typos[variant].add(token)
+
+    def _remove_locked(self, product_id):
+        for token in self._documents.pop(product_id, {}):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            self._ranked.pop(token, None)
+            if not posting:
+                del self._postings[token]
+                index = bisect.bisect_left(self._terms, token)
+                if index < len(self._terms) and self._terms[index] == token:
+                    del self._terms[index]
+
+    def _add_locked(self, product_id, weights, track_terms=True):
+        self._remove_locked(product_id)
+        self._documents[product_id] = weights
+        for token, weight in weights.items():
+            if track_terms and token not in self._postings:
+                self._add_term(token)
+            self._postings[token][product_id] = weight
+            self._ranked.pop(token, None)
+
+    def add(self, product_id, name, description="", category_names=()):
+        weights = self._weights(name, description, category_names)
+        with self._lock:
+            self._add_locked(product_id, weights)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def index_product(self, product):
+        # categories thường đã prefetch (apply_changes)
+        self.add(product.pk, product.name, product.description,
+                 [category.name for category in product.categories.all()])
+
+    def build(self):
+        from .models import Product
+
+        version, change_id = self.current_version(), self.latest_change_id()
+        categories = defaultdict(list)
+        for product_id, name in Product.categories.through.objects.values_list("product_id", "category__name").iterator(chunk_size=5000):
+            categories[product_id].append(name)
+
+        fresh = ProductSearchIndex()
+        rows = Product.objects.order_by().values_list("id", "name", "description").iterator(chunk_size=5000)
+        for product_id, name, description in rows:
+            weights = fresh._weights(name, description, categories.get(product_id, ()))
+            fresh._add_locked(product_id, weights, track_terms=False)
+        # dựng danh sách token đã sắp xếp một lần thay vì chèn từng token
+        fresh._terms = sorted(fresh._postings)
+        for token in fresh._terms:
+            fresh._add_typos(token)
+
+        with self._lock:
+            self._postings, self._documents = fresh._postings, fresh._documents
+            self._terms, self._typos, self._ranked = fresh._terms, fresh._typos, {}
+            self._built(version, change_id)
+
+    # --- truy vấn ---
+
+    def _expand(self, term, prefix):
+        if term in self._postings and not prefix:
+            return [term]
+        expansions = []
+        if prefix:
+            start = bisect.bisect_left(self._terms, term)
+            candidates = []
+            for token in self._terms[start:start + PREFIX_EXPANSION_LIMIT * 4]:
+                if not token.startswith(term):
+                    break
+                candidates.append(token)
+            # ưu tiên các token phổ biến khi tiền tố quá ngắn
+            expansions = heapq.nlargest(PREFIX_EXPANSION_LIMIT, candidates, key=lambda t: len(self._postings[t]))
+        if not expansions and len(term) >= TYPO_MIN_LENGTH:
+            matches = set()
+            for variant in _deletes(term) | {term}:
+                matches |= self._typos.get(variant, set())
+            expansions = [token for token in matches if token in self._postings]
+        return expansions
+
+    def _ranked_posting(self, token):
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            ranked = sorted(((w, pid) for pid, w in self._postings[token].items()), reverse=True)
+            self._ranked[token] = ranked
+        return ranked
+
+    def _scored(self, token, idf):
+        # (-điểm, product_id) theo điểm giảm dần, để heapq.merge gộp nhiều token
+        for weight, pid in self._ranked_posting(token):
+            yield -weight * idf, pid
+
+    def search(self, query, limit=20):
+        """Trả về [(product_id, điểm)] theo độ liên quan giảm dần.
+
+        Mọi từ đều phải khớp (AND); từ cuối được hiểu là tiền tố để dùng cho
+        tìm-khi-gõ; từ không khớp chính xác được thử sửa một lỗi chính tả.
+        """
+        return self._search(query, limit)
+
+    def _search(self, query, limit):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            total = max(len(self._documents), 1)
+            groups = []
+            for i, term in enumerate(terms):
+                expansions = self._expand(term, prefix=(i == len(terms) - 1))
+                if not expansions:
+                    return []
+                groups.append(expansions)
+
+            idf = {token: math.log(1 + total / len(self._postings[token])) for expansions in groups for token in expansions}
+
+            if len(groups) == 1:
+                # một từ: top-k của điểm max theo token nằm trong hợp các top-k của từng token
+                best = {}
+                for token in groups[0]:
+                    for weight, pid in self._ranked_posting(token)[:limit]:
+                        best[pid] = max(best.get(pid, 0.0), weight * idf[token])
+                return heapq.nlargest(limit, best.items(), key=lambda hit: hit[1])
+
+            # nhiều từ: thuật toán ngưỡng (Fagin TA) — duyệt song song danh sách
+            # đã xếp hạng của từng nhóm, tính đủ điểm cho mỗi sản phẩm mới gặp và
+            # dừng khi tổng điểm tại "mép" các danh sách không vượt được kết quả
+            # thứ `limit`, thay vì chấm điểm mọi sản phẩm khớp
+            lookups = [[(self._postings[token], idf[token]) for token in expansions] for expansions in groups]
+            streams = [
+                heapq.merge(*(self._scored(token, idf[token]) for token in expansions))
+                for expansions in groups
+            ]
+            frontier = [0.0] * len(groups)
+            top, seen = [], set()
+            while True:
+                for i, stream in enumerate(streams):
+                    entry = next(stream, None)
+                    if entry is None:
+                        # mọi sản phẩm khớp nhóm này đều đã được xét
+                        return [(pid, score) for score, pid in sorted(top, reverse=True)]
+                    negative, pid = entry
+                    frontier[i] = -negative
+                    if pid in seen:
+                        continue
+                    seen.add(pid)
+                    total_score = 0.0
+                    for postings in lookups:
+                        best = max(posting.get(pid, 0.0) * weight for posting, weight in postings)
+                        if not best:
+                            break
+                        total_score += best
+                    else:
+                        if len(top) < limit:
+                            heapq.heappush(top, (total_score, pid))
+                        elif total_score > top[0][0]:
+                            heapq.heapreplace(top, (total_score, pid))
+                if len(top) == limit and top[0][0] >= sum(frontier):
+                    return [(pid, score) for score, pid in sorted(top, reverse=True)]
+
+
+search_index = ProductSearchIndex()
+
+
+def _fallback_queryset(query, limit):
+    """Tìm thẳng trên DB (tên chứa mọi từ) khi chỉ mục đang dựng lần đầu: không bỏ dấu, không sửa lỗi gõ."""
+    from .models import Product
+
+    condition = Q()
+    for word in query.split():
+        condition &= Q(name__icontains=word)
+    return Product.objects.filter(condition).order_by("is_out_of_stock", "-id")[:limit]
+
+
+def search_products(query, limit=20):
+    """Product theo thứ tự liên quan (một query DB cho đúng các dòng cần hiển thị)."""
+    from .models import Product
+
+    if not tokenize(query):
+        return []
+    if not search_index.ensure_current():
+        return list(_fallback_queryset(query, limit))
+    hits = search_index.search(query, limit)
+    products = Product.objects.in_bulk([pid for pid, _ in hits])
+    return [products[pid] for pid, _ in hits if pid in products]
+
+
+async def asearch_products(query, limit=20):
+    """Bản async của search_products (đọc sản phẩm bằng async ORM)."""
+    from .models import Product
+
+    if not tokenize(query):
+        return []
+    if not await search_index.aensure_current():
+        return [product async for product in _fallback_queryset(query, limit)]
+    hits = search_index._search(query, limit)
+    products = await Product.objects.ain_bulk([pid for pid, _ in hits])
+    return [products[pid] for pid, _ in hits if pid in products]
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from core.versions import bump_version
+from .catalog_index import CHANGE_RETENTION
+from .facets import facet_index
+from .models import CatalogChange, Category, Product
+from .search import search_index
+from .thumbnails import needs_variants, schedule_variants
+from .utils import CATALOG_VERSION
+
+CATALOG_INDEXES = (search_index, facet_index)
+# dọn nhật ký CatalogChange mỗi khi id chia hết cho số này
+CHANGE_PRUNE_EVERY = 500
+
+
+def catalog_changed(product_ids):
+    """Sau commit: ghi nhật ký, tăng phiên bản catalog rồi cập nhật chỉ mục của tiến trình này.
+
+    `product_ids=None` khi không biết sản phẩm nào bị ảnh hưởng (danh mục
+    đổi): mọi tiến trình dựng lại chỉ mục. Nhật ký phải commit trước khi
+    phiên bản đổi để tiến trình khác thấy phiên bản mới là đọc được nó.
+    """
+    last = None
+    for product_id in product_ids if product_ids is not None else [None]:
+        last = CatalogChange.objects.create(product_id=product_id)
+    if last is not None and last.pk % CHANGE_PRUNE_EVERY == 0:
+        CatalogChange.objects.filter(created_at__lt=timezone.now() - CHANGE_RETENTION).delete()
+    bump_version(CATALOG_VERSION)
+    for index in CATALOG_INDEXES:
+        # không áp dụng được (phải dựng lại) thì lượt dùng sau làm ở nền
+        if index.ready:
+            index.apply_changes()
+
+
+def _on_commit(product_ids, raw=False):
+    if raw:
+        # nạp fixture: không ghi nhật ký, chỉ báo phiên bản đổi để dựng lại
+        transaction.on_commit(lambda: bump_version(CATALOG_VERSION))
+    elif product_ids is None or product_ids:
+        # sửa bị rollback thì không tới cache lẫn chỉ mục
+        transaction.on_commit(lambda: catalog_changed(product_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, raw=False, **kwargs):
+    # tên danh mục nằm trong chỉ mục tìm kiếm của mọi sản phẩm thuộc nó
+    _on_commit(None, raw)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, raw=False, **kwargs):
+    _on_commit([instance.pk], raw)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        _on_commit([instance.pk])
+    else:
+        # category.products.clear() không cho biết sản phẩm nào: dựng lại
+        _on_commit(sorted(pk_set) if pk_set is not None else None)
+
+
+@receiver(post_save, sender=Product)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    # ảnh mới hoặc bị xóa: tạo lại biến thể ở nền, không chặn request lưu sản phẩm
+    if not raw and needs_variants(instance):
+        schedule_variants(instance)
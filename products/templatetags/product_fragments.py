@@ -0,0 +1,55 @@
+from django import template
+from products.fragments import prefetch_fragments, product_vary, render_fragment
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary = vary
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary = []
+        for value in self.vary:
+            value = value.resolve(context)
+            # product|product_vary trả về nhiều phần khóa
+            if isinstance(value, tuple):
+                vary.extend(value)
+            else:
+                vary.append(value)
+        return render_fragment(name, vary, lambda: self.nodelist.render(context), context.get("request"))
+
+
+@register.tag
+def fragment(parser, token):
+    """{% fragment "tên" biến... %}...{% endfragment %}
+
+    Cache đoạn template theo tên, các biến và phiên bản catalog/ảnh; nội
+    dung bên trong không được phụ thuộc người dùng (không dùng csrf_token).
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'fragment' cần ít nhất tên fragment")
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
+
+
+@register.filter(name="product_vary")
+def product_vary_filter(product):
+    """Phần khóa fragment của một sản phẩm; dùng chung với prefetch_product_fragments."""
+    return product_vary(product)
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_product_fragments(context, name, products):
+    """{% prefetch_product_fragments "tên" products %} trước vòng lặp
+
+    Đọc trước (một get_many) fragment `name` của cả danh sách, khóa theo
+    product|product_vary như trong thẻ {% fragment %} của từng sản phẩm.
+    """
+    prefetch_fragments(context.get("request"), name, [product_vary(product) for product in products])
+    return ""
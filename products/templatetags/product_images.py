@@ -0,0 +1,45 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from products.thumbnails import VARIANT_MIME_TYPES
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ", ".join(f"{default_storage.url(path)} {width}w" for width, path in variants)
+
+
+@register.simple_tag
+def product_image(product, sizes="100vw", width=None, **attrs):
+    """{% product_image product sizes="96px" width=192 class="..." %}
+
+    <picture> với srcset AVIF/WebP/JPEG từ manifest biến thể; `width` là bề
+    rộng (px) dùng cho src dự phòng. Sản phẩm chưa có biến thể thì dùng ảnh gốc.
+    """
+    attrs.setdefault("alt", product.name)
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    manifest = product.image_variants or {}
+    formats = manifest.get("formats") if manifest.get("src") == product.image.name else None
+    if not formats:
+        return format_html("<img src=\"{}\"{}>", product.image.url, _attributes(attrs))
+
+    fallback = formats["jpeg"]
+    src_width, src = next(((w, path) for w, path in fallback if width is None or w >= int(width)), fallback[-1])
+    attrs["width"] = src_width
+    attrs["height"] = round(manifest["height"] * src_width / manifest["width"])
+    sources = format_html_join(
+        "", "<source type=\"{}\" srcset=\"{}\" sizes=\"{}\">",
+        # theo thứ tự ưu tiên cố định (MySQL không giữ thứ tự khóa JSON)
+        ((mime, _srcset(formats[key]), sizes) for key, mime in VARIANT_MIME_TYPES.items()
+         if key != "jpeg" and key in formats),
+    )
+    return format_html(
+        "<picture>{}<img src=\"{}\" srcset=\"{}\" sizes=\"{}\"{}></picture>",
+        sources, default_storage.url(src), _srcset(fallback), sizes, _attributes(attrs),
+    )
+
+
+def _attributes(attrs):
+    return format_html_join("", " {}=\"{}\"", sorted(attrs.items()))
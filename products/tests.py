@@ -0,0 +1,399 @@
+import random
+from unittest import mock
+from django.core import serializers
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import User
+from core.versions import bump_version
+from django.http import QueryDict
+from .facets import ProductFacetIndex, ProductFilters, facet_index
+from .models import CatalogChange, Category, Product
+from .utils import RELATED_ID_QUERIES, RELATED_LIMIT, STOCK_VERSION, get_related_products
+from .search import ProductSearchIndex, search_index
+
+# số query của changelist sản phẩm, không phụ thuộc số dòng trên trang
+PRODUCT_CHANGELIST_QUERIES = 7
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductAdminQueryTests(TestCase):
+    """Changelist sản phẩm trong admin tốn số query cố định dù có ít hay nhiều sản phẩm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("quan-tri", "quan-tri@example.com", "mat-khau-thu-123")
+        cls.categories = [Category.objects.create(name=f"Phòng {n}") for n in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _add_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(name=f"Kệ thử {n}", slug=f"ke-thu-{n}", price=150_000 + n, stock=n % 4) for n in range(count)
+        ])
+        Product.categories.through.objects.bulk_create([
+            Product.categories.through(product=product, category=self.categories[n % len(self.categories)])
+            for n, product in enumerate(products)
+        ])
+
+    def _assert_changelist(self):
+        url = reverse("admin:products_product_changelist")
+        self.client.get(url)  # làm nóng content type, session...
+        with self.assertNumQueries(PRODUCT_CHANGELIST_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelist_with_few_products(self):
+        self._add_products(2)
+        self._assert_changelist()
+
+    def test_changelist_with_full_page_of_products(self):
+        # nhiều hơn một trang changelist (100 dòng)
+        self._add_products(120)
+        self._assert_changelist()
+
+
+class CountingCache(LocMemCache):
+    """LocMem đếm số lượt đọc: với DatabaseCache/Redis mỗi lượt là một câu SQL / một round trip."""
+
+    reads = 0
+
+    def get(self, key, default=None, version=None):
+        CountingCache.reads += 1
+        return super().get(key, default, version)
+
+    def get_many(self, keys, version=None):
+        CountingCache.reads += 1
+        missing = object()
+        found = ((key, super(CountingCache, self).get(key, missing, version)) for key in keys)
+        return {key: value for key, value in found if value is not missing}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'products.tests.CountingCache'}})
+class CatalogPageCacheReadTests(TestCase):
+    """Trang catalog đã nóng: một lượt đọc phiên bản và một lượt đọc thẻ sản phẩm, dù trang có bao nhiêu thẻ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Đèn treo")
+        products = Product.objects.bulk_create([
+            Product(name=f"Đèn treo {n}", slug=f"den-treo-{n}", price=500_000 + n, stock=20) for n in range(12)
+        ])
+        cls.category.products.add(*products)
+
+    def setUp(self):
+        cache.clear()
+        # chỉ mục bình thường dựng ở nền; dựng sẵn để trang có sidebar facet đầy đủ
+        facet_index.build()
+        search_index.build()
+
+    def _assert_reads(self, url, expected, queries=1, **headers):
+        self.client.get(url, **headers)
+        CountingCache.reads = 0
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CountingCache.reads, expected)
+        return response
+
+    def test_home(self):
+        self._assert_reads(reverse('home'), 2)
+
+    def test_product_list(self):
+        response = self._assert_reads(reverse('products:list'), 2)
+        self.assertContains(response, "Đèn treo 11")
+
+    def test_category_page(self):
+        self._assert_reads(reverse('products:category', args=[self.category.slug]), 2)
+
+    def test_nav_partial(self):
+        # cả response partial nằm trong cache: không query DB
+        self._assert_reads(reverse('nav_category_products', args=[self.category.slug]), 2, queries=0,
+                           HTTP_HX_REQUEST="true")
+
+    def test_catalog_change_rerenders_cards(self):
+        url = reverse('products:list')
+        self.client.get(url)
+        product = Product.objects.get(slug="den-treo-11")
+        product.name = "Đèn treo đổi tên"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertContains(self.client.get(url), "Đèn treo đổi tên")
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchIndexTests(TestCase):
+    """Tìm kiếm không dấu, theo tiền tố (tìm-khi-gõ) và sửa một lỗi gõ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lamps = Category.objects.create(name="Đèn trang trí")
+        cls.desk_lamp = Product.objects.create(name="Đèn bàn gỗ sồi", slug="den-ban-go-soi", price=450_000, stock=3)
+        cls.floor_lamp = Product.objects.create(name="Đèn cây đứng", slug="den-cay-dung", price=900_000, stock=3)
+        cls.sofa = Product.objects.create(name="Ghế sofa nhung", slug="ghe-sofa-nhung", price=7_000_000, stock=1,
+                                          description="Sofa ba chỗ bọc nhung")
+        cls.desk_lamp.categories.add(lamps)
+        cls.floor_lamp.categories.add(lamps)
+
+    def setUp(self):
+        self.index = ProductSearchIndex()
+        self.index.build()
+
+    def _ids(self, query):
+        return [product_id for product_id, _ in self.index.search(query)]
+
+    def test_accents_are_folded(self):
+        self.assertEqual(self._ids("den ban"), [self.desk_lamp.pk])
+        self.assertEqual(self._ids("ĐÈN BÀN"), [self.desk_lamp.pk])
+        self.assertEqual(set(self._ids("trang tri")), {self.desk_lamp.pk, self.floor_lamp.pk})
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self._ids("ghe so"), [self.sofa.pk])
+        self.assertEqual(set(self._ids("de")), {self.desk_lamp.pk, self.floor_lamp.pk})
+        # chỉ từ cuối là tiền tố
+        self.assertEqual(self._ids("gh sofa"), [])
+
+    def test_one_typo_is_corrected(self):
+        self.assertEqual(self._ids("soffa"), [self.sofa.pk])
+        self.assertEqual(self._ids("nhugn ghe"), [self.sofa.pk])  # đảo hai ký tự
+        self.assertEqual(self._ids("nhxyng"), [])  # hai lỗi
+        # từ ngắn không được sửa
+        self.assertEqual(self._ids("gee sofa"), [])
+
+    def test_name_ranks_above_description(self):
+        Product.objects.create(name="Gối tựa", slug="goi-tua", price=200_000, stock=9,
+                               description="Gối hợp với sofa nhung")
+        self.index.build()
+        self.assertEqual(self._ids("sofa")[0], self.sofa.pk)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogChangeTests(TestCase):
+    """Chỉ mục nhận thay đổi sau commit, theo từng sản phẩm, kể cả ở tiến trình khác."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Bàn ăn")
+        cls.product = Product.objects.create(name="Bàn ăn mặt đá", slug="ban-an-mat-da", price=5_000_000, stock=4)
+        cls.product.categories.add(cls.category)
+
+    def setUp(self):
+        cache.clear()
+        search_index.build()
+        facet_index.build()
+        # chỉ mục của một tiến trình khác: không nhận signal, chỉ thấy phiên bản đổi
+        self.other = ProductSearchIndex()
+        self.other.build()
+
+    def _rename(self, name):
+        self.product.name = name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+    def _found(self, index, query):
+        return [product_id for product_id, _ in index.search(query)]
+
+    def test_save_updates_only_that_product(self):
+        with mock.patch.object(ProductSearchIndex, "build") as build:
+            self._rename("Bàn ăn gỗ óc chó")
+            self.assertFalse(self.other.version == self.other.current_version())
+            self.other.refresh()
+
+        build.assert_not_called()
+        self.assertEqual(list(CatalogChange.objects.values_list("product_id", flat=True)), [self.product.pk])
+        for index in (search_index, self.other):
+            self.assertEqual(self._found(index, "oc cho"), [self.product.pk])
+            self.assertEqual(self._found(index, "mat da"), [])
+            self.assertEqual(index.version, index.current_version())
+
+    def test_new_and_deleted_products(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            chair = Product.objects.create(name="Ghế ăn mây", slug="ghe-an-may", price=800_000, stock=2)
+        self.other.refresh()
+        self.assertEqual(self._found(self.other, "may"), [chair.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            chair.delete()
+        self.other.refresh()
+        self.assertEqual(self._found(self.other, "may"), [])
+        self.assertEqual(self._found(search_index, "may"), [])
+
+    def test_rolled_back_edit_never_reaches_index(self):
+        version = search_index.version
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.product.name = "Bàn ăn bị hủy"
+                    self.product.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(search_index.version, version)
+        self.assertEqual(self._found(search_index, "bi huy"), [])
+        self.assertFalse(CatalogChange.objects.exists())
+
+    def test_fixture_load_is_not_indexed_per_row(self):
+        data = serializers.serialize("json", [self.product])
+        with self.captureOnCommitCallbacks(execute=True):
+            for loaded in serializers.deserialize("json", data):
+                loaded.save()  # raw=True như loaddata
+
+        self.assertFalse(CatalogChange.objects.exists())
+        # phiên bản vẫn đổi: lượt dùng sau dựng lại toàn bộ
+        self.assertNotEqual(search_index.version, search_index.current_version())
+
+    def test_category_change_rebuilds(self):
+        self.category.name = "Bàn bếp"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+
+        self.assertFalse(self.other.apply_changes())
+        self.other.refresh()
+        self.assertEqual(self._found(self.other, "ban bep"), [self.product.pk])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FacetIndexTests(TestCase):
+    """Số đếm facet từ bitmap khớp với lọc thẳng trên DB, kể cả sau khi cập nhật từng sản phẩm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chairs = Category.objects.create(name="Ghế")
+        cls.tables = Category.objects.create(name="Bàn")
+        prices = [120_000, 180_000, 220_000, 260_000, 400_000, 140_000]
+        cls.products = [
+            Product.objects.create(name=f"Món {n}", slug=f"mon-{n}", price=price, stock=n % 3)
+            for n, price in enumerate(prices)
+        ]
+        for n, product in enumerate(cls.products):
+            product.categories.add(cls.chairs if n % 2 else cls.tables)
+        cls.products[0].categories.add(cls.chairs)
+
+    def setUp(self):
+        cache.clear()
+        self.index = ProductFacetIndex()
+        self.index.build()
+
+    def _filters(self, query="", category=None):
+        return ProductFilters.from_params(QueryDict(query), category.pk if category else None)
+
+    def _expected_total(self, filters):
+        queryset = Product.objects.filter(filters.q())
+        if filters.category_id is not None:
+            queryset = queryset.filter(categories=filters.category_id)
+        if len(filters.stocks) != 1:
+            queryset = queryset.distinct()
+        return queryset.count()
+
+    def _assert_matches_db(self):
+        for query in ("", "price=duoi-150k", "price=duoi-150k&price=tu-250k", "stock=in_stock",
+                      "stock=out_of_stock&price=200k-250k", "stock=in_stock&stock=out_of_stock"):
+            for category in (None, self.chairs, self.tables):
+                filters = self._filters(query, category)
+                with self.subTest(query=query, category=category):
+                    self.assertEqual(self.index._count(filters)["total"], self._expected_total(filters))
+
+    def test_counts_match_database(self):
+        self._assert_matches_db()
+
+    def test_each_facet_ignores_its_own_selection(self):
+        counts = self.index._count(self._filters("price=duoi-150k", self.chairs))
+        prices = {band.key: count for band, count, _ in counts["prices"]}
+        # khoảng giá đếm trong danh mục nhưng không bị giới hạn bởi khoảng giá đang chọn
+        self.assertEqual(prices, {"duoi-150k": 2, "150k-200k": 1, "200k-250k": 0, "tu-250k": 1})
+        # danh mục đếm theo khoảng giá đang chọn, không theo danh mục đang xem
+        self.assertEqual(counts["categories"], {self.chairs.pk: 2, self.tables.pk: 1})
+        self.assertEqual(counts["total"], 2)
+
+    def test_changes_are_applied_per_product(self):
+        moved = self.products[4]
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.price = 100_000
+            moved.save()
+            moved.categories.set([self.chairs])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[5].delete()
+
+        with mock.patch.object(ProductFacetIndex, "build") as build:
+            self.index.refresh()
+        build.assert_not_called()
+        self.products = self.products[:5]
+        self._assert_matches_db()
+
+    def test_order_stock_changes_refresh_stock_bitmap(self):
+        # đơn hàng đổi tồn kho bằng update() (không signal) và chỉ tăng STOCK_VERSION
+        sold_out = self.products[1]
+        Product.objects.filter(pk=sold_out.pk).update(stock=F("stock") - sold_out.stock)
+        bump_version(STOCK_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[2].name = "Món đổi tên"
+            self.products[2].save()
+
+        self.index.refresh()
+
+        self.assertEqual(self.index.version, self.index.current_version())
+        self._assert_matches_db()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RelatedProductsTests(TestCase):
+    """Sản phẩm liên quan: ưu tiên cùng danh mục, số câu query có giới hạn, không luôn là một dải id liền nhau."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamps = Category.objects.create(name="Đèn")
+        cls.rugs = Category.objects.create(name="Thảm")
+        lamps = Product.objects.bulk_create([
+            Product(name=f"Đèn {n}", slug=f"den-{n}", price=300_000, stock=5) for n in range(40)
+        ])
+        rugs = Product.objects.bulk_create([
+            Product(name=f"Thảm {n}", slug=f"tham-{n}", price=600_000, stock=5) for n in range(4)
+        ])
+        cls.lamps.products.add(*lamps)
+        cls.rugs.products.add(*rugs)
+        cls.lamp_ids = [product.pk for product in lamps]
+        cls.rug_ids = [product.pk for product in rugs]
+
+    def setUp(self):
+        cache.clear()
+        random.seed(14)
+
+    def test_prefers_same_category(self):
+        product = Product.objects.get(pk=self.lamp_ids[0])
+        for _ in range(10):
+            ids = [related.pk for related in get_related_products(product)]
+            self.assertEqual(len(ids), RELATED_LIMIT)
+            self.assertNotIn(product.pk, ids)
+            self.assertTrue(set(ids) <= set(self.lamp_ids))
+
+    def test_small_category_is_filled_from_catalog(self):
+        product = Product.objects.get(pk=self.rug_ids[0])
+        ids = {related.pk for related in get_related_products(product)}
+        self.assertEqual(len(ids), RELATED_LIMIT)
+        self.assertTrue(set(self.rug_ids[1:]) <= ids)
+        self.assertNotIn(product.pk, ids)
+
+    def test_not_a_contiguous_run(self):
+        product = Product.objects.get(pk=self.lamp_ids[0])
+        position = {pk: n for n, pk in enumerate(self.lamp_ids)}
+        runs = 0
+        for _ in range(10):
+            positions = sorted(position[related.pk] for related in get_related_products(product))
+            runs += positions[-1] - positions[0] == len(positions) - 1
+        self.assertLess(runs, 10)
+
+    def test_query_budget(self):
+        product = Product.objects.get(pk=self.rug_ids[0])
+        get_related_products(product)  # khoảng id vào cache
+        for _ in range(10):
+            with CaptureQueriesContext(connection) as queries:
+                get_related_products(product)
+            # danh mục của sản phẩm + đọc id + đọc các dòng hiển thị
+            self.assertLessEqual(len(queries), 1 + RELATED_ID_QUERIES + 1)
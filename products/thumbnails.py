@@ -0,0 +1,140 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# chiều rộng cố định của biến thể: ô giỏ hàng 96px (x2), thẻ sản phẩm ~384px (x2), trang chi tiết
+VARIANT_WIDTHS = (96, 192, 384, 768, 1200)
+VARIANT_DIR = "products/variants"
+# định dạng theo thứ tự ưu tiên trong <picture>; jpeg luôn có để làm src dự phòng
+VARIANT_FORMATS = (
+    ("avif", "AVIF", {"quality": 55, "speed": 8}),
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+VARIANT_MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+# số thread nền tạo biến thể sau khi lưu sản phẩm (Pillow nhả GIL khi resize/encode)
+THUMBNAIL_WORKERS = 2
+
+
+def available_formats():
+    return [fmt for fmt in VARIANT_FORMATS if fmt[0] == "jpeg" or features.check(fmt[0])]
+
+
+def variant_prefix(name):
+    # thư mục riêng theo tên ảnh gốc: ảnh mới (tên khác) không ghi đè biến thể của ảnh cũ
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f"{VARIANT_DIR}/{stem}-{hashlib.sha1(name.encode()).hexdigest()[:8]}"
+
+
+def _open(name):
+    with default_storage.open(name, "rb") as source:
+        image = Image.open(source)
+        # JPEG: giải mã thẳng ở tỉ lệ nhỏ hơn (1/2, 1/4, 1/8) khi ảnh gốc lớn hơn nhiều biến thể lớn nhất
+        image.draft("RGB", (VARIANT_WIDTHS[-1], VARIANT_WIDTHS[-1]))
+        image = ImageOps.exif_transpose(image)
+    return image
+
+
+def generate_variants(name):
+    """Tạo biến thể theo VARIANT_WIDTHS cho ảnh `name` trong default_storage, trả về manifest.
+
+    Manifest: {"src", "width", "height", "formats": {định dạng: [[rộng, tên file], ...]}}.
+    Ảnh không lớn hơn một mức rộng thì dừng ở kích thước gốc (không phóng to).
+    Metadata (EXIF, ICC) không được ghi sang biến thể.
+    """
+    image = _open(name)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    width, height = image.size
+
+    widths = [w for w in VARIANT_WIDTHS if w < width] + [min(width, VARIANT_WIDTHS[-1])]
+    prefix = variant_prefix(name)
+    formats = {}
+    # thu nhỏ dần từ biến thể lớn nhất: mỗi bước resize trên ảnh đã nhỏ hơn
+    current = image
+    for w in sorted(set(widths), reverse=True):
+        size = (w, max(1, round(height * w / width)))
+        if current.size != size:
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for key, pil_format, options in available_formats():
+            frame = current.convert("RGB") if key == "jpeg" and has_alpha else current
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            path = f"{prefix}/{w}.{key}"
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            formats.setdefault(key, []).append([w, default_storage.save(path, ContentFile(buffer.getvalue()))])
+
+    for variants in formats.values():
+        variants.sort()
+    return {"src": name, "width": width, "height": height, "formats": formats}
+
+
+def delete_variants(manifest, keep=()):
+    keep = set(keep)
+    for variants in (manifest or {}).get("formats", {}).values():
+        for _, path in variants:
+            if path not in keep:
+                default_storage.delete(path)
+
+
+def manifest_paths(manifest):
+    return [path for variants in (manifest or {}).get("formats", {}).values() for _, path in variants]
+
+
+# --- tạo biến thể ở nền sau khi lưu ---
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+    return _executor
+
+
+def _process(product_id, name, old_manifest):
+    from core.versions import bump_version
+    from .models import Product
+    from .utils import MEDIA_VERSION
+
+    try:
+        manifest = generate_variants(name) if name else {}
+        # chỉ ghi nếu sản phẩm vẫn dùng đúng ảnh này (có thể đã đổi ảnh lần nữa trong lúc xử lý)
+        products = Product.objects.filter(pk=product_id)
+        products = products.filter(image=name) if name else products.filter(Q(image="") | Q(image__isnull=True))
+        updated = products.update(image_variants=manifest)
+        if updated:
+            delete_variants(old_manifest, keep=manifest_paths(manifest))
+            bump_version(MEDIA_VERSION)
+        else:
+            delete_variants(manifest)
+    except Exception:
+        logger.exception("Không tạo được biến thể ảnh cho sản phẩm %s (%s)", product_id, name)
+    finally:
+        connection.close()
+
+
+def schedule_variants(product):
+    """Đưa việc tạo biến thể của `product` vào thread nền sau khi transaction commit."""
+    name = product.image.name if product.image else ""
+    old_manifest = product.image_variants
+    transaction.on_commit(lambda: _get_executor().submit(_process, product.pk, name, old_manifest))
+
+
+def needs_variants(product):
+    name = product.image.name if product.image else ""
+    return (product.image_variants or {}).get("src", "") != name
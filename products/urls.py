@@ -5,6 +5,8 @@ app_name = 'products'
 
 urlpatterns = [
     path('', views.product_list, name='list'), 
+    # hai đoạn đường dẫn: không trùng được với '<slug:slug>/' của danh mục (kể cả danh mục có slug 'search')
+    path('search/results/', views.product_search, name='search'),
     path('<slug:slug>/', views.product_list, name='category'),
     path('category/<slug:slug>/', views.product_detail, name='detail'), 
 ]
\ No newline at end of file
@@ -0,0 +1,166 @@
+import random
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef
+from core.versions import aget_version, get_version
+from .models import Category, Product
+
+# namespace phiên bản của catalog, được signals tăng khi Category/Product thay đổi
+CATALOG_VERSION = "catalog"
+# tồn kho đổi qua đặt/hủy đơn (update() không gửi signal) chỉ tăng namespace này,
+# để không làm các chỉ mục catalog phải dựng lại sau mỗi đơn hàng; và chỉ khi
+# khách thấy khác (xem visible_stock), không phải sau mỗi đơn
+STOCK_VERSION = "stock"
+# từ ngưỡng này trở xuống thẻ sản phẩm hiện "Chỉ còn N" (product_card.html)
+LOW_STOCK_THRESHOLD = 5
+# biến thể ảnh được ghi bằng update() ở thread nền: tăng riêng namespace này
+MEDIA_VERSION = "media"
+NAVIGATION_TTL = 60 * 60 * 24
+
+
+RELATED_LIMIT = 9
+# đọc một cửa sổ id gấp chừng này lần số cần hiển thị rồi chọn ngẫu nhiên trong đó,
+# để các sản phẩm kề nhau theo id không lúc nào cũng đi cùng nhau
+RELATED_WINDOW = 4
+# số câu đọc id tối đa cho một trang chi tiết, kể cả lượt quay vòng về đầu khoảng id
+RELATED_ID_QUERIES = 3
+# khoảng id chỉ đổi khi thêm/xóa sản phẩm nên được cache ngắn hạn
+# thay vì tính lại ở mỗi lượt xem trang chi tiết
+RELATED_BOUNDS_TTL = 300
+
+
+def visible_stock(stock):
+    """Tồn kho như trên thẻ sản phẩm: số cụ thể khi sắp hết (hoặc 0), còn lại chỉ là "còn nhiều"."""
+    return stock if stock <= LOW_STOCK_THRESHOLD else LOW_STOCK_THRESHOLD + 1
+
+
+def category_products(category_id):
+    """Sản phẩm thuộc một danh mục, lọc bằng EXISTS thay vì JOIN qua bảng trung gian.
+
+    Với JOIN, DB lấy hết sản phẩm của danh mục rồi sắp xếp trong bảng tạm; với
+    EXISTS nó đi theo index sắp xếp của Product và dừng khi đủ một trang.
+    """
+    links = Product.categories.through.objects.filter(product_id=OuterRef("pk"), category_id=category_id)
+    return Product.objects.filter(Exists(links))
+
+
+def related_bounds_key(category_ids=None):
+    if not category_ids:
+        return "related:bounds:all"
+    return "related:bounds:" + ",".join(str(pk) for pk in sorted(category_ids))
+
+
+def _id_bounds(scopes):
+    """(id nhỏ nhất, id lớn nhất) của từng tập, đọc cache một lượt cho mọi tập."""
+    bounds = cache.get_many([key for _, key in scopes])
+    missing = {}
+    for queryset, key in scopes:
+        if key not in bounds:
+            # hai lần đọc theo hai đầu index thay cho MIN/MAX, vốn phải quét cả tập khi có EXISTS
+            ids = queryset.values_list("id", flat=True)
+            missing[key] = (ids.order_by("id").first(), ids.order_by("-id").first())
+    if missing:
+        cache.set_many(missing, RELATED_BOUNDS_TTL)
+        bounds.update(missing)
+    return bounds
+
+
+def _window_ids(queryset, bounds, size, needed, exclude, budget):
+    """Tối đa `size` id liên tiếp theo index, bắt đầu từ một điểm ngẫu nhiên trong khoảng id.
+
+    Nếu đoạn sau điểm xoay chưa đủ `needed` id thì quay vòng về đầu khoảng một
+    lần (khi còn lượt). Trả về (ids, số câu đọc id còn lại).
+    """
+    lo, hi = bounds
+    if lo is None or budget <= 0:
+        return [], budget
+    queryset = queryset.exclude(id__in=exclude).order_by("id").values_list("id", flat=True)
+    pivot = random.randint(lo, hi)
+    ids = list(queryset.filter(id__gte=pivot)[:size])
+    budget -= 1
+    if len(ids) < needed and pivot > lo and budget > 0:
+        ids += list(queryset.filter(id__lt=pivot)[:size - len(ids)])
+        budget -= 1
+    return ids, budget
+
+
+def get_related_products(product, limit=RELATED_LIMIT):
+    """Sản phẩm liên quan: ưu tiên cùng danh mục, phần còn thiếu lấy từ toàn bộ catalog.
+
+    Không bao giờ tải cả bảng Product: đọc một cửa sổ id (chỉ cột id, theo
+    index) quanh một điểm ngẫu nhiên, chọn ngẫu nhiên trong cửa sổ đó, rồi đọc
+    đúng số dòng sẽ hiển thị. Đây là mẫu trong một cửa sổ chứ không phải mẫu
+    đều trên cả catalog; tối đa RELATED_ID_QUERIES câu đọc id và một lượt đọc
+    cache cho mỗi trang.
+    """
+    exclude = {product.pk}
+    category_ids = list(product.categories.values_list("id", flat=True))
+
+    scopes = []
+    if category_ids:
+        # EXISTS theo index unique (product_id, category_id) để DB duyệt khóa chính từ điểm xoay,
+        # thay vì lấy hết dòng của danh mục rồi sắp xếp
+        memberships = Product.categories.through.objects.filter(product_id=OuterRef("pk"), category_id__in=category_ids)
+        scopes.append((Product.objects.filter(Exists(memberships)), related_bounds_key(category_ids)))
+    scopes.append((Product.objects.all(), related_bounds_key()))
+
+    bounds = _id_bounds(scopes)
+    budget = RELATED_ID_QUERIES
+    ids = []
+    for queryset, key in scopes:
+        needed = limit - len(ids)
+        window, budget = _window_ids(queryset, bounds[key], needed * RELATED_WINDOW, needed, exclude, budget)
+        picked = random.sample(window, min(needed, len(window)))
+        ids += picked
+        exclude.update(picked)
+        if len(ids) >= limit:
+            break
+
+    products = list(Product.objects.filter(id__in=ids))
+    random.shuffle(products)
+    return products
+
+
+# bản sao trong tiến trình: (version, data); gán cả tuple một lần nên an toàn giữa các thread
+_navigation = (None, None)
+
+
+def _build_navigation():
+    categories = list(Category.objects.annotate(product_count=Count("products")))
+    return {
+        "categories": categories,  # theo Meta.ordering (order, name)
+        "categories_by_id": sorted(categories, key=lambda category: category.pk),
+        "by_slug": {category.slug: category for category in categories},
+        "total_products": Product.objects.count(),
+    }
+
+
+def get_site_navigation():
+    """Danh mục, slug, số sản phẩm mỗi danh mục và tổng sản phẩm cho navbar/home/list.
+
+    Đọc từ bản sao trong tiến trình nếu còn đúng phiên bản catalog, sau đó tới
+    cache dùng chung, cuối cùng mới query DB (2 câu) để dựng lại.
+    """
+    global _navigation
+    version = get_version(CATALOG_VERSION)
+    local_version, data = _navigation
+    if local_version == version:
+        return data
+
+    key = f"navigation:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = _build_navigation()
+        cache.set(key, data, NAVIGATION_TTL)
+    _navigation = (version, data)
+    return data
+
+
+async def aget_site_navigation():
+    # view async: kiểm tra bản sao trong tiến trình ngay trên event loop,
+    # chỉ sang thread khi phải đọc cache dùng chung/DB để dựng lại
+    version = await aget_version(CATALOG_VERSION)
+    local_version, data = _navigation
+    if local_version == version:
+        return data
+    return await sync_to_async(get_site_navigation)()
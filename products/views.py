@@ -1,64 +1,141 @@
-import random
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Count, Case, When, IntegerField
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render, aget_object_or_404
 from itertools import cycle
-from .models import Product, Category
+from core.pagination import akeyset_page
+from .facets import ProductFilters, facet_index
+from .fragments import cached_partial, catalog_page, skip_response_cache
+from .models import Product
+from .search import asearch_products
+from .utils import aget_site_navigation, category_products, get_related_products
 
-def product_list(request, slug=None):
-    CATEGORY_ICONS = ["dine_lamp", "wall_lamp", "table_lamp", "scene"]
+CATEGORY_ICONS = ["dine_lamp", "wall_lamp", "table_lamp", "scene"]
+PRODUCT_PAGE_SIZE = 24
+SEARCH_RESULT_LIMIT = 24
+PRODUCT_SORTS = {
+    'price_asc': ('is_out_of_stock', 'price', 'id'),
+    'price_desc': ('is_out_of_stock', '-price', '-id'),
+    # in-stock first, then newest
+    None: ('is_out_of_stock', '-id'),
+}
 
-    # annotate product counts per category
-    categories = list(Category.objects.annotate(product_count=Count('products')))
+# render template (context processor, fragment cache) vẫn là code sync: chạy ở thread
+arender = sync_to_async(render)
+
+
+async def _facet_context(filters, sort):
+    # số sản phẩm của mọi facet lấy từ bitmap trong bộ nhớ, không cần COUNT trên DB
+    navigation, facets = await asyncio.gather(aget_site_navigation(), facet_index.afacets(filters))
     icons_iter = cycle(CATEGORY_ICONS)
-    categories_with_icons = [(cat, next(icons_iter)) for cat in categories]
+    # chỉ mục đang dựng lần đầu (ở nền): hiện bộ lọc không kèm số lượng
+    pending = facets.get('pending', False)
+    return {
+        'categories_with_icons': [
+            (cat, next(icons_iter), None if pending else facets['categories'].get(cat.id, 0))
+            for cat in navigation['categories']
+        ],
+        'total_products_count': facets['all_categories'],
+        'facets': facets,
+        'filter_query': filters.query_string(sort),
+    }
+
+
+def _facet_response(response, facet_context):
+    # sidebar chưa có số lượng: không để cache/ETag giữ lại bản tạm này
+    if facet_context['facets'].get('pending'):
+        skip_response_cache(response)
+    return response
+
 
-    total_products_count = Product.objects.count()
+@catalog_page
+@cached_partial
+async def product_list(request, slug=None):
+    # danh mục lấy từ cache điều hướng
+    navigation = await aget_site_navigation()
+    category = None
 
     if slug:
-        category = get_object_or_404(Category, slug=slug)
-        products = category.products.all()
+        category = navigation['by_slug'].get(slug)
+        if category is None:
+            raise Http404("Category not found")
+        products = category_products(category.id)
     else:
         products = Product.objects.all()
 
-    # push out-of-stock items to the end
-    products = products.annotate(
-        is_out_of_stock=Case(
-            When(stock__lte=0, then=1),
-            default=0,
-            output_field=IntegerField()
-        )
-    )
-
-    # Áp dụng sắp xếp
-    sort = request.GET.get('sort')
-    if sort == 'price_asc':
-        products = products.order_by('is_out_of_stock', 'price')
-    elif sort == 'price_desc':
-        products = products.order_by('is_out_of_stock', '-price')
+    # lọc theo khoảng giá / tình trạng kho (chọn nhiều qua ?price=...&stock=...)
+    filters = ProductFilters.from_params(request.GET, category.id if category else None)
+    products = products.filter(filters.q())
+
+    # Áp dụng sắp xếp: hàng hết luôn ở cuối (cột is_out_of_stock), mỗi kiểu có index riêng
+    sort = request.GET.get('sort') or None
+    ordering = PRODUCT_SORTS.get(sort, PRODUCT_SORTS[None])
+
+    # phân trang keyset: trang sau lấy theo con trỏ, không dùng OFFSET
+    cursor = request.GET.get('cursor')
+    is_htmx = request.headers.get('HX-Request') or request.META.get('HTTP_HX_REQUEST')
+    if is_htmx and cursor:
+        products, next_cursor = await akeyset_page(products, ordering, cursor, PRODUCT_PAGE_SIZE)
+        facet_context = None
     else:
-        # in-stock first, then newest (change '-id' to preferred fallback)
-        products = products.order_by('is_out_of_stock', '-id')
+        # trang sản phẩm (DB) và sidebar facet (bộ nhớ) độc lập nhau: chạy đồng thời
+        (products, next_cursor), facet_context = await asyncio.gather(
+            akeyset_page(products, ordering, cursor, PRODUCT_PAGE_SIZE),
+            _facet_context(filters, sort),
+        )
+    page = {
+        'products': products,
+        'next_cursor': next_cursor,
+        'sort': sort,
+        'slug': slug,
+        'page_query': filters.query_string(sort),
+    }
 
-    if request.headers.get('HX-Request') or request.META.get('HTTP_HX_REQUEST'):
-        return render(request, 'products/partials/product_grid.html', {'products': products})
+    if is_htmx:
+        if cursor:
+            return await arender(request, 'products/partials/product_page.html', page)
+        # lưới mới kèm sidebar facet (swap out-of-band) để số lượng khớp bộ lọc
+        return _facet_response(await arender(request, 'products/partials/product_grid.html', {
+            **page,
+            **facet_context,
+            'facets_oob': True,
+        }), facet_context)
 
-    return render(request, 'products/list.html', {
+    return _facet_response(await arender(request, 'products/list.html', {
         'title': category.name if slug else 'All Products',
-        'categories_with_icons': categories_with_icons,
+        **page,
+        **facet_context,
+    }), facet_context)
+
+
+async def product_search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        # xóa ô tìm kiếm thì trả lại lưới sản phẩm bình thường
+        return await product_list(request)
+    # chỉ mục trong bộ nhớ: bỏ dấu, khớp tiền tố khi đang gõ, xếp theo độ liên quan
+    products = await asearch_products(query, SEARCH_RESULT_LIMIT)
+
+    if request.headers.get('HX-Request'):
+        return await arender(request, 'products/partials/product_grid.html', {'products': products})
+
+    facet_context = await _facet_context(ProductFilters.from_params(request.GET), None)
+    return _facet_response(await arender(request, 'products/list.html', {
+        'title': f'Tìm kiếm: {query}',
         'products': products,
-        'sort': sort,
-        'total_products_count': total_products_count,
-    })
+        'q': query,
+        **facet_context,
+    }), facet_context)
 
 
-def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug)
+@catalog_page
+async def product_detail(request, slug):
+    product = await aget_object_or_404(Product, slug=slug)
 
-    # Lấy 9 sản phẩm ngẫu nhiên (không bao gồm sản phẩm hiện tại)
-    all_products = list(Product.objects.exclude(id=product.id))
-    related_products = random.sample(all_products, min(9, len(all_products)))
+    # Lấy 9 sản phẩm ngẫu nhiên (không bao gồm sản phẩm hiện tại), ưu tiên cùng danh mục
+    related_products = await sync_to_async(get_related_products)(product)
 
-    return render(request, 'products/detail.html', {
+    return await arender(request, 'products/detail.html', {
         'product': product,
         'related_products': related_products,
-    })
\ No newline at end of file
+    })
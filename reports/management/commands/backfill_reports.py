@@ -0,0 +1,45 @@
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from orders.models import Order
+from reports.rollups import order_day, rebuild_days
+
+
+class Command(BaseCommand):
+    help = ("Tính lại bảng doanh số theo ngày từ lịch sử đơn, từng cụm --chunk-days ngày "
+            "(mỗi cụm một transaction; chạy lại an toàn, dừng giữa chừng thì chạy tiếp bằng --since).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="ngày bắt đầu (YYYY-MM-DD), mặc định ngày của đơn đầu tiên")
+        parser.add_argument("--until", type=date.fromisoformat, help="ngày kết thúc, mặc định hôm nay")
+        parser.add_argument("--chunk-days", type=int, default=7)
+
+    def handle(self, *args, since, until, chunk_days, **options):
+        if since is None or until is None:
+            bounds = Order.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+            if bounds["first"] is None:
+                self.stdout.write("chưa có đơn hàng nào")
+                return
+            since = since or order_day(bounds["first"])
+            until = until or max(order_day(bounds["last"]), timezone.localdate())
+        if since > until:
+            raise CommandError("--since phải trước --until")
+
+        started = time.perf_counter()
+        lines = 0
+        day = since
+        while day <= until:
+            end = min(day + timedelta(days=chunk_days - 1), until)
+            chunk_started = time.perf_counter()
+            chunk_lines = rebuild_days(day, end)
+            lines += chunk_lines
+            self.stdout.write(f"  {day} → {end}: {chunk_lines} dòng đơn ({time.perf_counter() - chunk_started:.2f}s)")
+            day = end + timedelta(days=1)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã tính lại {(until - since).days + 1} ngày, {lines} dòng đơn trong {elapsed:.1f}s "
+            f"({lines / elapsed if elapsed else 0:,.0f} dòng/s)"
+        ))
@@ -0,0 +1,61 @@
+from django.db import models
+from products.models import Category, Product
+
+
+# Số liệu bán hàng cộng dồn theo ngày (ngày đặt đơn), được reports.rollups cập nhật
+# khi đặt/hủy đơn; báo cáo chỉ đọc các bảng này, không quét OrderItem.
+class SalesFigures(models.Model):
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # đơn đặt trong ngày đó mà sau này bị hủy (tính theo ngày đặt, không theo ngày hủy)
+    cancelled_orders = models.PositiveIntegerField(default=0)
+    cancelled_units = models.PositiveIntegerField(default=0)
+    cancelled_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def net_revenue(self):
+        return self.revenue - self.cancelled_revenue
+
+
+class DailySales(SalesFigures):
+    date = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Doanh số theo ngày"
+        verbose_name_plural = "Doanh số theo ngày"
+
+    def __str__(self):
+        return f"{self.date}"
+
+
+class DailyProductSales(SalesFigures):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [models.UniqueConstraint(fields=['date', 'product'], name='daily_product_sales_unique')]
+        verbose_name = "Doanh số sản phẩm theo ngày"
+        verbose_name_plural = "Doanh số sản phẩm theo ngày"
+
+    def __str__(self):
+        return f"{self.date} · {self.product_id}"
+
+
+class DailyCategorySales(SalesFigures):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [models.UniqueConstraint(fields=['date', 'category'], name='daily_category_sales_unique')]
+        verbose_name = "Doanh số danh mục theo ngày"
+        verbose_name_plural = "Doanh số danh mục theo ngày"
+
+    def __str__(self):
+        return f"{self.date} · {self.category_id}"
@@ -0,0 +1,206 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from products.models import Product
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+PLACED = ("orders", "units", "revenue")
+CANCELLED = ("cancelled_orders", "cancelled_units", "cancelled_revenue")
+FIGURES = PLACED + CANCELLED
+MONEY = DecimalField(max_digits=16, decimal_places=2)
+
+
+def order_day(created_at):
+    return timezone.localdate(created_at)
+
+
+def _day_bounds(start, end):
+    """[start, end] (ngày) thành khoảng datetime [start 00:00, end+1 00:00) theo múi giờ hiện tại."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def _increment(model, key, deltas):
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        # savepoint riêng: nếu request khác vừa tạo đúng dòng này thì quay lại cộng dồn
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        model.objects.filter(**key).update(**changes)
+
+
+def _record(orders, lines, fields, sign=1):
+    """Cộng (sign=-1: trừ) số liệu của các đơn vào bảng tổng hợp.
+
+    `orders`: [(order_id, created_at)], `lines`: [(order_id, product_id, quantity, price)];
+    `fields` là PLACED hoặc CANCELLED. Các dòng được cập nhật theo thứ tự khóa cố
+    định (ngày, rồi sản phẩm, rồi danh mục) để hai đơn chạy song song không deadlock.
+    """
+    order_count, units, revenue = fields
+    days = {order_id: order_day(created_at) for order_id, created_at in orders}
+    product_ids = {product_id for _, product_id, _, _ in lines if product_id}
+    categories = defaultdict(list)
+    for product_id, category_id in Product.categories.through.objects.filter(
+        product_id__in=product_ids
+    ).values_list("product_id", "category_id"):
+        categories[product_id].append(category_id)
+
+    daily = defaultdict(Counter)
+    by_product = defaultdict(Counter)
+    by_category = defaultdict(Counter)
+    for day in days.values():
+        daily[day][order_count] += sign
+    category_orders = set()
+    for order_id, product_id, quantity, price in lines:
+        day = days[order_id]
+        quantity *= sign
+        amount = price * quantity
+        daily[day][units] += quantity
+        daily[day][revenue] += amount
+        if not product_id:
+            continue
+        product = by_product[(day, product_id)]
+        product[order_count] += sign
+        product[units] += quantity
+        product[revenue] += amount
+        for category_id in categories[product_id]:
+            category = by_category[(day, category_id)]
+            # một đơn chỉ tính một lần cho mỗi danh mục, dù có nhiều sản phẩm cùng danh mục
+            if (order_id, category_id) not in category_orders:
+                category_orders.add((order_id, category_id))
+                category[order_count] += sign
+            category[units] += quantity
+            category[revenue] += amount
+
+    for day in sorted(daily):
+        _increment(DailySales, {"date": day}, daily[day])
+    for day, product_id in sorted(by_product):
+        _increment(DailyProductSales, {"date": day, "product_id": product_id}, by_product[(day, product_id)])
+    for day, category_id in sorted(by_category):
+        _increment(DailyCategorySales, {"date": day, "category_id": category_id}, by_category[(day, category_id)])
+
+
+def _after_commit(record):
+    # dòng DailySales của hôm nay là điểm nóng: cập nhật trong transaction ngắn riêng
+    # sau khi đơn đã commit, để các checkout không phải chờ nhau ở dòng đó.
+    # Lỗi ở đây không làm hỏng đơn đã đặt (robust); số liệu lệch thì backfill_reports.
+    def apply():
+        with transaction.atomic():
+            record()
+
+    transaction.on_commit(apply, robust=True)
+
+
+def record_order_placed(order, items):
+    """Gọi trong transaction của place_order; `items` là các dòng giỏ vừa chuyển thành đơn.
+
+    Số liệu được cộng sau khi transaction commit (không cộng nếu rollback).
+    """
+    orders = [(order.pk, order.created_at)]
+    lines = [(order.pk, item.product_id, item.quantity, item.product.price) for item in items]
+    _after_commit(lambda: _record(orders, lines, PLACED))
+
+
+def record_orders_cancelled(order_ids, sign=1):
+    """Gọi trong transaction của cancel_orders, sau khi các đơn đã được khóa.
+
+    sign=-1 khi đơn đã hủy được đổi lại trạng thái khác (sửa tay trong admin).
+    Số liệu của các đơn được đọc và cộng sau khi transaction commit.
+    """
+    if not order_ids:
+        return
+    order_ids = list(order_ids)
+    _after_commit(lambda: _record(
+        list(Order.objects.filter(pk__in=order_ids).values_list("pk", "created_at")),
+        list(OrderItem.objects.filter(order_id__in=order_ids).values_list("order_id", "product_id", "quantity", "price")),
+        CANCELLED,
+        sign,
+    ))
+
+
+def _aggregates():
+    cancelled = Q(order__status="cancelled")
+    amount = F("price") * F("quantity")
+    return dict(
+        orders=Count("order", distinct=True),
+        units=Sum("quantity"),
+        revenue=Sum(amount, output_field=MONEY),
+        cancelled_orders=Count("order", distinct=True, filter=cancelled),
+        cancelled_units=Sum("quantity", filter=cancelled),
+        cancelled_revenue=Sum(amount, filter=cancelled, output_field=MONEY),
+    )
+
+
+def _figures(row):
+    return {name: row.get(name) or 0 for name in FIGURES}
+
+
+def rebuild_days(start, end):
+    """Tính lại toàn bộ số liệu của các ngày [start, end] từ Order/OrderItem (xóa rồi ghi lại).
+
+    Dùng cho backfill; chạy lại bao nhiêu lần cũng cho cùng kết quả. Các dòng
+    DailySales của khoảng ngày bị khóa trước khi đọc số liệu, nên phần cộng
+    sau commit của đơn đặt/hủy cùng lúc (cũng cập nhật dòng DailySales của
+    ngày đó trước tiên) phải chờ và không bị mất khi các dòng được ghi lại.
+    Đơn commit ngay trước khi đọc mà phần cộng còn đang chờ khóa thì bị tính
+    hai lần: tính lại ngày hôm nay khi vắng đơn, hoặc chạy lại lần nữa.
+    Trả về số dòng OrderItem đã tính.
+    """
+    with transaction.atomic():
+        list(DailySales.objects.select_for_update().filter(date__gte=start, date__lte=end).values_list("pk", flat=True))
+        return _rebuild_locked(start, end)
+
+
+def _rebuild_locked(start, end):
+    since, until = _day_bounds(start, end)
+    orders = Order.objects.filter(created_at__gte=since, created_at__lt=until).order_by()
+    items = OrderItem.objects.filter(order__created_at__gte=since, order__created_at__lt=until).annotate(
+        day=TruncDate("order__created_at")
+    ).order_by()
+
+    # số đơn lấy từ Order (kể cả đơn không còn dòng nào), số lượng/doanh thu từ OrderItem
+    daily = {
+        row["day"]: row
+        for row in orders.annotate(day=TruncDate("created_at")).values("day").annotate(
+            orders=Count("id"), cancelled_orders=Count("id", filter=Q(status="cancelled"))
+        )
+    }
+    lines = 0
+    for row in items.values("day").annotate(lines=Count("id"), **_aggregates()):
+        lines += row["lines"]
+        daily[row["day"]].update(
+            units=row["units"], revenue=row["revenue"],
+            cancelled_units=row["cancelled_units"], cancelled_revenue=row["cancelled_revenue"],
+        )
+    by_product = items.filter(product__isnull=False).values("day", "product_id").annotate(**_aggregates())
+    # JOIN qua bảng danh mục của sản phẩm: mỗi dòng đơn được tính cho mọi danh mục của sản phẩm đó
+    by_category = items.filter(product__categories__isnull=False).values("day", "product__categories").annotate(
+        **_aggregates()
+    )
+
+    for model in (DailySales, DailyProductSales, DailyCategorySales):
+        model.objects.filter(date__gte=start, date__lte=end).delete()
+    DailySales.objects.bulk_create([DailySales(date=day, **_figures(row)) for day, row in daily.items()])
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(date=row["day"], product_id=row["product_id"], **_figures(row)) for row in by_product],
+        batch_size=1000,
+    )
+    DailyCategorySales.objects.bulk_create(
+        [DailyCategorySales(date=row["day"], category_id=row["product__categories"], **_figures(row))
+         for row in by_category],
+        batch_size=1000,
+    )
+    return lines
@@ -0,0 +1,145 @@
+import csv
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts.models import Address, User
+from cart.models import Cart, CartItem
+from cart.utils import prefetch_cart_items
+from orders.models import Order, OrderItem
+from orders.utils import cancel_orders, place_order
+from products.models import Category, Product
+from .models import DailyCategorySales, DailyProductSales, DailySales
+from .rollups import FIGURES, rebuild_days, record_orders_cancelled
+
+DAY = datetime(2026, 3, 14, 10, 30, tzinfo=dt_timezone.utc)
+
+
+def _snapshot():
+    # toàn bộ bảng tổng hợp, để so số liệu cộng dồn với bản tính lại
+    return {
+        model.__name__: sorted(
+            model.objects.values_list(*keys, *FIGURES).order_by()
+        )
+        for model, keys in (
+            (DailySales, ("date",)),
+            (DailyProductSales, ("date", "product_id")),
+            (DailyCategorySales, ("date", "category_id")),
+        )
+    }
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RollupTests(TestCase):
+    """Số liệu cộng dồn khi đặt/hủy đơn phải khớp với bản tính lại từ Order/OrderItem."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lamps, decor = Category.objects.create(name="Đèn"), Category.objects.create(name="Trang trí")
+        cls.lamp = Product.objects.create(name="Đèn bàn", slug="den-ban", price=400_000, stock=50)
+        cls.vase = Product.objects.create(name="Bình hoa", slug="binh-hoa", price=150_000, stock=50)
+        cls.lamp.categories.add(lamps, decor)
+        cls.vase.categories.add(decor)
+        cls.user = User.objects.create_user("khach-bao-cao")
+        cls.address = Address.objects.create(user=cls.user, recipient_name="Khách", phone="0900000000",
+                                             address="1 Lê Lợi", is_default=True)
+
+    def _checkout(self, *lines):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=qty) for product, qty in lines])
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order(prefetch_cart_items(cart), self.user, self.address)
+
+    def _rebuilt(self):
+        today = Order.objects.latest("created_at").created_at.date()
+        rebuild_days(today, today)
+        return _snapshot()
+
+    def test_rollups_written_after_commit(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.lamp, quantity=1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            place_order(prefetch_cart_items(cart), self.user, self.address)
+            # trong transaction của checkout chưa chạm bảng tổng hợp
+            self.assertFalse(DailySales.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_placed_orders_match_rebuild(self):
+        self._checkout((self.lamp, 2), (self.vase, 1))
+        self._checkout((self.vase, 3))
+        incremental = _snapshot()
+
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.orders, daily.units, daily.revenue), (2, 6, Decimal("1400000")))
+        # đơn đầu có hai sản phẩm cùng danh mục "Trang trí": chỉ tính một đơn cho danh mục đó
+        self.assertEqual(DailyCategorySales.objects.get(category__name="Trang trí").orders, 2)
+        self.assertEqual(incremental, self._rebuilt())
+
+    def test_cancel_and_restore_match_rebuild(self):
+        first = self._checkout((self.lamp, 1))
+        self._checkout((self.vase, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            result = cancel_orders([first.pk])
+        self.assertEqual(result["orders"], 1)
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.cancelled_orders, daily.cancelled_units, daily.net_revenue),
+                         (1, 1, Decimal("300000")))
+        self.assertEqual(_snapshot(), self._rebuilt())
+
+        # admin đổi đơn đã hủy về trạng thái khác: trừ lại phần "đã hủy"
+        Order.objects.filter(pk=first.pk).update(status="pending")
+        with self.captureOnCommitCallbacks(execute=True):
+            record_orders_cancelled([first.pk], sign=-1)
+        self.assertEqual(DailySales.objects.get().cancelled_orders, 0)
+        self.assertEqual(_snapshot(), self._rebuilt())
+
+    def test_rebuild_is_idempotent_and_uses_order_day(self):
+        order = Order.objects.create(user=self.user, full_name="Khách", phone="0", address="x")
+        Order.objects.filter(pk=order.pk).update(created_at=DAY)
+        OrderItem.objects.create(order=order, product=self.lamp, quantity=2, price=400_000)
+
+        self.assertEqual(rebuild_days(DAY.date(), DAY.date()), 1)
+        first = _snapshot()
+        rebuild_days(DAY.date() - timedelta(days=1), DAY.date() + timedelta(days=1))
+        self.assertEqual(_snapshot(), first)
+        self.assertEqual(DailySales.objects.get().date, DAY.date())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExportCsvTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("nhan-vien", is_staff=True)
+        product = Product.objects.create(name="Đèn sàn", slug="den-san", price=900_000, stock=3)
+        DailySales.objects.create(date=DAY.date(), orders=3, units=4, revenue=Decimal("3600000"))
+        DailySales.objects.create(date=DAY.date() - timedelta(days=40), orders=1, units=1, revenue=1)
+        DailyProductSales.objects.create(date=DAY.date(), product=product, orders=3, units=4,
+                                         revenue=Decimal("3600000"), cancelled_orders=1)
+
+    def _export(self, kind, **params):
+        response = self.client.get(reverse("reports:export", args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        return list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+
+    def test_daily_export_is_limited_to_period(self):
+        self.client.force_login(self.staff)
+        rows = self._export("daily", start=DAY.date().isoformat(), end=DAY.date().isoformat())
+        self.assertEqual(rows[0], ["date", *FIGURES])
+        self.assertEqual(rows[1:], [[DAY.date().isoformat(), "3", "4", "3600000.00", "0", "0", "0.00"]])
+
+    def test_product_export_includes_names(self):
+        self.client.force_login(self.staff)
+        rows = self._export("products", start=DAY.date().isoformat(), end=DAY.date().isoformat())
+        self.assertEqual(rows[0][:3], ["date", "product_id", "product__name"])
+        self.assertEqual(rows[1][2], "Đèn sàn")
+        self.assertEqual(rows[1][-3], "1")
+
+    def test_unknown_report_and_non_staff(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse("reports:export", args=["orders"])).status_code, 404)
+        self.client.force_login(User.objects.create_user("khach"))
+        self.assertEqual(self.client.get(reverse("reports:export", args=["daily"])).status_code, 302)
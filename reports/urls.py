@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = "reports"
+
+urlpatterns = [
+    path('', views.dashboard, name='dashboard'),
+    path('export/<slug:kind>.csv', views.export_csv, name='export'),
+]
